@@ -81,6 +81,11 @@ DATABASES = {
     }
 }
 
+# SQLite no crea la restricción única con NULLS NOT DISTINCT de
+# ResumenInventario; ahí la transacción de resumen_totales._sumar ya
+# serializa las escrituras (la segunda falla con "database is locked")
+SILENCED_SYSTEM_CHECKS = ["models.W047"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -121,4 +126,14 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 LOGIN_URL = "signin"
 LOGIN_REDIRECT_URL = "home"
-LOGOUT_REDIRECT_URL = "signin"
\ No newline at end of file
+LOGOUT_REDIRECT_URL = "signin"
+
+# Exportación Excel
+EXCEL_EXPORT_DIR = BASE_DIR / "exports"
+EXCEL_EXPORT_WORKERS = 1
+# Procesos para el ZIP por sector (None = un proceso por núcleo)
+EXCEL_ZIP_WORKERS = None
+# ZIP armándose a la vez; los demás pedidos reciben 503
+EXCEL_ZIP_CONCURRENTES = 2
+# Caché del resumen general (se invalida sola con la versión del inventario)
+RESUMEN_CACHE_TIMEOUT = 60 * 60
@@ -0,0 +1,336 @@
+"""
+Motor de tablas cruzadas en memoria. El inventario plano (un registro por
+ObjetoLugar) se carga en columnas NumPy y cualquier "agrupar por X × Y
+filtrando por Z" sale con máscaras booleanas y bincount, sin escribir una
+consulta nueva con annotate para cada cruce.
+
+Columnas que se guardan: id, lugar, tipo de objeto, estado (código),
+cantidad y vivo. Sector, ubicación, piso, tipo de lugar, categoría y objeto
+se derivan del lugar y del tipo con la jerarquía de catalogo.py, así un
+cambio de jerarquía no obliga a recargar las filas.
+
+Se mantiene al día con CambioObjetoLugar: cada refresco aplica solo los
+cambios posteriores al cursor (el último valor de cada objeto gana).
+"""
+import threading
+
+import numpy as np
+
+from .catalogo import catalogos
+from .cambios import cursor_actual
+from .data_version import VERSION_CATALOGO_PK, get_data_version
+from .models import CambioObjetoLugar, Lugar, ObjetoLugar
+
+ANALITICA_BATCH_SIZE = 5000
+
+ESTADOS = tuple(valor for valor, _ in ObjetoLugar.ESTADO)
+
+# Dimensiones que se derivan del lugar y del tipo de objeto
+DIMENSIONES_LUGAR = ("sector", "ubicacion", "piso", "tipo_lugar", "lugar")
+DIMENSIONES_TIPO = ("categoria", "objeto", "tipo_objeto")
+DIMENSIONES = DIMENSIONES_LUGAR + DIMENSIONES_TIPO + ("estado",)
+
+# Catálogo de catalogo.py con el nombre de cada dimensión
+CATALOGO_DIMENSION = {
+    "sector": "sectores", "ubicacion": "ubicaciones", "piso": "pisos",
+    "tipo_lugar": "tipos_lugar", "lugar": "lugares", "categoria": "categorias",
+    "objeto": "objetos", "tipo_objeto": "tipos_objeto",
+}
+
+
+class DimensionInvalida(ValueError):
+    pass
+
+
+def _ids(opciones):
+    return np.array(sorted(o.id for o in opciones), dtype=np.int64)
+
+
+def _codigos(valores, ids):
+    """Posición de cada id en `valores` (ordenado); los que no están van a len(valores)."""
+    if not len(valores):
+        return np.zeros(len(ids), dtype=np.int64)
+    pos = np.searchsorted(valores, ids)
+    pos_segura = np.minimum(pos, len(valores) - 1)
+    return np.where(valores[pos_segura] == ids, pos_segura, len(valores))
+
+
+class CruceDemasiadoGrande(ValueError):
+    """El producto de las cardinalidades de `por` no cabe en un int64."""
+
+
+class Instantanea:
+    """
+    Columnas del inventario y su jerarquía en un momento. No se modifica
+    después de armarla: refrescar arma otra y la cambia de una vez, así un
+    pivote que la tomó sigue leyendo datos coherentes entre sí.
+    """
+
+    def __init__(self, ids, lugar, tipo, estado, cantidad, vivo, jerarquia):
+        self.ids, self.lugar, self.tipo = ids, lugar, tipo
+        self.estado, self.cantidad, self.vivo = estado, cantidad, vivo
+        self.jerarquia = jerarquia
+        self.valores = jerarquia.valores
+        self.nombres = jerarquia.nombres
+        # Solo caché: dos hilos que la llenan a la vez calculan lo mismo
+        self._cache_codigos = {}
+
+    def columna(self, dim):
+        """Código de `dim` para cada fila (len(valores) = sin valor)."""
+        if dim == "estado":
+            return self.estado
+        if dim not in self._cache_codigos:
+            if dim in self.jerarquia.por_lugar:
+                base = self._cache_codigos.get("_lugar")
+                if base is None:
+                    base = self._cache_codigos["_lugar"] = _codigos(self.valores["lugar"], self.lugar)
+                self._cache_codigos[dim] = self.jerarquia.por_lugar[dim][base]
+            elif dim in self.jerarquia.por_tipo:
+                base = self._cache_codigos.get("_tipo")
+                if base is None:
+                    base = self._cache_codigos["_tipo"] = _codigos(self.valores["tipo_objeto"], self.tipo)
+                self._cache_codigos[dim] = self.jerarquia.por_tipo[dim][base]
+            else:
+                raise DimensionInvalida(dim)
+        return self._cache_codigos[dim]
+
+    def _tamano(self, dim):
+        return len(ESTADOS) + 1 if dim == "estado" else len(self.valores[dim]) + 1
+
+    def _valor(self, dim, codigo):
+        if dim == "estado":
+            return ESTADOS[codigo] if codigo < len(ESTADOS) else None
+        valores = self.valores[dim]
+        return int(valores[codigo]) if codigo < len(valores) else None
+
+    def _codigo(self, dim, valor):
+        """Código de un valor de filtro; -1 (no coincide con nada) si no existe."""
+        if dim == "estado":
+            return ESTADOS.index(valor) if valor in ESTADOS else -1
+        valores = self.valores[dim]
+        codigo = int(_codigos(valores, np.array([int(valor)], dtype=np.int64))[0])
+        return codigo if codigo < len(valores) else -1
+
+    def pivote(self, por, filtros=None):
+        """
+        Totales agrupados por las dimensiones de `por` (p. ej.
+        ("categoria", "piso", "estado")), solo con las filas que cumplen
+        `filtros` ({dimension: id o letra de estado}). Devuelve una lista
+        de filas {dim: id, ..., "cantidad", "filas"} sin los grupos vacíos.
+        Lanza CruceDemasiadoGrande si las combinaciones posibles de `por`
+        no caben en un int64.
+        """
+        for dim in list(por) + list(filtros or {}):
+            if dim not in DIMENSIONES:
+                raise DimensionInvalida(dim)
+
+        tamanos = [self._tamano(dim) for dim in por]
+        combinaciones = 1
+        for tamano in tamanos:
+            combinaciones *= tamano
+        if combinaciones > np.iinfo(np.int64).max:
+            raise CruceDemasiadoGrande(", ".join(por))
+
+        mascara = self.vivo.copy()
+        for dim, valor in (filtros or {}).items():
+            mascara &= self.columna(dim) == self._codigo(dim, valor)
+
+        if por:
+            clave = np.ravel_multi_index([self.columna(dim)[mascara] for dim in por], tamanos)
+        else:
+            clave = np.zeros(int(mascara.sum()), dtype=np.int64)
+        grupos, inversa = np.unique(clave, return_inverse=True)
+        cantidades = np.bincount(inversa, weights=self.cantidad[mascara], minlength=len(grupos))
+        filas = np.bincount(inversa, minlength=len(grupos))
+
+        codigos = np.unravel_index(grupos, tamanos) if por else []
+        resultado = []
+        for i in range(len(grupos)):
+            fila = {dim: self._valor(dim, int(codigos[j][i])) for j, dim in enumerate(por)}
+            fila["cantidad"] = int(cantidades[i])
+            fila["filas"] = int(filas[i])
+            resultado.append(fila)
+        return resultado
+
+
+class _Jerarquia:
+    """Ids de cada catálogo y el padre de cada elemento, como códigos."""
+
+    def __init__(self):
+        self.version_catalogo = get_data_version(VERSION_CATALOGO_PK)
+        cat = catalogos()
+        self.valores = {dim: _ids(cat[CATALOGO_DIMENSION[dim]]) for dim in CATALOGO_DIMENSION}
+        self.nombres = {
+            dim: {o.id: o.label for o in cat[CATALOGO_DIMENSION[dim]]} for dim in CATALOGO_DIMENSION
+        }
+        self.nombres["estado"] = dict(ObjetoLugar.ESTADO)
+
+        # Padre de cada elemento (ya como código del padre), con un lugar
+        # extra al final para "sin valor"
+        def _padres(dim, dim_padre, padre_de):
+            hijos = self.valores[dim]
+            ids_padre = np.array([padre_de.get(i) or 0 for i in hijos], dtype=np.int64)
+            codigos = _codigos(self.valores[dim_padre], ids_padre)
+            return np.append(codigos, len(self.valores[dim_padre]))
+
+        padre = {dim: {o.id: o.padre for o in cat[CATALOGO_DIMENSION[dim]]} for dim in CATALOGO_DIMENSION}
+        tipo_lugar = dict(Lugar.objects.values_list("id", "lugar_tipo_lugar_id"))
+
+        piso_de_lugar = _padres("lugar", "piso", padre["lugar"])
+        ubicacion_de_piso = _padres("piso", "ubicacion", padre["piso"])
+        sector_de_ubicacion = _padres("ubicacion", "sector", padre["ubicacion"])
+        self.por_lugar = {
+            "lugar": np.arange(len(self.valores["lugar"]) + 1),
+            "piso": piso_de_lugar,
+            "ubicacion": ubicacion_de_piso[piso_de_lugar],
+            "sector": sector_de_ubicacion[ubicacion_de_piso[piso_de_lugar]],
+            "tipo_lugar": _padres("lugar", "tipo_lugar", tipo_lugar),
+        }
+        objeto_de_tipo = _padres("tipo_objeto", "objeto", padre["tipo_objeto"])
+        categoria_de_objeto = _padres("objeto", "categoria", padre["objeto"])
+        self.por_tipo = {
+            "tipo_objeto": np.arange(len(self.valores["tipo_objeto"]) + 1),
+            "objeto": objeto_de_tipo,
+            "categoria": categoria_de_objeto[objeto_de_tipo],
+        }
+
+
+class MotorAnalitico:
+    """
+    Mantiene la Instantanea vigente del inventario. Usar motor() para la
+    copia compartida del proceso; crear una propia sirve para pruebas o
+    comandos. Para varias lecturas coherentes entre sí (pivote y nombres),
+    tomar `instantanea` una vez y leer de ella.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cursor = None
+        self.instantanea = None
+
+    # ---------- carga ----------
+
+    def cargar(self):
+        """Lee el inventario completo. El cursor se toma antes, así nada se pierde."""
+        cursor = cursor_actual()
+        ids, lugares, tipos, estados, cantidades = [], [], [], [], []
+        filas = ObjetoLugar.objects.order_by("id").values_list(
+            "id", "lugar_id", "tipo_de_objeto_id", "estado", "cantidad"
+        )
+        for ol_id, lugar_id, tipo_id, estado, cantidad in filas.iterator(chunk_size=ANALITICA_BATCH_SIZE):
+            ids.append(ol_id)
+            lugares.append(lugar_id or 0)
+            tipos.append(tipo_id or 0)
+            estados.append(self._estado(estado))
+            cantidades.append(cantidad or 0)
+
+        self.instantanea = Instantanea(
+            np.array(ids, dtype=np.int64),
+            np.array(lugares, dtype=np.int64),
+            np.array(tipos, dtype=np.int64),
+            np.array(estados, dtype=np.int8),
+            np.array(cantidades, dtype=np.int64),
+            np.ones(len(ids), dtype=bool),
+            _Jerarquia(),
+        )
+        self.cursor = cursor
+        return self
+
+    @staticmethod
+    def _estado(valor):
+        return ESTADOS.index(valor) if valor in ESTADOS else len(ESTADOS)
+
+    # ---------- refresco incremental ----------
+
+    def refrescar(self):
+        """
+        Aplica los cambios registrados después del cursor. Si cambió algún
+        catálogo (un lugar nuevo, un piso que cambia de ubicación) se relee
+        la jerarquía; las filas no. Devuelve cuántos objetos cambiaron.
+        """
+        with self._lock:
+            if self.cursor is None:
+                self.cargar()
+                return len(self.instantanea.ids)
+            actual = self.instantanea
+            jerarquia = actual.jerarquia
+            if get_data_version(VERSION_CATALOGO_PK) != jerarquia.version_catalogo:
+                jerarquia = _Jerarquia()
+
+            ultimos = {}
+            cursor = self.cursor
+            cambios = (
+                CambioObjetoLugar.objects.filter(id__gt=cursor)
+                .order_by("id")
+                .values_list("id", "id_objeto_lugar", "accion", "id_lugar", "id_tipo_objeto", "cantidad", "estado")
+            )
+            for cambio_id, ol_id, accion, lugar_id, tipo_id, cantidad, estado in cambios.iterator(
+                chunk_size=ANALITICA_BATCH_SIZE
+            ):
+                ultimos[ol_id] = (accion, lugar_id or 0, tipo_id or 0, self._estado(estado), cantidad or 0)
+                cursor = cambio_id
+            if ultimos:
+                self.instantanea = self._aplicar(actual, ultimos, jerarquia)
+            elif jerarquia is not actual.jerarquia:
+                self.instantanea = Instantanea(
+                    actual.ids, actual.lugar, actual.tipo, actual.estado, actual.cantidad, actual.vivo, jerarquia
+                )
+            self.cursor = cursor
+            return len(ultimos)
+
+    @staticmethod
+    def _aplicar(actual, ultimos, jerarquia):
+        """Una Instantanea nueva con `ultimos` aplicados (las columnas de `actual` no se tocan)."""
+        ids = np.array(list(ultimos), dtype=np.int64)
+        accion = np.array([v[0] for v in ultimos.values()])
+        lugar = np.array([v[1] for v in ultimos.values()], dtype=np.int64)
+        tipo = np.array([v[2] for v in ultimos.values()], dtype=np.int64)
+        estado = np.array([v[3] for v in ultimos.values()], dtype=np.int8)
+        cantidad = np.array([v[4] for v in ultimos.values()], dtype=np.int64)
+        vivo = accion != "B"
+
+        pos = np.searchsorted(actual.ids, ids)
+        pos_segura = np.minimum(pos, max(len(actual.ids) - 1, 0))
+        existe = (
+            (pos < len(actual.ids)) & (actual.ids[pos_segura] == ids) if len(actual.ids)
+            else np.zeros(len(ids), bool)
+        )
+
+        nuevos = ~existe & vivo
+        columnas = {}
+        for campo, valores in (
+            ("lugar", lugar), ("tipo", tipo), ("estado", estado), ("cantidad", cantidad), ("vivo", vivo),
+        ):
+            columna = getattr(actual, campo).copy()
+            columna[pos[existe]] = valores[existe]
+            columnas[campo] = np.concatenate([columna, valores[nuevos]])
+        columnas["ids"] = np.concatenate([actual.ids, ids[nuevos]])
+
+        if nuevos.any() and len(columnas["ids"]) > 1 and (np.diff(columnas["ids"]) < 0).any():
+            orden = np.argsort(columnas["ids"], kind="stable")
+            columnas = {campo: valores[orden] for campo, valores in columnas.items()}
+        return Instantanea(jerarquia=jerarquia, **columnas)
+
+    # ---------- consultas ----------
+
+    @property
+    def nombres(self):
+        return self.instantanea.nombres
+
+    def pivote(self, por, filtros=None):
+        """Instantanea.pivote sobre la instantánea vigente, tomada una sola vez."""
+        return self.instantanea.pivote(por, filtros)
+
+
+_motor = None
+_motor_lock = threading.Lock()
+
+
+def motor():
+    """El motor compartido del proceso, al día con los últimos cambios."""
+    global _motor
+    with _motor_lock:
+        if _motor is None:
+            _motor = MotorAnalitico()
+    _motor.refrescar()
+    return _motor
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class PWPvsaConfig(AppConfig):
     name = 'p_w_pvsa'
+
+    def ready(self):
+        from .signals import connect_signals
+        connect_signals()
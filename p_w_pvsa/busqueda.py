@@ -0,0 +1,79 @@
+"""
+Búsqueda por texto (typeahead) de lugares, objetos y tipos de objeto para
+los filtros de las listas, en vez de mandar el catálogo entero como
+<option>. Primero van los que empiezan con el texto y, si faltan, los que
+lo contienen; siempre con tope.
+
+El prefijo se busca en label_busqueda (el label en minúsculas, que empieza
+por el nombre) como un rango >= texto < texto + U+FFFF: así lo resuelve el
+índice simple de la columna. LIKE/istartswith no lo usaría (en SQLite el
+índice tendría que ser NOCASE, en PostgreSQL con pattern_ops).
+"""
+from django.db.models import Q
+
+from .models import Lugar, Objeto, TipoObjeto
+
+LIMITE_BUSQUEDA = 20
+LIMITE_BUSQUEDA_MAX = 50
+
+
+# Mismo orden que el índice de label_busqueda: sin ordenar aparte
+ORDEN_BUSQUEDA = ("label_busqueda", "id")
+
+
+# tipo -> (queryset, campos de búsqueda para "contiene")
+BUSQUEDAS = {
+    "lugares": (Lugar.objects.all(), ("nombre_del_lugar",)),
+    "objetos": (Objeto.objects.all(), ("nombre_del_objeto",)),
+    "tipos-objeto": (TipoObjeto.objects.all(), ("objeto__nombre_del_objeto", "marca", "material")),
+}
+
+
+def _consulta(qs, limite):
+    return qs.order_by(*ORDEN_BUSQUEDA).values_list("id", "label")[:limite]
+
+
+def _resultados(qs, limite):
+    return [{"id": pk, "label": label} for pk, label in _consulta(qs, limite)]
+
+
+def filtrar_prefijo(qs, texto):
+    """Filas cuyo label empieza con `texto` (sin distinguir mayúsculas), por índice."""
+    texto = texto.lower()
+    return qs.filter(label_busqueda__gte=texto, label_busqueda__lt=texto + "\uffff")
+
+
+def consulta_prefijo(tipo, texto, limite=LIMITE_BUSQUEDA):
+    """La consulta de la primera etapa de buscar(), para revisar su plan (bench_indices)."""
+    qs, _ = BUSQUEDAS[tipo]
+    return _consulta(filtrar_prefijo(qs, texto.strip()), limite)
+
+
+def buscar(tipo, texto, limite=LIMITE_BUSQUEDA):
+    """
+    Hasta `limite` resultados {"id", "label"} de `tipo` (clave de
+    BUSQUEDAS). Sin texto devuelve los primeros en orden alfabético.
+    Lanza KeyError si el tipo no existe.
+    """
+    qs, campos = BUSQUEDAS[tipo]
+    texto = (texto or "").strip()
+    limite = max(1, min(limite, LIMITE_BUSQUEDA_MAX))
+    if not texto:
+        return _resultados(qs, limite)
+
+    encontrados = _resultados(filtrar_prefijo(qs, texto), limite)
+    if len(encontrados) < limite:
+        contiene = Q()
+        for campo in campos:
+            contiene |= Q(**{f"{campo}__icontains": texto})
+        qs = qs.filter(contiene).exclude(pk__in=[r["id"] for r in encontrados])
+        encontrados += _resultados(qs, limite - len(encontrados))
+    return encontrados
+
+
+def etiqueta(tipo, pk):
+    """Texto de un elemento ya elegido (para volver a mostrarlo en el filtro)."""
+    if not pk:
+        return ""
+    qs, _ = BUSQUEDAS[tipo]
+    return qs.filter(pk=pk).values_list("label", flat=True).first() or ""
@@ -0,0 +1,116 @@
+"""
+Export incremental del inventario plano: qué ObjetoLugar se crearon,
+cambiaron o borraron después de un cursor (id de CambioObjetoLugar).
+
+HistoricoObjeto guarda el estado anterior con fecha de día y no registra
+bajas, así que no alcanza como cursor; CambioObjetoLugar lo complementa.
+"""
+from django.conf import settings
+
+from .export_plano import filas_inventario, NOMBRES_PLANO
+from .models import CambioObjetoLugar, ObjetoLugar
+
+CAMBIOS_LIMITE = getattr(settings, "EXPORT_CAMBIOS_LIMITE", 5000)
+CAMBIOS_BATCH_SIZE = 500
+
+# Desde ObjetoLugar hasta cada modelo del que copia datos al inventario plano
+RUTA_DESDE_OBJETO_LUGAR = {
+    "Sector": "sector",
+    "Ubicacion": "ubicacion",
+    "Piso": "piso",
+    "Lugar": "lugar",
+    "TipoLugar": "lugar__lugar_tipo_lugar",
+    "CategoriaObjeto": "tipo_de_objeto__objeto__objeto_categoria",
+    "Objeto": "tipo_de_objeto__objeto",
+    "TipoObjeto": "tipo_de_objeto",
+}
+
+
+def registrar_cambios(objetos, accion):
+    """
+    Anota `accion` (C/M/B) para cada ObjetoLugar de `objetos`, con sus
+    valores después del cambio (los usa historia.py para reconstruir
+    fechas pasadas). Las rutas bulk_* lo llaman directamente.
+    """
+    CambioObjetoLugar.objects.bulk_create(
+        [
+            CambioObjetoLugar(
+                id_objeto_lugar=ol.pk, accion=accion,
+                id_lugar=ol.lugar_id, id_tipo_objeto=ol.tipo_de_objeto_id,
+                cantidad=ol.cantidad, estado=ol.estado,
+            )
+            for ol in objetos
+        ],
+        batch_size=CAMBIOS_BATCH_SIZE,
+    )
+
+
+def registrar_cambio_padre(instance):
+    """
+    Un rename de Lugar, Sector, etc. cambia las filas planas de todos sus
+    objetos: se marcan como modificados.
+    """
+    ruta = RUTA_DESDE_OBJETO_LUGAR[type(instance).__name__]
+    objetos = ObjetoLugar.objects.filter(**{ruta: instance}).only(
+        "id", "lugar_id", "tipo_de_objeto_id", "cantidad", "estado"
+    )
+    lote = []
+    for ol in objetos.iterator(chunk_size=CAMBIOS_BATCH_SIZE):
+        lote.append(ol)
+        if len(lote) >= CAMBIOS_BATCH_SIZE:
+            registrar_cambios(lote, "M")
+            lote = []
+    if lote:
+        registrar_cambios(lote, "M")
+
+
+def cursor_actual():
+    return CambioObjetoLugar.objects.order_by("-id").values_list("id", flat=True).first() or 0
+
+
+def cursor_para_fecha(desde):
+    """Cursor que deja fuera lo registrado antes de `desde` (datetime)."""
+    anterior = (
+        CambioObjetoLugar.objects.filter(registrado__lt=desde)
+        .order_by("-id")
+        .values_list("id", flat=True)
+        .first()
+    )
+    return anterior or 0
+
+
+def cambios_desde(cursor, limite=CAMBIOS_LIMITE):
+    """
+    Devuelve {"cursor", "hay_mas", "cambiados", "borrados"}: las filas planas
+    actuales de lo creado/modificado y los ids borrados después de `cursor`.
+    Se leen a lo más `limite` registros; si hay_mas, se vuelve a pedir con el
+    cursor devuelto.
+    """
+    registros = list(
+        CambioObjetoLugar.objects.filter(id__gt=cursor)
+        .order_by("id")
+        .values_list("id", "id_objeto_lugar")[: limite + 1]
+    )
+    hay_mas = len(registros) > limite
+    registros = registros[:limite]
+    nuevo_cursor = registros[-1][0] if registros else cursor
+
+    # Varios cambios del mismo objeto se resuelven con su estado actual
+    tocados = sorted({ol_id for _, ol_id in registros})
+    cambiados = []
+    for i in range(0, len(tocados), CAMBIOS_BATCH_SIZE):
+        lote = tocados[i:i + CAMBIOS_BATCH_SIZE]
+        for fila in filas_inventario(ids=lote):
+            registro = dict(zip(NOMBRES_PLANO, fila))
+            if registro["fecha"] is not None:
+                registro["fecha"] = registro["fecha"].isoformat()
+            cambiados.append(registro)
+
+    existentes = {fila["id"] for fila in cambiados}
+
+    return {
+        "cursor": nuevo_cursor,
+        "hay_mas": hay_mas,
+        "cambiados": cambiados,
+        "borrados": [ol_id for ol_id in tocados if ol_id not in existentes],
+    }
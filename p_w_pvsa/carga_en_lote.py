@@ -0,0 +1,112 @@
+"""
+Carga en lote de FK para los resultados de un queryset: la primera vez que
+se lee una relación que no vino con select_related (p. ej. desde una
+plantilla, {{ u.lugar.piso.ubicacion }}), se trae para todas las filas
+hermanas en una consulta. Los objetos traídos quedan a su vez como
+hermanos, así que recorrer una cadena cuesta una consulta por nivel y no
+una por fila.
+
+Se activa con CargaEnLoteQuerySet (o CargaEnLoteMixin en un QuerySet
+propio). Con CARGA_EN_LOTE_DEBUG = True se registra cada relación cargada
+así, para ir agregando el select_related que falte.
+
+Cada instancia apunta al grupo de sus hermanas por referencias débiles:
+guardar una fila (en caché, en una variable) no retiene el resultado entero.
+"""
+import logging
+import threading
+import weakref
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import models
+from django.db.models import prefetch_related_objects
+from django.db.models.fields.related_descriptors import ForwardManyToOneDescriptor
+from django.db.models.query import ModelIterable
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_instalados = set()
+
+
+class _Hermanos:
+    """Las filas de un mismo resultado, compartido por todas ellas."""
+
+    __slots__ = ("refs",)
+
+    def __init__(self, instancias):
+        self.refs = [weakref.ref(i) for i in instancias]
+
+    def vivas(self):
+        return [i for i in (ref() for ref in self.refs) if i is not None]
+
+    def __reduce__(self):
+        # Una instancia serializada (caché, copy) vuelve sin hermanas
+        return (_Hermanos, ((),))
+
+
+class _DescriptorEnLote(ForwardManyToOneDescriptor):
+    """Descriptor de FK que, sin la relación en caché, la carga para todos los hermanos."""
+
+    def get_object(self, instance):
+        hermanos = getattr(instance, "_hermanos", None)
+        if hermanos is not None:
+            campo = self.field
+            pendientes = [
+                h for h in hermanos.vivas()
+                if not campo.is_cached(h) and campo.attname not in h.get_deferred_fields()
+            ]
+            if len(pendientes) > 1 and any(h is instance for h in pendientes):
+                prefetch_related_objects(pendientes, campo.name)
+                if getattr(settings, "CARGA_EN_LOTE_DEBUG", False):
+                    logger.info(
+                        "Carga en lote: %s.%s para %d filas",
+                        campo.model.__name__, campo.name, len(pendientes),
+                    )
+                marcar_hermanos([campo.get_cached_value(h) for h in pendientes])
+                return campo.get_cached_value(instance)
+        return super().get_object(instance)
+
+
+def _instalar(modelo):
+    # Los descriptores se cambian por modelo, una vez; sin _hermanos se
+    # comportan igual que los de Django
+    if modelo in _instalados:
+        return
+    with _lock:
+        for campo in modelo._meta.concrete_fields:
+            if campo.many_to_one and type(modelo.__dict__.get(campo.name)) is ForwardManyToOneDescriptor:
+                setattr(modelo, campo.name, _DescriptorEnLote(campo))
+        _instalados.add(modelo)
+
+
+def marcar_hermanos(instancias):
+    """
+    Deja `instancias` como hermanas entre sí (y, por nivel, lo que ya
+    trajeron con select_related).
+    """
+    unicas = list({id(i): i for i in instancias if i is not None}.values())
+    if len(unicas) < 2:
+        return
+    _instalar(type(unicas[0]))
+    hermanos = _Hermanos(unicas)
+    por_relacion = defaultdict(list)
+    for instancia in unicas:
+        instancia._hermanos = hermanos
+        for nombre, relacionado in instancia._state.fields_cache.items():
+            por_relacion[nombre].append(relacionado)
+    for relacionados in por_relacion.values():
+        marcar_hermanos(relacionados)
+
+
+class CargaEnLoteMixin:
+    def _fetch_all(self):
+        cargado = self._result_cache is not None
+        super()._fetch_all()
+        if not cargado and self._iterable_class is ModelIterable:
+            marcar_hermanos(self._result_cache)
+
+
+class CargaEnLoteQuerySet(CargaEnLoteMixin, models.QuerySet):
+    pass
@@ -0,0 +1,107 @@
+"""
+Catálogos para los combos de filtros (sectores, ubicaciones, pisos,
+lugares, objetos, tipos...). Cambian poco y las vistas de listas los
+pedían enteros en cada request, así que se guardan en memoria del proceso
+como tuplas ya ordenadas. El texto es la columna label (ver ConLabel).
+
+Cada proceso compara su copia contra la versión de catálogos en la base
+(VERSION_CATALOGO_PK, que suben las señales de esos modelos): cuando otro
+proceso cambia algo, la copia se rehace en la siguiente lectura.
+"""
+import threading
+from collections import namedtuple
+
+from .models import (
+    CategoriaObjeto, Lugar, Objeto, Piso, Sector, TipoLugar, TipoObjeto,
+    Ubicacion, VersionDatos,
+)
+from .data_version import VERSION_CATALOGO_PK
+
+# id, texto para mostrar y, si el combo se filtra por otro, el id del padre
+Opcion = namedtuple("Opcion", ("id", "label", "padre"))
+
+_lock = threading.Lock()
+_vigente = {"sello": None, "catalogos": None}
+
+
+def _sin_nulos(valores):
+    return [v for v in valores if v]
+
+
+def _construir():
+    sectores = tuple(
+        Opcion(i, s, None) for i, s in Sector.objects.order_by("sector").values_list("id", "sector")
+    )
+    ubicaciones = tuple(
+        Opcion(*fila)
+        for fila in Ubicacion.objects.order_by("ubicacion").values_list("id", "label", "sector_id")
+    )
+    pisos = tuple(
+        Opcion(*fila)
+        for fila in Piso.objects.order_by("ubicacion__ubicacion", "piso").values_list("id", "label", "ubicacion_id")
+    )
+    lugares = tuple(
+        Opcion(*fila)
+        for fila in Lugar.objects.order_by(
+            "piso__ubicacion__ubicacion", "piso__piso", "nombre_del_lugar"
+        ).values_list("id", "label", "piso_id")
+    )
+    tipos_lugar = tuple(
+        Opcion(i, t, None) for i, t in TipoLugar.objects.order_by("tipo_de_lugar").values_list("id", "tipo_de_lugar")
+    )
+    categorias = tuple(
+        Opcion(i, c, None)
+        for i, c in CategoriaObjeto.objects.order_by("nombre_de_categoria").values_list("id", "nombre_de_categoria")
+    )
+    objetos = tuple(
+        Opcion(*fila)
+        for fila in Objeto.objects.order_by(
+            "objeto_categoria__nombre_de_categoria", "nombre_del_objeto"
+        ).values_list("id", "label", "objeto_categoria_id")
+    )
+    tipos = list(
+        TipoObjeto.objects.order_by("objeto__nombre_del_objeto", "marca", "material").values_list(
+            "id", "label", "objeto_id", "marca", "material"
+        )
+    )
+    tipos_objeto = tuple(Opcion(i, label, o_id) for i, label, o_id, _, _ in tipos)
+    return {
+        "sectores": sectores,
+        "ubicaciones": ubicaciones,
+        "pisos": pisos,
+        "lugares": lugares,
+        "tipos_lugar": tipos_lugar,
+        "categorias": categorias,
+        "objetos": objetos,
+        "tipos_objeto": tipos_objeto,
+        "marcas": tuple(sorted(set(_sin_nulos(t[3] for t in tipos)))),
+        "materiales": tuple(sorted(set(_sin_nulos(t[4] for t in tipos)))),
+    }
+
+
+def _sello():
+    # La fecha distingue una fila recreada con el mismo número (p. ej. tras
+    # un rollback de tests)
+    return VersionDatos.objects.filter(pk=VERSION_CATALOGO_PK).values_list("version", "actualizado").first()
+
+
+def catalogos():
+    """
+    Diccionario con todos los catálogos como tuplas de Opcion (marcas y
+    materiales como tuplas de texto). Cuesta una consulta si la copia del
+    proceso sigue vigente.
+    """
+    sello = _sello()
+    if _vigente["sello"] != sello or _vigente["catalogos"] is None:
+        with _lock:
+            if _vigente["sello"] != sello or _vigente["catalogos"] is None:
+                _vigente["catalogos"] = _construir()
+                _vigente["sello"] = sello
+    return _vigente["catalogos"]
+
+
+def limpiar_catalogos():
+    """Descarta la copia del proceso (la próxima lectura la rehace)."""
+    with _lock:
+        _vigente["sello"] = None
+        _vigente["catalogos"] = None
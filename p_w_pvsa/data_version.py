@@ -0,0 +1,31 @@
+from django.db.models import F
+
+from .models import VersionDatos
+
+VERSION_PK = 1
+# Contador aparte para los catálogos (sectores, lugares, objetos...): no se
+# mueve con cada cambio de ObjetoLugar, que es lo que más se escribe
+VERSION_CATALOGO_PK = 2
+
+
+def get_data_version(pk=VERSION_PK):
+    """Versión actual del inventario (0 si nunca se ha escrito nada)."""
+    version = (
+        VersionDatos.objects.filter(pk=pk)
+        .values_list("version", flat=True)
+        .first()
+    )
+    return version or 0
+
+
+def bump_data_version(pk=VERSION_PK):
+    """
+    Sube la versión en la base de datos, así todos los procesos ven el
+    cambio. Se llama desde las señales y desde las cargas masivas, que
+    no disparan save()/delete().
+    """
+    actualizadas = VersionDatos.objects.filter(pk=pk).update(
+        version=F("version") + 1
+    )
+    if not actualizadas:
+        VersionDatos.objects.get_or_create(pk=pk, defaults={"version": 1})
@@ -0,0 +1,62 @@
+"""
+Mantenimiento de la columna `label` (ver ConLabel en models.py). Cada
+modelo arma la suya al guardarse; cuando cambia algo que aparece en el
+texto de los hijos (el nombre de un sector, el número de un piso...) las
+señales llaman a refrescar_hijos y se reescriben solo las que cambian.
+"""
+from .models import Lugar, Objeto, Piso, TipoObjeto, Ubicacion
+
+LABEL_BATCH_SIZE = 500
+
+# Padre -> (sus campos que aparecen en labels ajenos,
+#           [(hijo, lookup desde el hijo al padre, select_related para armarlo)])
+HIJOS_LABEL = {
+    "Sector": (("sector",), [(Ubicacion, "sector", ("sector",))]),
+    "Ubicacion": (
+        ("ubicacion",),
+        [(Piso, "ubicacion", ("ubicacion",)), (Lugar, "piso__ubicacion", ("piso__ubicacion",))],
+    ),
+    "Piso": (("piso", "ubicacion_id"), [(Lugar, "piso", ("piso__ubicacion",))]),
+    "CategoriaObjeto": (("nombre_de_categoria",), [(Objeto, "objeto_categoria", ("objeto_categoria",))]),
+    "Objeto": (("nombre_del_objeto",), [(TipoObjeto, "objeto", ("objeto",))]),
+}
+
+# Modelos con label y lo que necesitan para armarlo sin consultas por fila
+MODELOS_CON_LABEL = (
+    (Ubicacion, ("sector",)),
+    (Piso, ("ubicacion",)),
+    (Lugar, ("piso__ubicacion",)),
+    (Objeto, ("objeto_categoria",)),
+    (TipoObjeto, ("objeto",)),
+)
+
+
+def _rehacer(qs):
+    cambiados = []
+    for obj in qs.iterator(chunk_size=LABEL_BATCH_SIZE):
+        if obj.poner_label():
+            cambiados.append(obj)
+    # bulk_update no dispara señales: no hay cascada más abajo (ningún
+    # label incluye el label de otro modelo, solo nombres)
+    qs.model.objects.bulk_update(cambiados, ["label", "label_busqueda"], batch_size=LABEL_BATCH_SIZE)
+    return len(cambiados)
+
+
+def refrescar_hijos(instance):
+    """Rehace los labels que incluyen texto de `instance`; devuelve cuántos cambiaron."""
+    _, hijos = HIJOS_LABEL[type(instance).__name__]
+    return sum(
+        _rehacer(modelo.objects.filter(**{lookup: instance}).select_related(*relacionados))
+        for modelo, lookup, relacionados in hijos
+    )
+
+
+def rehacer_labels():
+    """
+    Recalcula todos los labels (filas de bulk_create, renombres hechos con
+    QuerySet.update). Devuelve {modelo: labels corregidos}.
+    """
+    return {
+        modelo.__name__: _rehacer(modelo.objects.select_related(*relacionados))
+        for modelo, relacionados in MODELOS_CON_LABEL
+    }
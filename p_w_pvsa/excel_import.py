@@ -0,0 +1,423 @@
+"""
+Carga masiva de inventario desde un xlsx con el mismo formato que escribe
+build_excel_sectores: una hoja por Ubicacion, bandas "PISO n", un bloque
+por Lugar con encabezado Objeto/Tipo/Cantidad/Estado/Detalle/Fecha.
+
+El libro se lee en modo read-only (fila a fila), los nombres se resuelven
+contra mapas en memoria y los ObjetoLugar se insertan con bulk_create por
+lotes, todo dentro de una sola transacción.
+
+También aplica de vuelta un SECTORES.xlsx editado (cantidad, estado y
+detalle) usando la columna oculta ID: ver actualizar_desde_excel.
+"""
+import re
+import zipfile
+from collections import namedtuple
+
+from django.db import transaction
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from .cambios import registrar_cambios
+from .data_version import bump_data_version
+from .resumen_totales import aplicar_diferencia, contribucion
+from .excel_utils import HEADERS, HEADER_ID
+from .models import (
+    CAMPOS_RUTA, Sector, Ubicacion, Piso, Lugar,
+    CategoriaObjeto, Objeto, TipoObjeto, ObjetoLugar, HistoricoObjeto,
+)
+
+IMPORT_BATCH_SIZE = 500
+
+RE_TITULO = re.compile(r"^Sector:\s*(?P<sector>.+?)\s*\|\s*Ubicación:\s*(?P<ubicacion>.+?)\s*$")
+RE_PISO = re.compile(r"^PISO\s+(?P<piso>-?\d+)$")
+SIN_OBJETOS = "Sin objetos registrados"
+
+# Columna opcional para poder crear objetos que aún no existen
+COL_CATEGORIA = "Categoría"
+
+ESTADO_POR_TEXTO = {}
+for _codigo, _nombre in ObjetoLugar.ESTADO:
+    ESTADO_POR_TEXTO[_codigo.casefold()] = _codigo
+    ESTADO_POR_TEXTO[_nombre.casefold()] = _codigo
+
+FilaImport = namedtuple(
+    "FilaImport",
+    ["hoja", "fila", "sector", "ubicacion", "piso", "lugar",
+     "objeto", "marca", "material", "cantidad", "estado", "detalle", "categoria", "id"],
+)
+LugarImport = namedtuple("LugarImport", ["hoja", "fila", "sector", "ubicacion", "piso", "lugar"])
+
+
+def _clave(texto):
+    return (texto or "").strip().casefold()
+
+
+def _texto(valor):
+    return "" if valor is None else str(valor).strip()
+
+
+def _partir_tipo(tipo_txt):
+    """Inverso de "marca - material" del export ("-" si ambos vacíos)."""
+    tipo_txt = _texto(tipo_txt)
+    if tipo_txt in ("", "-"):
+        return "", ""
+    if " - " in tipo_txt:
+        marca, material = tipo_txt.split(" - ", 1)
+        return marca.strip(), material.strip()
+    return tipo_txt, ""
+
+
+class ArchivoInvalido(ValueError):
+    """El archivo subido no es un xlsx legible."""
+
+
+class ReporteImportacion:
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.filas_leidas = 0
+        self.objetos_creados = 0
+        self.creados = {
+            "sectores": 0, "ubicaciones": 0, "pisos": 0, "lugares": 0,
+            "categorias": 0, "objetos": 0, "tipos_objeto": 0,
+        }
+        self.errores = []
+
+    @property
+    def ok(self):
+        return not self.errores
+
+    def error(self, hoja, fila, mensaje):
+        self.errores.append({"hoja": hoja, "fila": fila, "mensaje": mensaje})
+
+
+def leer_filas(fileobj, reporte):
+    """
+    Recorre el libro en modo read-only y entrega LugarImport (un bloque de
+    lugar) y FilaImport (una fila de objeto) en orden. Lanza
+    ArchivoInvalido si el archivo no es un xlsx o está dañado.
+    """
+    try:
+        wb = load_workbook(fileobj, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile, KeyError) as e:
+        # KeyError: un zip válido al que le falta alguna parte del xlsx
+        raise ArchivoInvalido("El archivo no es un Excel .xlsx válido") from e
+    try:
+        for ws in wb.worksheets:
+            sector = ubicacion = piso = lugar = None
+            pendiente = None
+            columnas = None
+            for n, row in enumerate(ws.iter_rows(values_only=True), start=1):
+                valores = [_texto(v) for v in row]
+                llenos = [v for v in valores if v]
+                if not llenos:
+                    continue
+
+                primero = valores[0]
+                m_titulo = RE_TITULO.match(primero)
+                m_piso = RE_PISO.match(primero)
+
+                if m_titulo and len(llenos) == 1:
+                    sector, ubicacion = m_titulo.group("sector"), m_titulo.group("ubicacion")
+                    piso = lugar = pendiente = None
+                elif m_piso and len(llenos) == 1:
+                    piso = int(m_piso.group("piso"))
+                    lugar = pendiente = None
+                elif valores[:len(HEADERS)] == HEADERS:
+                    if pendiente is None or piso is None or ubicacion is None:
+                        reporte.error(ws.title, n, "Encabezado sin lugar, piso o ubicación antes")
+                        lugar = None
+                        continue
+                    lugar = pendiente
+                    columnas = {h: i for i, h in enumerate(valores) if h}
+                    yield LugarImport(ws.title, n - 1, sector, ubicacion, piso, lugar)
+                elif primero == SIN_OBJETOS and len(llenos) == 1:
+                    continue
+                elif len(llenos) == 1 and primero:
+                    pendiente = primero
+                    lugar = None
+                elif lugar is None:
+                    reporte.error(ws.title, n, "Fila de objeto fuera de un bloque de lugar")
+                else:
+                    reporte.filas_leidas += 1
+                    fila = _fila_objeto(ws.title, n, row, columnas, sector, ubicacion, piso, lugar, reporte)
+                    if fila:
+                        yield fila
+    finally:
+        wb.close()
+
+
+def _fila_objeto(hoja, n, row, columnas, sector, ubicacion, piso, lugar, reporte):
+    def col(nombre):
+        i = columnas.get(nombre)
+        return row[i] if i is not None and i < len(row) else None
+
+    objeto = _texto(col("Objeto"))
+    if not objeto:
+        reporte.error(hoja, n, "Falta el nombre del objeto")
+        return None
+
+    try:
+        cantidad = int(col("Cantidad"))
+    except (TypeError, ValueError):
+        reporte.error(hoja, n, f"Cantidad inválida: {col('Cantidad')!r}")
+        return None
+
+    estado = ESTADO_POR_TEXTO.get(_clave(_texto(col("Estado"))))
+    if not estado:
+        reporte.error(hoja, n, f"Estado inválido: {col('Estado')!r}")
+        return None
+
+    detalle = _texto(col("Detalle"))
+    if detalle == "-":
+        detalle = ""
+
+    try:
+        ol_id = int(col(HEADER_ID)) if _texto(col(HEADER_ID)) else None
+    except (TypeError, ValueError):
+        reporte.error(hoja, n, f"ID inválido: {col(HEADER_ID)!r}")
+        return None
+
+    marca, material = _partir_tipo(col("Tipo"))
+    return FilaImport(
+        hoja, n, sector, ubicacion, piso, lugar,
+        objeto, marca, material, cantidad, estado, detalle[:200],
+        _texto(col(COL_CATEGORIA)), ol_id,
+    )
+
+
+class _Resolvedor:
+    """
+    Mapas nombre -> instancia cargados con una consulta por modelo. Lo que
+    no existe se crea una sola vez y queda en el mapa para las filas siguientes.
+    """
+
+    def __init__(self, reporte, tipo_lugar):
+        self.reporte = reporte
+        self.tipo_lugar = tipo_lugar
+        self.sectores = {_clave(s.sector): s for s in Sector.objects.all()}
+        self.ubicaciones = {_clave(u.ubicacion): u for u in Ubicacion.objects.all()}
+        self.pisos = {(p.ubicacion_id, p.piso): p for p in Piso.objects.all()}
+        self.lugares = {}
+        for lugar in Lugar.objects.order_by("id"):
+            self.lugares.setdefault((lugar.piso_id, _clave(lugar.nombre_del_lugar)), lugar)
+        self.categorias = {_clave(c.nombre_de_categoria): c for c in CategoriaObjeto.objects.all()}
+        self.objetos = {_clave(o.nombre_del_objeto): o for o in Objeto.objects.all()}
+        self.tipos = {}
+        for t in TipoObjeto.objects.order_by("id"):
+            self.tipos.setdefault((t.objeto_id, _clave(t.marca), _clave(t.material)), t)
+
+    def _crear(self, clave_reporte, model, **campos):
+        self.reporte.creados[clave_reporte] += 1
+        return model.objects.create(**campos)
+
+    def lugar(self, item):
+        sector = self.sectores.get(_clave(item.sector))
+        if sector is None:
+            sector = self.sectores[_clave(item.sector)] = self._crear("sectores", Sector, sector=item.sector)
+
+        ubicacion = self.ubicaciones.get(_clave(item.ubicacion))
+        if ubicacion is None:
+            ubicacion = self.ubicaciones[_clave(item.ubicacion)] = self._crear(
+                "ubicaciones", Ubicacion, ubicacion=item.ubicacion, sector=sector
+            )
+        elif ubicacion.sector_id != sector.id:
+            self.reporte.error(item.hoja, item.fila, f"La ubicación {item.ubicacion!r} pertenece a otro sector")
+            return None
+
+        piso = self.pisos.get((ubicacion.id, item.piso))
+        if piso is None:
+            piso = self.pisos[(ubicacion.id, item.piso)] = self._crear(
+                "pisos", Piso, piso=item.piso, ubicacion=ubicacion
+            )
+
+        lugar = self.lugares.get((piso.id, _clave(item.lugar)))
+        if lugar is None:
+            if self.tipo_lugar is None:
+                self.reporte.error(item.hoja, item.fila, f"El lugar {item.lugar!r} no existe y no se indicó tipo de lugar")
+                return None
+            lugar = self.lugares[(piso.id, _clave(item.lugar))] = self._crear(
+                "lugares", Lugar, nombre_del_lugar=item.lugar, piso=piso, lugar_tipo_lugar=self.tipo_lugar
+            )
+        return lugar
+
+    def tipo_objeto(self, fila):
+        objeto = self.objetos.get(_clave(fila.objeto))
+        if objeto is None:
+            if not fila.categoria:
+                self.reporte.error(fila.hoja, fila.fila, f"El objeto {fila.objeto!r} no existe y no trae {COL_CATEGORIA}")
+                return None
+            categoria = self.categorias.get(_clave(fila.categoria))
+            if categoria is None:
+                categoria = self.categorias[_clave(fila.categoria)] = self._crear(
+                    "categorias", CategoriaObjeto, nombre_de_categoria=fila.categoria
+                )
+            objeto = self.objetos[_clave(fila.objeto)] = self._crear(
+                "objetos", Objeto, nombre_del_objeto=fila.objeto, objeto_categoria=categoria
+            )
+
+        clave = (objeto.id, _clave(fila.marca), _clave(fila.material))
+        tipo = self.tipos.get(clave)
+        if tipo is None:
+            tipo = self.tipos[clave] = self._crear(
+                "tipos_objeto", TipoObjeto, objeto=objeto, marca=fila.marca, material=fila.material
+            )
+        return tipo
+
+
+def _insertar(lote, reporte):
+    # bulk_create no dispara post_save: cambios y totales se registran aquí
+    ObjetoLugar.objects.bulk_create(lote)
+    registrar_cambios(lote, "C")
+    aplicar_diferencia({}, contribucion([ol.pk for ol in lote]))
+    reporte.objetos_creados += len(lote)
+
+
+def importar_excel(fileobj, tipo_lugar=None, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Importa el libro en una transacción. Con dry_run, o si hubo algún
+    error, se hace rollback y solo queda el reporte.
+
+    `tipo_lugar` se usa para los lugares que haya que crear (el formato
+    del export no lo incluye). La columna Fecha se ignora: ObjetoLugar.fecha
+    es la fecha de registro.
+    """
+    reporte = ReporteImportacion(dry_run)
+
+    with transaction.atomic():
+        resolvedor = _Resolvedor(reporte, tipo_lugar)
+        lote = []
+        lugar = None
+
+        for item in leer_filas(fileobj, reporte):
+            if isinstance(item, LugarImport):
+                lugar = resolvedor.lugar(item)
+                continue
+            if lugar is None:
+                continue
+            tipo = resolvedor.tipo_objeto(item)
+            if tipo is None:
+                continue
+
+            lote.append(ObjetoLugar(
+                lugar=lugar, tipo_de_objeto=tipo,
+                cantidad=item.cantidad, estado=item.estado, detalle=item.detalle,
+            ))
+            if len(lote) >= batch_size:
+                _insertar(lote, reporte)
+                lote = []
+
+        if lote:
+            _insertar(lote, reporte)
+
+        if dry_run or reporte.errores:
+            transaction.set_rollback(True)
+        else:
+            # bulk_create no dispara post_save
+            bump_data_version()
+
+    return reporte
+
+
+class ReporteActualizacion:
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.filas_leidas = 0
+        self.sin_id = 0
+        self.sin_cambios = 0
+        self.actualizados = 0
+        self.no_encontrados = []
+        self.errores = []
+
+    @property
+    def ok(self):
+        return not self.errores
+
+    def error(self, hoja, fila, mensaje):
+        self.errores.append({"hoja": hoja, "fila": fila, "mensaje": mensaje})
+
+
+def _aplicar_lote(editadas, reporte, batch_size):
+    """
+    Compara un lote de filas editadas contra la base y guarda solo las que
+    cambiaron: bulk_update de ObjetoLugar + bulk_create del HistoricoObjeto
+    con los valores anteriores (lo mismo que hace ObjetoLugar.save por fila).
+    """
+    actuales = (
+        ObjetoLugar.objects.select_for_update()
+        .filter(pk__in=list(editadas))
+        .only("id", "lugar_id", "tipo_de_objeto_id", "cantidad", "estado", "detalle", "fecha", *CAMPOS_RUTA)
+    )
+    cambiados = []
+    historicos = []
+    for ol in actuales:
+        fila = editadas.pop(ol.id)
+        if (
+            ol.cantidad == fila.cantidad
+            and ol.estado == fila.estado
+            and (ol.detalle or "") == fila.detalle
+        ):
+            reporte.sin_cambios += 1
+            continue
+
+        historicos.append(HistoricoObjeto(
+            objeto_del_lugar_id=ol.id,
+            cantidad_anterior=ol.cantidad,
+            estado_anterior=ol.estado,
+            detalle_anterior=ol.detalle or "",
+            fecha_anterior=ol.fecha,
+            **{campo: getattr(ol, campo) for campo in CAMPOS_RUTA},
+        ))
+        ol.cantidad = fila.cantidad
+        ol.estado = fila.estado
+        ol.detalle = fila.detalle
+        cambiados.append(ol)
+
+    # Lo que quedó en `editadas` ya no existe (se borró después de exportar)
+    reporte.no_encontrados.extend(sorted(editadas))
+
+    if cambiados:
+        ids = [ol.pk for ol in cambiados]
+        totales_antes = contribucion(ids)
+        ObjetoLugar.objects.bulk_update(cambiados, ["cantidad", "estado", "detalle"], batch_size=batch_size)
+        HistoricoObjeto.objects.bulk_create(historicos, batch_size=batch_size)
+        registrar_cambios(cambiados, "M")
+        aplicar_diferencia(totales_antes, contribucion(ids))
+        reporte.actualizados += len(cambiados)
+
+
+def actualizar_desde_excel(fileobj, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Aplica un SECTORES.xlsx editado sin tocar filas que no cambiaron.
+    Las filas sin ID se cuentan y se ignoran (para altas está importar_excel).
+    """
+    reporte = ReporteActualizacion(dry_run)
+
+    with transaction.atomic():
+        editadas = {}
+        # editadas se vacía en cada lote: los repetidos se buscan en todo el libro
+        vistos = set()
+        for item in leer_filas(fileobj, reporte):
+            if isinstance(item, LugarImport):
+                continue
+            if item.id is None:
+                reporte.sin_id += 1
+                continue
+            if item.id in vistos:
+                reporte.error(item.hoja, item.fila, f"ID {item.id} repetido en el libro")
+                continue
+            vistos.add(item.id)
+            editadas[item.id] = item
+            if len(editadas) >= batch_size:
+                _aplicar_lote(editadas, reporte, batch_size)
+                editadas = {}
+
+        if editadas:
+            _aplicar_lote(editadas, reporte, batch_size)
+
+        if dry_run or reporte.errores:
+            transaction.set_rollback(True)
+        elif reporte.actualizados:
+            bump_data_version()
+
+    return reporte
@@ -1,8 +1,13 @@
-from io import BytesIO
+from collections import defaultdict, namedtuple
+from itertools import groupby
+from operator import itemgetter
+from tempfile import SpooledTemporaryFile
+from django.conf import settings
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
-from copy import copy
-from .models import ObjetoLugar
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, Border, Side, PatternFill, NamedStyle
+from .filtros import FILTROS_OBJETO, hay_filtros, filtrar_lugares, filtrar_objetos_lugar
+from .models import Ubicacion, ObjetoLugar, Piso, Lugar
 
 THIN = Side(style="thin", color="000000")
 BORDER = Border(left=THIN, right=THIN, top=THIN, bottom=THIN)
@@ -12,8 +17,10 @@ FILL_PISO = PatternFill("solid", fgColor="E7F1FF")
 
 FONT_TITLE = Font(bold=True,  size=14)
 FONT_PISO= Font(bold=True, size=12)
+FONT_LUGAR = Font(bold=True, size=12)
 FONT_HDR= Font(bold=True, size=10)
 FONT_CELL = Font(size=10)
+FONT_VACIO = Font(italic=True, size=10)
 
 CENTER = Alignment(horizontal="center", vertical="center", wrap_text=True)
 LEFT = Alignment(horizontal="left", vertical="top", wrap_text=True)
@@ -22,6 +29,171 @@ FILL_ESTADO_BUENO = PatternFill("solid", fgColor="C6EFCE")
 FILL_ESTADO_PENDIENTE = PatternFill("solid", fgColor="FFF2CC")
 FILL_ESTADO_MALO = PatternFill("solid", fgColor="F9CBAD")
 
+FILL_POR_ESTADO = {
+    "B": FILL_ESTADO_BUENO,
+    "P": FILL_ESTADO_PENDIENTE,
+    "M": FILL_ESTADO_MALO,
+}
+
+FORMATO_FECHA = "dd/mm/yyyy"
+
+# Estilos con nombre: se registran una sola vez por workbook y las celdas
+# solo guardan la referencia, en vez de un Font/Fill/Alignment propio.
+ESTILO_TITULO = "pvsa_titulo"
+ESTILO_PISO = "pvsa_piso"
+ESTILO_LUGAR = "pvsa_lugar"
+ESTILO_HDR = "pvsa_header"
+ESTILO_CELDA = "pvsa_celda"
+ESTILO_CELDA_CENTRO = "pvsa_celda_centro"
+ESTILO_FECHA = "pvsa_fecha"
+ESTILO_VACIO = "pvsa_vacio"
+ESTILO_POR_ESTADO = {
+    "B": "pvsa_estado_bueno",
+    "P": "pvsa_estado_pendiente",
+    "M": "pvsa_estado_malo",
+}
+
+_ESTILOS = [
+    (ESTILO_TITULO, dict(font=FONT_TITLE, fill=FILL_TITLE, alignment=CENTER)),
+    (ESTILO_PISO, dict(font=FONT_PISO, fill=FILL_PISO, alignment=LEFT)),
+    (ESTILO_LUGAR, dict(font=FONT_LUGAR, fill=FILL_TITLE, alignment=CENTER)),
+    (ESTILO_HDR, dict(font=FONT_HDR, fill=FILL_TITLE, alignment=CENTER)),
+    (ESTILO_CELDA, dict(font=FONT_CELL, alignment=LEFT)),
+    (ESTILO_CELDA_CENTRO, dict(font=FONT_CELL, alignment=CENTER)),
+    (ESTILO_FECHA, dict(font=FONT_CELL, alignment=CENTER, number_format=FORMATO_FECHA)),
+    (ESTILO_VACIO, dict(font=FONT_VACIO, alignment=CENTER)),
+] + [
+    (ESTILO_POR_ESTADO[estado], dict(font=FONT_CELL, fill=fill, alignment=CENTER))
+    for estado, fill in FILL_POR_ESTADO.items()
+]
+
+N_COLS = 6
+HEADERS = ["Objeto", "Tipo", "Cantidad", "Estado", "Detalle", "Fecha"]
+
+# Columna oculta con el id de ObjetoLugar: permite devolver el libro editado
+# y aplicar los cambios sobre las mismas filas (ver excel_import)
+COL_ID = "G"
+HEADER_ID = "ID"
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Tope de memoria del archivo temporal: sobre esto el xlsx se vuelca a disco
+SPOOL_MAX_BYTES = getattr(settings, "EXCEL_SPOOL_MAX_BYTES", 8 * 1024 * 1024)
+STREAM_CHUNK_SIZE = getattr(settings, "EXCEL_STREAM_CHUNK_SIZE", 64 * 1024)
+LOADER_CHUNK_SIZE = getattr(settings, "EXCEL_LOADER_CHUNK_SIZE", 2000)
+
+ESTADO_DISPLAY = dict(ObjetoLugar.ESTADO)
+
+# Fila ya aplanada de ObjetoLugar: lo justo para escribir una línea del bloque
+FilaObjeto = namedtuple(
+    "FilaObjeto",
+    ["id", "objeto", "marca", "material", "cantidad", "estado", "detalle", "fecha"],
+)
+
+
+# Orden de las hojas; los ObjetoLugar se leen en el mismo orden (por su ubicación)
+ORDEN_HOJAS = ("sector__sector", "ubicacion", "id")
+
+
+def ubicaciones_para_excel():
+    return Ubicacion.objects.select_related("sector").order_by(*ORDEN_HOJAS)
+
+
+class DatosSectores:
+    """
+    Árbol Ubicacion -> Piso -> Lugar -> ObjetoLugar cargado con un número
+    fijo de consultas (una por nivel). Pisos y lugares se agrupan en memoria
+    por FK; los ObjetoLugar se leen en streaming ordenados como las hojas y
+    en objetos_por_lugar solo quedan los de la hoja en curso (ver hojas()).
+    """
+
+    def __init__(self, ubicaciones, pisos_por_ubicacion, lugares_por_piso, filas_objetos):
+        self.ubicaciones = ubicaciones
+        self.pisos_por_ubicacion = pisos_por_ubicacion
+        self.lugares_por_piso = lugares_por_piso
+        self.objetos_por_lugar = {}
+        # filas_objetos: (ubicacion_id, lugar_id, *FilaObjeto), contiguas por ubicación
+        self._grupos = groupby(filas_objetos, key=itemgetter(0))
+        self._adelantadas = {}
+
+    def hojas(self):
+        """Cada ubicación en orden, con objetos_por_lugar cargado solo con sus objetos."""
+        for ubicacion in self.ubicaciones:
+            self.objetos_por_lugar = self._objetos_de(ubicacion.id)
+            yield ubicacion
+        self.objetos_por_lugar = {}
+
+    def _objetos_de(self, ubicacion_id):
+        if ubicacion_id in self._adelantadas:
+            return self._adelantadas.pop(ubicacion_id)
+        for grupo_id, filas in self._grupos:
+            por_lugar = defaultdict(list)
+            for _, lugar_id, *resto in filas:
+                por_lugar[lugar_id].append(FilaObjeto(*resto))
+            if grupo_id == ubicacion_id:
+                return por_lugar
+            # Solo si `ubicaciones` no viene en ORDEN_HOJAS: se guarda para su hoja
+            self._adelantadas[grupo_id] = por_lugar
+        return {}
+
+    def pisos(self, ubicacion):
+        return self.pisos_por_ubicacion.get(ubicacion.id, [])
+
+    def lugares(self, piso):
+        return self.lugares_por_piso.get(piso.id, [])
+
+    def objetos(self, lugar):
+        return self.objetos_por_lugar.get(lugar.id, [])
+
+
+def load_datos_sectores(ubicaciones_qs, filtros=None):
+    """
+    Con `filtros` (los mismos del resumen general) el árbol se poda a las
+    ramas que tienen algún lugar/objeto que cumple, así el tamaño del
+    archivo depende del corte y no del inventario completo.
+    """
+    filtros = filtros or {}
+    ub_ids = ubicaciones_qs.values("pk")
+
+    pisos_qs = Piso.objects.filter(ubicacion__in=ub_ids)
+    lugares_qs = filtrar_lugares(Lugar.objects.filter(piso__ubicacion__in=ub_ids), filtros)
+    objetos_qs = filtrar_objetos_lugar(ObjetoLugar.objects.filter(ubicacion__in=ub_ids), filtros)
+
+    if hay_filtros(filtros, FILTROS_OBJETO):
+        lugares_qs = lugares_qs.filter(pk__in=objetos_qs.values("lugar_id"))
+    if hay_filtros(filtros):
+        ubicaciones_qs = ubicaciones_qs.filter(pk__in=lugares_qs.values("piso__ubicacion_id"))
+        pisos_qs = pisos_qs.filter(pk__in=lugares_qs.values("piso_id"))
+
+    ubicaciones = list(ubicaciones_qs)
+
+    pisos_por_ubicacion = defaultdict(list)
+    for p in pisos_qs.only("id", "piso", "ubicacion_id").order_by("piso", "id"):
+        pisos_por_ubicacion[p.ubicacion_id].append(p)
+
+    lugares_por_piso = defaultdict(list)
+    for lugar in lugares_qs.only("id", "nombre_del_lugar", "piso_id").order_by("id"):
+        lugares_por_piso[lugar.piso_id].append(lugar)
+
+    filas = (
+        objetos_qs.order_by(*(f"ubicacion__{campo}" for campo in ORDEN_HOJAS), "id")
+        .values_list(
+            "ubicacion_id",
+            "lugar_id",
+            "id",
+            "tipo_de_objeto__objeto__nombre_del_objeto",
+            "tipo_de_objeto__marca",
+            "tipo_de_objeto__material",
+            "cantidad",
+            "estado",
+            "detalle",
+            "fecha",
+        )
+        .iterator(chunk_size=LOADER_CHUNK_SIZE)
+    )
+    return DatosSectores(ubicaciones, pisos_por_ubicacion, lugares_por_piso, filas)
+
+
 def _safe_sheet_name(name: str ) -> str:
     bad = [":","\\","/","?", "*","[","]"]
     for ch in bad:
@@ -29,7 +201,7 @@ def _safe_sheet_name(name: str ) -> str:
     name = " ".join(name.split()).strip()
     return name[:31] if len(name) > 31 else name
 
-def _unique_sheet_name(wb: workbook, base_name: str) -> str:
+def _unique_sheet_name(wb: Workbook, base_name: str) -> str:
     name= _safe_sheet_name(base_name)
     if name not in wb.sheetnames:
         return name
@@ -49,116 +221,130 @@ def _set_col_widths(ws):
     ws.column_dimensions["D"].width = 12
     ws.column_dimensions["E"].width = 35
     ws.column_dimensions["F"].width = 14
+    ws.column_dimensions[COL_ID].hidden = True
+
+def registrar_estilos(wb):
+    for nombre, attrs in _ESTILOS:
+        if nombre not in wb.named_styles:
+            wb.add_named_style(NamedStyle(name=nombre, border=BORDER, **attrs))
+
+def _cell(ws, value=None, style=ESTILO_CELDA):
+    cell = WriteOnlyCell(ws, value=value)
+    cell.style = style
+    return cell
+
+def _merged_row(ws, row, value, style):
+    # En modo write-only las celdas se escriben en orden: se emite la fila
+    # completa con borde y luego se registra el rango combinado.
+    cells = [_cell(ws, value, style)]
+    cells += [_cell(ws, None, style) for _ in range(N_COLS - 1)]
+    ws.append(cells)
+    ws.merged_cells.add(f"A{row}:F{row}")
+    return row + 1
+
+def _blank_rows(ws, row, n=1):
+    for _ in range(n):
+        ws.append([])
+    return row + n
+
+def _write_lugar_block(ws, start_row, lugar, objetos):
+    r = _merged_row(ws, start_row, lugar.nombre_del_lugar, ESTILO_LUGAR)
+
+    ws.append([_cell(ws, h, ESTILO_HDR) for h in HEADERS + [HEADER_ID]])
+    r += 1
 
-def _style_row(ws,row,c1,c2,fill=None, font=None, align=None):
-    for c in range(c1,c2 +1 ):
-        cell = ws.cell(row=row, column=c)
-        cell.border = BORDER
-        if fill:
-            cell.fill = copy(fill)
-        if font:
-            cell.font = copy(font)
-        if align:
-            cell.alignment = copy(align)
-
-def _write_lugar_block(ws, start_row, lugar, objetos_qs):
-    ws.merge_cells(start_row=start_row, start_column= 1, end_row=start_row, end_column=6)
-    title_font= Font(bold=True, size=12)
-    t = ws.cell(start_row, 1, lugar.nombre_del_lugar)
-    t.font = title_font
-    t.alignment = CENTER
-    _style_row(ws, start_row,1,6,fill=FILL_TITLE, font=title_font, align=CENTER)
-
-    headers = ["Objeto", "Tipo", "Cantidad", "Estado", "Detalle", "Fecha"]
-    hr = start_row + 1
-    for i, h in enumerate(headers, start=1):
-        cell = ws.cell(hr, i ,h)
-        cell.font = FONT_HDR
-        cell.alignment = CENTER
-        cell.fill = FILL_TITLE
-        cell.border = BORDER
-
-    r = hr + 1 
     count = 0
-    for ol in objetos_qs:
+    for fila in objetos:
         count += 1
-        objeto_nombre = ol.tipo_de_objeto.objeto.nombre_del_objeto
-        ### tipo_txt = f"{ol.tipo_de_objeto.marca}  -  {ol.tipo_de_objeto.material}"
-        marca = (ol.tipo_de_objeto.marca or "").strip()
-        material = (ol.tipo_de_objeto.material or "").strip()
-        partes = [p for p in (marca, material)if p] 
+        marca = (fila.marca or "").strip()
+        material = (fila.material or "").strip()
+        partes = [p for p in (marca, material)if p]
         tipo_txt= " - ".join(partes) if partes else "-"
 
-        ws.cell (r,1,objeto_nombre).font = FONT_CELL
-        ws.cell (r,2,tipo_txt).font = FONT_CELL
-        ws.cell(r,3,ol.cantidad).font = FONT_CELL
-
-        estado = ol.get_estado_display()
-        estado_cell = ws.cell(r,4, estado)
-        estado_cell.font = FONT_CELL
-        
-        if estado == "Bueno":
-            estado_cell.fill = FILL_ESTADO_BUENO
-        elif estado == "Pendiente":
-            estado_cell.fill = FILL_ESTADO_PENDIENTE
-        elif estado == "Malo":
-            estado_cell.fill = FILL_ESTADO_MALO
-
-        ws.cell (r,5,ol.detalle or "-").font = FONT_CELL
-        cfecha = ws.cell(r,6,ol.fecha)
-        cfecha.number_format = "dd/mm/yyyy"
-        cfecha.font = FONT_CELL
-
-        for c in range(1,7):
-            ws.cell(r,c).border = BORDER
-            ws.cell(r,c).alignment = LEFT if c in (1,2,5) else CENTER
+        ws.append([
+            _cell(ws, fila.objeto),
+            _cell(ws, tipo_txt),
+            _cell(ws, fila.cantidad, ESTILO_CELDA_CENTRO),
+            _cell(ws, ESTADO_DISPLAY.get(fila.estado, fila.estado), ESTILO_POR_ESTADO.get(fila.estado, ESTILO_CELDA_CENTRO)),
+            _cell(ws, fila.detalle or "-"),
+            _cell(ws, fila.fecha, ESTILO_FECHA),
+            _cell(ws, fila.id, ESTILO_CELDA_CENTRO),
+        ])
         r += 1
     if count ==0:
-        ws.merge_cells(start_row=r, start_column=1, end_row=r, end_column=6)
-        cell = ws.cell(r,1,"Sin objetos registrados")
-        cell.font = Font(italic=True, size=10)
-        cell.alignment = CENTER
-        _style_row(ws,r,1,6,align=CENTER)
-        r+=1
-
-    return r + 1
-def build_excel_sectores(ubicaciones_qs):
-    wb = Workbook()
-    wb.remove(wb.active)
-    
-
-    for ub in ubicaciones_qs:
-        sheet_name= _unique_sheet_name(wb,f"{ub.sector.sector} - {ub.ubicacion}")
-        ws = wb.create_sheet(title=sheet_name)
-        _set_col_widths(ws)
-
-        ws.merge_cells("A1:F1")
-        ws["A1"] = f"Sector: {ub.sector.sector} | Ubicación: {ub.ubicacion}"
-
-        ws["A1"].font = FONT_TITLE
-        ws["A1"].alignment = CENTER
-        _style_row(ws,1,1,6, fill=FILL_TITLE, font= FONT_TITLE, align=CENTER)
-        row= 3
-
-        pisos = ub.piso_set.all().order_by("piso")
-        for p in pisos:
-            ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=6)
-            cell = ws.cell(row,1,f"PISO {p.piso}")
-            cell.font = FONT_PISO
-            cell.alignment = LEFT
-            _style_row(ws, row,1,6, fill = FILL_PISO, font=FONT_PISO, align=LEFT)
-            row +=2
-
-            lugares = p.lugar_set.all().order_by("id")
-            for lugar in lugares:
-                objetos = (ObjetoLugar.objects.filter(lugar=lugar).select_related("tipo_de_objeto__objeto").order_by("id"))
-                row = _write_lugar_block(ws, row, lugar, objetos)
-            row += 1
-    bio = BytesIO()
-    wb.save(bio)
-    bio.seek(0)
-    return bio.getvalue()
-
-
-
-    
\ No newline at end of file
+        r = _merged_row(ws, r, "Sin objetos registrados", ESTILO_VACIO)
+
+    return _blank_rows(ws, r)
+
+def _write_ubicacion_sheet(wb, ub, datos):
+    sheet_name= _unique_sheet_name(wb,f"{ub.sector.sector} - {ub.ubicacion}")
+    ws = wb.create_sheet(title=sheet_name)
+    _set_col_widths(ws)
+
+    titulo = f"Sector: {ub.sector.sector} | Ubicación: {ub.ubicacion}"
+    row = _merged_row(ws, 1, titulo, ESTILO_TITULO)
+    row = _blank_rows(ws, row)
+
+    for p in datos.pisos(ub):
+        row = _merged_row(ws, row, f"PISO {p.piso}", ESTILO_PISO)
+        row = _blank_rows(ws, row)
+
+        for lugar in datos.lugares(p):
+            row = _write_lugar_block(ws, row, lugar, datos.objetos(lugar))
+        row = _blank_rows(ws, row)
+    return ws
+
+def write_excel_sectores(ubicaciones_qs, fileobj, progreso=None, filtros=None):
+    """
+    Escribe SECTORES.xlsx en `fileobj` usando un Workbook write-only:
+    las filas se vuelcan a disco a medida que se generan, así que la
+    memoria no crece con la cantidad de ObjetoLugar.
+
+    `progreso(hojas_listas, hojas_total, nombre_hoja)` se llama al
+    terminar cada hoja (lo usan las exportaciones en segundo plano).
+    """
+    datos = load_datos_sectores(ubicaciones_qs, filtros)
+    wb = Workbook(write_only=True)
+    registrar_estilos(wb)
+
+    total = len(datos.ubicaciones)
+    if progreso:
+        progreso(0, total, "")
+    for i, ub in enumerate(datos.hojas(), start=1):
+        ws = _write_ubicacion_sheet(wb, ub, datos)
+        if progreso:
+            progreso(i, total, ws.title)
+
+    if not wb.worksheets:
+        wb.create_sheet(title="Sheet")
+    wb.save(fileobj)
+
+def build_excel_sectores(ubicaciones_qs, filtros=None):
+    with SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as tmp:
+        write_excel_sectores(ubicaciones_qs, tmp, filtros=filtros)
+        tmp.seek(0)
+        return tmp.read()
+
+def stream_excel_sectores(ubicaciones_qs, filtros=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Genera el xlsx en un archivo temporal con tope de memoria
+    (SPOOL_MAX_BYTES) y lo entrega por bloques, pensado para
+    StreamingHttpResponse.
+    """
+    tmp = SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    try:
+        write_excel_sectores(ubicaciones_qs, tmp, filtros=filtros)
+        tmp.seek(0)
+    except Exception:
+        tmp.close()
+        raise
+
+    def _chunks():
+        with tmp:
+            while True:
+                data = tmp.read(chunk_size)
+                if not data:
+                    break
+                yield data
+
+    return _chunks()
@@ -0,0 +1,178 @@
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from django.conf import settings
+from django.utils.text import slugify
+
+
+def zip_workers():
+    return getattr(settings, "EXCEL_ZIP_WORKERS", None) or os.cpu_count() or 1
+
+
+def zip_concurrentes():
+    return getattr(settings, "EXCEL_ZIP_CONCURRENTES", 2)
+
+
+class ZipOcupado(Exception):
+    """Ya hay EXCEL_ZIP_CONCURRENTES ZIP armándose; el pedido debe reintentar."""
+
+
+# Un solo pool por proceso web, creado con el primer ZIP y reusado: arrancar
+# procesos spawn (cada uno con su django.setup()) cuesta más que un libro chico
+_pool = None
+_turnos = None
+_lock = threading.Lock()
+
+
+def _pool_compartido():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=zip_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(os.environ.get("DJANGO_SETTINGS_MODULE", "mysite.settings"),),
+            )
+        return _pool
+
+
+def _descartar_pool(pool):
+    # Un proceso que muere deja el pool roto: el próximo ZIP arranca uno nuevo
+    global _pool
+    with _lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _tomar_turno():
+    global _turnos
+    with _lock:
+        if _turnos is None:
+            _turnos = threading.BoundedSemaphore(zip_concurrentes())
+        turnos = _turnos
+    if not turnos.acquire(blocking=False):
+        raise ZipOcupado()
+    return turnos
+
+
+class _ConTurno:
+    """
+    Envuelve el generador del ZIP y devuelve el turno al terminar o al
+    cerrarse la respuesta, aunque el generador nunca haya empezado.
+    """
+
+    def __init__(self, chunks, turnos):
+        self._chunks = chunks
+        self._turnos = turnos
+
+    def __iter__(self):
+        try:
+            yield from self._chunks
+        finally:
+            self.close()
+
+    def close(self):
+        if self._turnos is not None:
+            self._chunks.close()
+            self._turnos.release()
+            self._turnos = None
+
+
+class _BufferZip:
+    """
+    Destino de escritura sin seek/tell para ZipFile: lo que se escribe se
+    acumula hasta que el generador lo entrega, así el ZIP sale por partes.
+    """
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, data):
+        self._partes.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        data = b"".join(self._partes)
+        self._partes = []
+        return data
+
+
+def _init_worker(settings_module):
+    # Cada proceso del pool arranca Django por su cuenta y abre su propia conexión
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+    django.setup()
+
+
+def render_sector(sector_id, carpeta, filtros=None):
+    """Arma el xlsx de un Sector (una hoja por Ubicacion) y devuelve su ruta."""
+    from django.db import connection
+    from .excel_utils import write_excel_sectores, ubicaciones_para_excel
+    from .models import Sector
+
+    try:
+        sector = Sector.objects.get(pk=sector_id)
+        nombre = f"SECTOR_{slugify(sector.sector) or sector.pk}_{sector.pk}.xlsx"
+        ruta = Path(carpeta) / nombre
+        with open(ruta, "wb") as fh:
+            write_excel_sectores(ubicaciones_para_excel().filter(sector_id=sector_id), fh, filtros=filtros)
+        return nombre, str(ruta)
+    finally:
+        if multiprocessing.parent_process() is not None:
+            connection.close()
+
+
+def stream_zip_sectores(sector_ids, filtros=None):
+    """
+    Genera un libro por Sector en el pool compartido y entrega el ZIP por
+    bloques: cada archivo se agrega apenas su proceso termina. Con
+    EXCEL_ZIP_WORKERS = 1 todo se arma en este proceso. Lanza ZipOcupado si
+    ya hay EXCEL_ZIP_CONCURRENTES ZIP en curso.
+    """
+    turnos = _tomar_turno()
+    carpeta = TemporaryDirectory(prefix="pvsa-zip-")
+    buf = _BufferZip()
+
+    def _agregar(zf, nombre, ruta):
+        # Los xlsx ya vienen comprimidos: se guardan sin recomprimir
+        zf.write(ruta, arcname=nombre, compress_type=zipfile.ZIP_STORED)
+        os.remove(ruta)
+
+    def _chunks():
+        with carpeta:
+            with zipfile.ZipFile(buf, "w") as zf:
+                if zip_workers() <= 1 or len(sector_ids) <= 1:
+                    for sector_id in sector_ids:
+                        _agregar(zf, *render_sector(sector_id, carpeta.name, filtros))
+                        yield buf.vaciar()
+                else:
+                    pool = _pool_compartido()
+                    futuros = []
+                    try:
+                        futuros = [pool.submit(render_sector, sid, carpeta.name, filtros) for sid in sector_ids]
+                        for futuro in as_completed(futuros):
+                            _agregar(zf, *futuro.result())
+                            yield buf.vaciar()
+                    except BrokenProcessPool:
+                        _descartar_pool(pool)
+                        raise
+                    finally:
+                        # El pool sigue para otros pedidos: se cancela lo de
+                        # este y se espera lo que ya corre antes de borrar la carpeta
+                        for futuro in futuros:
+                            futuro.cancel()
+                        wait(futuros)
+            yield buf.vaciar()
+
+    return _ConTurno(_chunks(), turnos)
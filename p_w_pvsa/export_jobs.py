@@ -0,0 +1,172 @@
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from threading import Lock
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .data_version import get_data_version
+from .excel_utils import write_excel_sectores, ubicaciones_para_excel
+from .models import ExportacionExcel
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = Lock()
+
+RE_ARCHIVO_EXPORTACION = re.compile(r"SECTORES_v(\d+)\.xlsx")
+
+
+def _export_dir():
+    return Path(getattr(settings, "EXCEL_EXPORT_DIR", settings.BASE_DIR / "exports"))
+
+
+def _archivo_exportacion(carpeta, version):
+    return carpeta / f"SECTORES_v{version}.xlsx"
+
+
+def _borrar_versiones_anteriores(carpeta, version):
+    """
+    Borra los SECTORES_v{n}.xlsx con n < `version`. Los de versiones más
+    nuevas se dejan: pueden ser de otro trabajo que terminó antes que este.
+    """
+    for archivo in carpeta.glob("SECTORES_v*.xlsx"):
+        m = RE_ARCHIVO_EXPORTACION.fullmatch(archivo.name)
+        if m and int(m.group(1)) < version:
+            try:
+                archivo.unlink()
+            except OSError:
+                # Otro proceso ya lo borró o lo tiene abierto (Windows): queda para la próxima
+                logger.warning("No se pudo borrar la exportación anterior %s", archivo, exc_info=True)
+
+
+def _get_executor():
+    # Pool local del proceso: no hay broker externo, los trabajos corren en hilos
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "EXCEL_EXPORT_WORKERS", 1),
+                thread_name_prefix="excel-export",
+            )
+    return _executor
+
+
+def exportacion_vigente(version=None):
+    """
+    Devuelve la última exportación lista para la versión actual del
+    inventario cuyo archivo sigue en disco, o None.
+    """
+    if version is None:
+        version = get_data_version()
+    exportacion = (
+        ExportacionExcel.objects.filter(version_datos=version, estado="L")
+        .order_by("-terminado")
+        .first()
+    )
+    if exportacion and os.path.exists(exportacion.archivo):
+        return exportacion
+    return None
+
+
+def solicitar_exportacion(usuario=None):
+    """
+    Si el inventario no cambió desde la última exportación se devuelve esa;
+    si ya hay una en curso para la misma versión se reutiliza. Si no, se
+    crea una nueva y se encola al terminar la transacción.
+    """
+    version = get_data_version()
+
+    exportacion = exportacion_vigente(version)
+    if exportacion:
+        return exportacion
+
+    # Un trabajo que lleva demasiado sin terminar se da por perdido (p. ej. reinicio del proceso)
+    limite = timezone.now() - timedelta(seconds=getattr(settings, "EXCEL_EXPORT_TIMEOUT", 30 * 60))
+    en_curso = (
+        ExportacionExcel.objects.filter(version_datos=version, creado__gte=limite)
+        .filter(Q(estado="P") | Q(estado="E"))
+        .order_by("-creado")
+        .first()
+    )
+    if en_curso:
+        return en_curso
+
+    exportacion = ExportacionExcel.objects.create(version_datos=version, usuario=usuario)
+    transaction.on_commit(lambda: _get_executor().submit(_ejecutar_en_hilo, exportacion.pk))
+    return exportacion
+
+
+def _ejecutar_en_hilo(exportacion_id):
+    # Cada hilo del pool abre su propia conexión y la cierra al terminar
+    close_old_connections()
+    try:
+        ejecutar_exportacion(exportacion_id)
+    finally:
+        connection.close()
+
+
+def ejecutar_exportacion(exportacion_id):
+    """Arma el xlsx de una ExportacionExcel y lo deja en EXCEL_EXPORT_DIR."""
+    tmp_name = None
+    try:
+        exportacion = ExportacionExcel.objects.get(pk=exportacion_id)
+        ExportacionExcel.objects.filter(pk=exportacion_id).update(estado="E")
+
+        def progreso(listas, total, hoja):
+            ExportacionExcel.objects.filter(pk=exportacion_id).update(
+                hojas_listas=listas, hojas_total=total, hoja_actual=hoja[:100]
+            )
+
+        carpeta = _export_dir()
+        carpeta.mkdir(parents=True, exist_ok=True)
+        destino = _archivo_exportacion(carpeta, exportacion.version_datos)
+
+        # Se escribe a un temporal y se renombra, así nunca se sirve un archivo a medias
+        with NamedTemporaryFile(dir=carpeta, suffix=".tmp", delete=False) as tmp:
+            tmp_name = tmp.name
+            write_excel_sectores(ubicaciones_para_excel(), tmp, progreso=progreso)
+        os.replace(tmp_name, destino)
+        tmp_name = None
+
+        ExportacionExcel.objects.filter(pk=exportacion_id).update(
+            estado="L", archivo=str(destino), terminado=timezone.now()
+        )
+        # Ya publicada esta versión, las anteriores no se vuelven a servir
+        _borrar_versiones_anteriores(carpeta, exportacion.version_datos)
+    except Exception as exc:
+        logger.exception("Falló la exportación Excel #%s", exportacion_id)
+        ExportacionExcel.objects.filter(pk=exportacion_id).update(
+            estado="X", error=str(exc), terminado=timezone.now()
+        )
+    finally:
+        if tmp_name and os.path.exists(tmp_name):
+            os.remove(tmp_name)
+
+
+def estado_exportacion(exportacion):
+    """Datos del trabajo para el endpoint de estado."""
+    porcentaje = 0
+    if exportacion.estado == "L":
+        porcentaje = 100
+    elif exportacion.hojas_total:
+        porcentaje = round(exportacion.hojas_listas * 100 / exportacion.hojas_total, 1)
+
+    return {
+        "id": exportacion.id,
+        "estado": exportacion.estado,
+        "estado_display": exportacion.get_estado_display(),
+        "version_datos": exportacion.version_datos,
+        "hojas_listas": exportacion.hojas_listas,
+        "hojas_total": exportacion.hojas_total,
+        "hoja_actual": exportacion.hoja_actual,
+        "porcentaje": porcentaje,
+        "error": exportacion.error,
+    }
@@ -0,0 +1,89 @@
+"""
+Inventario plano para BI: una fila por ObjetoLugar con toda su jerarquía,
+en CSV o JSON Lines. Se lee con values_list().iterator() y se escribe por
+bloques, así la memoria no crece con el tamaño del inventario.
+"""
+import csv
+import json
+
+from django.conf import settings
+
+from .filtros import filtrar_lista
+from .models import ObjetoLugar
+
+PLANO_CHUNK_SIZE = getattr(settings, "EXPORT_PLANO_CHUNK_SIZE", 2000)
+
+# (columna de salida, campo en ObjetoLugar)
+COLUMNAS_PLANO = (
+    ("id", "id"),
+    ("sector", "sector__sector"),
+    ("ubicacion", "ubicacion__ubicacion"),
+    ("piso", "piso__piso"),
+    ("lugar", "lugar__nombre_del_lugar"),
+    ("tipo_lugar", "lugar__lugar_tipo_lugar__tipo_de_lugar"),
+    ("categoria", "tipo_de_objeto__objeto__objeto_categoria__nombre_de_categoria"),
+    ("objeto", "tipo_de_objeto__objeto__nombre_del_objeto"),
+    ("marca", "tipo_de_objeto__marca"),
+    ("material", "tipo_de_objeto__material"),
+    ("cantidad", "cantidad"),
+    ("estado", "estado"),
+    ("detalle", "detalle"),
+    ("fecha", "fecha"),
+)
+NOMBRES_PLANO = [nombre for nombre, _ in COLUMNAS_PLANO]
+
+# formato -> (content type, extensión)
+FORMATOS_PLANO = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "jsonl": ("application/x-ndjson; charset=utf-8", "jsonl"),
+}
+
+
+def filas_inventario(filtros=None, chunk_size=PLANO_CHUNK_SIZE, ids=None):
+    """Tuplas en el orden de COLUMNAS_PLANO, ordenadas por id."""
+    qs = filtrar_lista(ObjetoLugar.objects.all(), filtros or {})
+    if ids is not None:
+        qs = qs.filter(id__in=ids)
+    return (
+        qs.order_by("id")
+        .values_list(*(campo for _, campo in COLUMNAS_PLANO))
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+class _Eco:
+    """Archivo falso para csv.writer: write() devuelve la línea en vez de guardarla."""
+
+    def write(self, value):
+        return value
+
+
+def _lineas_csv(filas):
+    writer = csv.writer(_Eco())
+    yield writer.writerow(NOMBRES_PLANO)
+    for fila in filas:
+        yield writer.writerow(fila)
+
+
+def _lineas_jsonl(filas):
+    for fila in filas:
+        registro = dict(zip(NOMBRES_PLANO, fila))
+        if registro["fecha"] is not None:
+            registro["fecha"] = registro["fecha"].isoformat()
+        yield json.dumps(registro, ensure_ascii=False) + "\n"
+
+
+def stream_inventario_plano(formato, filtros=None, chunk_size=PLANO_CHUNK_SIZE):
+    """
+    Genera el export en bloques de `chunk_size` líneas (un yield por línea
+    haría demasiado lento el StreamingHttpResponse).
+    """
+    lineas = {"csv": _lineas_csv, "jsonl": _lineas_jsonl}[formato](filas_inventario(filtros, chunk_size))
+    bloque = []
+    for linea in lineas:
+        bloque.append(linea)
+        if len(bloque) >= chunk_size:
+            yield "".join(bloque)
+            bloque = []
+    if bloque:
+        yield "".join(bloque)
@@ -0,0 +1,124 @@
+"""
+Filtros del inventario compartidos por el resumen general y las
+exportaciones: se leen una vez del GET y se aplican sobre ObjetoLugar.
+"""
+
+# Filtros de ubicación, relativos a Lugar
+FILTROS_LUGAR = {
+    "sector": "piso__ubicacion__sector_id",
+    "ubicacion": "piso__ubicacion_id",
+    "piso": "piso_id",
+    "tipo_lugar": "lugar_tipo_lugar_id",
+}
+
+# Los mismos sobre ObjetoLugar: sector/ubicación/piso van a la ruta copiada
+# del lugar (ver ruta_lugar.py), sin joins
+FILTROS_RUTA = {
+    "sector": "sector_id",
+    "ubicacion": "ubicacion_id",
+    "piso": "piso_id",
+    "tipo_lugar": "lugar__lugar_tipo_lugar_id",
+}
+
+# Filtros sobre el objeto en sí, relativos a ObjetoLugar
+FILTROS_OBJETO = {
+    "categoria": "tipo_de_objeto__objeto__objeto_categoria_id",
+    "objeto": "tipo_de_objeto__objeto_id",
+    "tipo_objeto": "tipo_de_objeto_id",
+    "estado": "estado",
+    "marca": "tipo_de_objeto__marca",
+    "material": "tipo_de_objeto__material",
+}
+
+NOMBRES_FILTROS = tuple(FILTROS_LUGAR) + tuple(FILTROS_OBJETO)
+
+# Los que se filtran por id: si llega algo que no es número se ignoran
+FILTROS_ID = ("sector", "ubicacion", "piso", "tipo_lugar", "categoria", "objeto", "tipo_objeto")
+
+
+# Los mismos diez filtros sobre ResumenInventario (tabla de totales)
+FILTROS_RESUMEN = {
+    "sector": "sector_id",
+    "ubicacion": "ubicacion_id",
+    "piso": "piso_id",
+    "tipo_lugar": "tipo_lugar_id",
+    "categoria": "categoria_id",
+    "objeto": "objeto_id",
+    "tipo_objeto": "tipo_objeto_id",
+    "estado": "estado",
+    "marca": "tipo_objeto__marca",
+    "material": "tipo_objeto__material",
+}
+
+
+def leer_filtros(params):
+    """Devuelve {nombre: valor o None} para los diez filtros del resumen."""
+    filtros = {}
+    for nombre in NOMBRES_FILTROS:
+        valor = (params.get(nombre) or "").strip() or None
+        if valor and nombre in FILTROS_ID:
+            try:
+                valor = str(int(valor))
+            except ValueError:
+                valor = None
+        filtros[nombre] = valor
+    return filtros
+
+
+def hay_filtros(filtros, nombres=NOMBRES_FILTROS):
+    return any(filtros.get(n) for n in nombres)
+
+
+def filtrar_lugares(qs, filtros, prefijo=""):
+    for nombre, lookup in FILTROS_LUGAR.items():
+        if filtros.get(nombre):
+            qs = qs.filter(**{prefijo + lookup: filtros[nombre]})
+    return qs
+
+
+def filtrar_resumen(qs, filtros):
+    for nombre, lookup in FILTROS_RESUMEN.items():
+        if filtros.get(nombre):
+            qs = qs.filter(**{lookup: filtros[nombre]})
+    return qs
+
+
+def filtrar_objetos_lugar(qs, filtros, prefijo=""):
+    """
+    Aplica los filtros a un queryset de ObjetoLugar. `prefijo` permite
+    usarlos desde otro modelo, p. ej. "objeto_del_lugar__" en HistoricoObjeto.
+    """
+    for nombre, lookup in {**FILTROS_RUTA, **FILTROS_OBJETO}.items():
+        if filtros.get(nombre):
+            qs = qs.filter(**{prefijo + lookup: filtros[nombre]})
+    return qs
+
+
+# Filtros del listado de objetos del lugar (y de su export plano)
+FILTROS_LISTA = {
+    "lugar": "lugar_id",
+    "objeto": "tipo_de_objeto__objeto_id",
+    "tipo": "tipo_de_objeto_id",
+    "estado": "estado",
+}
+
+
+def leer_filtros_lista(params):
+    """Como leer_filtros pero para lugar/objeto/tipo/estado; lo inválido queda en ""."""
+    filtros = {}
+    for nombre in FILTROS_LISTA:
+        valor = (params.get(nombre) or "").strip()
+        if valor and nombre != "estado":
+            try:
+                valor = str(int(valor))
+            except ValueError:
+                valor = ""
+        filtros[nombre] = valor
+    return filtros
+
+
+def filtrar_lista(qs, filtros):
+    for nombre, lookup in FILTROS_LISTA.items():
+        if filtros.get(nombre):
+            qs = qs.filter(**{lookup: filtros[nombre]})
+    return qs
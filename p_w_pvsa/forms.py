@@ -107,6 +107,8 @@ class CrearHistorico(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields["objeto_del_lugar"].disabled = True
+        # Cada opción se muestra con los labels de lugar y tipo: una sola consulta
+        self.fields["objeto_del_lugar"].queryset = ObjetoLugar.objects.select_related("lugar", "tipo_de_objeto")
 
 
 # -------------------
@@ -415,4 +417,35 @@ ObjetoLugarFilaFormSet = formset_factory(
     ObjetoLugarFilaForm,
     extra=1,
     can_delete=False,
-)
\ No newline at end of file
+)
+
+class ImportarExcelForm(forms.Form):
+    archivo = forms.FileField(
+        label="Archivo Excel (.xlsx)",
+        widget=forms.ClearableFileInput(attrs={"class": "form-control", "accept": ".xlsx"}),
+    )
+    tipo_lugar = forms.ModelChoiceField(
+        label="Tipo de lugar para lugares nuevos",
+        queryset=TipoLugar.objects.all().order_by("tipo_de_lugar"),
+        required=False,
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+    dry_run = forms.BooleanField(
+        label="Solo simular (no guarda nada)",
+        required=False,
+        initial=True,
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
+
+
+class ActualizarExcelForm(forms.Form):
+    archivo = forms.FileField(
+        label="SECTORES.xlsx editado",
+        widget=forms.ClearableFileInput(attrs={"class": "form-control", "accept": ".xlsx"}),
+    )
+    dry_run = forms.BooleanField(
+        label="Solo simular (no guarda nada)",
+        required=False,
+        initial=True,
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
@@ -0,0 +1,204 @@
+"""
+Estado del inventario en una fecha pasada ("as of").
+
+HistoricoObjeto guarda el valor anterior de cada cambio pero sin hora y
+se borra junto con el objeto, así que no sirve para reconstruir. Se usan:
+
+- FotoInventario / FotoObjetoLugar: fotos completas tomadas cada tanto
+  (comando tomar_foto_inventario).
+- CambioObjetoLugar: cada alta/cambio/baja con sus valores nuevos.
+
+El estado a una fecha es la foto más cercana anterior más los cambios
+registrados entre la foto y esa fecha. Los totales de la foto se agrupan
+una vez al tomarla (FotoTotal); solo los objetos tocados después se miran
+uno a uno, y la jerarquía se lee solo para los lugares y tipos que quedan
+en el resultado.
+
+La jerarquía (a qué piso pertenece un lugar, a qué objeto un tipo) se toma
+como está hoy: solo se reconstruyen cantidad, estado, lugar y tipo.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cambios import cursor_actual
+from .models import (
+    CambioObjetoLugar, FotoInventario, FotoObjetoLugar, FotoTotal,
+    Lugar, ObjetoLugar, TipoObjeto,
+)
+from .resumen_totales import plegar_niveles
+
+FOTO_BATCH_SIZE = 2000
+
+
+class SinFoto(Exception):
+    """No hay ninguna foto anterior a la fecha pedida."""
+
+
+def limite_del_dia(fecha):
+    """Fin del día `fecha` (exclusivo) en la zona horaria local."""
+    return timezone.make_aware(datetime.combine(fecha + timedelta(days=1), time.min))
+
+
+def tomar_foto():
+    """Guarda el estado actual completo de ObjetoLugar como FotoInventario."""
+    with transaction.atomic():
+        foto = FotoInventario.objects.create(tomada=timezone.now(), cursor=cursor_actual())
+        filas = ObjetoLugar.objects.order_by().values_list(
+            "id", "lugar_id", "tipo_de_objeto_id", "cantidad", "estado"
+        )
+        lote = []
+        total = 0
+        grupos = {}
+        for ol_id, lugar_id, tipo_id, cantidad, estado in filas.iterator(chunk_size=FOTO_BATCH_SIZE):
+            lote.append(FotoObjetoLugar(
+                foto=foto, id_objeto_lugar=ol_id, id_lugar=lugar_id,
+                id_tipo_objeto=tipo_id, cantidad=cantidad, estado=estado,
+            ))
+            _acumular(grupos, (lugar_id, tipo_id, estado), cantidad or 0, 1)
+            if len(lote) >= FOTO_BATCH_SIZE:
+                FotoObjetoLugar.objects.bulk_create(lote)
+                total += len(lote)
+                lote = []
+        if lote:
+            FotoObjetoLugar.objects.bulk_create(lote)
+            total += len(lote)
+        FotoTotal.objects.bulk_create(
+            [
+                FotoTotal(foto=foto, id_lugar=lugar_id, id_tipo_objeto=tipo_id, estado=estado,
+                          cantidad=cantidad, filas=n)
+                for (lugar_id, tipo_id, estado), (cantidad, n) in grupos.items()
+            ],
+            batch_size=FOTO_BATCH_SIZE,
+        )
+        foto.filas = total
+        foto.save(update_fields=["filas"])
+    return foto
+
+
+def primer_dia_reconstruible():
+    """Primer día que se puede reconstruir (el de la foto más antigua); None sin fotos."""
+    primera = FotoInventario.objects.order_by("tomada").values_list("tomada", flat=True).first()
+    return timezone.localdate(primera) if primera else None
+
+
+def foto_para(limite):
+    foto = FotoInventario.objects.filter(tomada__lt=limite).order_by("-tomada").first()
+    if foto is None:
+        raise SinFoto(limite)
+    return foto
+
+
+def _acumular(grupos, clave, cantidad, filas):
+    # Solo en memoria (el dict de totales_al): no escribe en la base
+    c, n = grupos.get(clave, (0, 0))
+    grupos[clave] = (c + cantidad, n + filas)
+
+
+def totales_al(limite):
+    """
+    {(id_lugar, id_tipo_objeto, estado): cantidad} del inventario tal como
+    estaba justo antes de `limite` (datetime). Los grupos que quedan sin
+    filas se descartan.
+    """
+    foto = foto_para(limite)
+
+    # Último valor de cada objeto tocado entre la foto y el límite
+    ultimos = {}
+    cambios = (
+        CambioObjetoLugar.objects.filter(id__gt=foto.cursor, registrado__lt=limite)
+        .order_by("id")
+        .values_list("id_objeto_lugar", "accion", "id_lugar", "id_tipo_objeto", "cantidad", "estado")
+    )
+    for ol_id, accion, lugar_id, tipo_id, cantidad, estado in cambios.iterator():
+        ultimos[ol_id] = None if accion == "B" else (lugar_id, tipo_id, estado, cantidad)
+
+    grupos = {}
+    guardados = FotoTotal.objects.filter(foto=foto).values_list(
+        "id_lugar", "id_tipo_objeto", "estado", "cantidad", "filas"
+    )
+    for lugar_id, tipo_id, estado, cantidad, n in guardados.iterator(chunk_size=FOTO_BATCH_SIZE):
+        _acumular(grupos, (lugar_id, tipo_id, estado), cantidad, n)
+
+    # Se saca lo que los objetos tocados aportaban en la foto y se pone su valor al límite
+    tocados = list(ultimos)
+    for i in range(0, len(tocados), FOTO_BATCH_SIZE):
+        en_foto = FotoObjetoLugar.objects.filter(
+            foto=foto, id_objeto_lugar__in=tocados[i:i + FOTO_BATCH_SIZE]
+        ).values_list("id_lugar", "id_tipo_objeto", "estado", "cantidad")
+        for lugar_id, tipo_id, estado, cantidad in en_foto:
+            _acumular(grupos, (lugar_id, tipo_id, estado), -cantidad, -1)
+    for valor in ultimos.values():
+        if valor is not None:
+            lugar_id, tipo_id, estado, cantidad = valor
+            _acumular(grupos, (lugar_id, tipo_id, estado), cantidad or 0, 1)
+
+    return {clave: cantidad for clave, (cantidad, filas) in grupos.items() if filas > 0}
+
+
+def _por_id(qs, ids, *campos):
+    """{id: (campos...)} solo de `ids`, por lotes."""
+    ids = [i for i in ids if i is not None]
+    filas = {}
+    for i in range(0, len(ids), FOTO_BATCH_SIZE):
+        for fila in qs.filter(pk__in=ids[i:i + FOTO_BATCH_SIZE]).values_list("id", *campos):
+            filas[fila[0]] = fila[1:]
+    return filas
+
+
+def jerarquia_de(grupos, campos_lugar, campos_tipo):
+    """
+    ({lugar_id: campos_lugar}, {tipo_id: campos_tipo}) de la jerarquía de
+    hoy, solo para los lugares y tipos que aparecen en `grupos` (como los
+    devuelve totales_al).
+    """
+    return (
+        _por_id(Lugar.objects.all(), {lugar_id for lugar_id, _, _ in grupos}, *campos_lugar),
+        _por_id(TipoObjeto.objects.all(), {tipo_id for _, tipo_id, _ in grupos}, *campos_tipo),
+    )
+
+
+def resumen_por_niveles_al(limite, filtros):
+    """
+    Igual que resumen_totales.resumen_por_niveles pero con el inventario
+    a la fecha `limite`, aplicando los diez filtros del resumen.
+    """
+    grupos = totales_al(limite)
+    lugares, tipos = jerarquia_de(
+        grupos,
+        ("piso_id", "piso__ubicacion_id", "piso__ubicacion__ubicacion",
+         "piso__ubicacion__sector_id", "piso__ubicacion__sector__sector", "lugar_tipo_lugar_id"),
+        ("objeto_id", "objeto__nombre_del_objeto", "objeto__objeto_categoria_id", "marca", "material"),
+    )
+
+    def _id(nombre):
+        return int(filtros[nombre]) if filtros.get(nombre) else None
+
+    f_sector, f_ubicacion, f_piso = _id("sector"), _id("ubicacion"), _id("piso")
+    f_tipo_lugar, f_categoria = _id("tipo_lugar"), _id("categoria")
+    f_objeto, f_tipo_objeto = _id("objeto"), _id("tipo_objeto")
+    f_estado, f_marca, f_material = filtros.get("estado"), filtros.get("marca"), filtros.get("material")
+
+    def _filas():
+        vacio_lugar = (None,) * 6
+        vacio_tipo = (None,) * 5
+        for (lugar_id, tipo_id, estado), cantidad in grupos.items():
+            piso_id, ubicacion_id, ubicacion, sector_id, sector, tipo_lugar_id = lugares.get(lugar_id, vacio_lugar)
+            objeto_id, objeto, categoria_id, marca, material = tipos.get(tipo_id, vacio_tipo)
+            if (
+                (f_sector and sector_id != f_sector)
+                or (f_ubicacion and ubicacion_id != f_ubicacion)
+                or (f_piso and piso_id != f_piso)
+                or (f_tipo_lugar and tipo_lugar_id != f_tipo_lugar)
+                or (f_categoria and categoria_id != f_categoria)
+                or (f_objeto and objeto_id != f_objeto)
+                or (f_tipo_objeto and tipo_id != f_tipo_objeto)
+                or (f_estado and estado != f_estado)
+                or (f_marca and marca != f_marca)
+                or (f_material and material != f_material)
+            ):
+                continue
+            yield sector_id, sector, ubicacion_id, ubicacion, objeto_id, objeto, estado, cantidad
+
+    return plegar_niveles(_filas())
@@ -0,0 +1,169 @@
+import time
+import tracemalloc
+from copy import copy
+from datetime import date
+from io import BytesIO
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from openpyxl import Workbook
+from openpyxl.styles import Font
+
+from p_w_pvsa import excel_utils as xu
+
+
+def _filas(n_filas, por_lugar):
+    estados = ("B", "P", "M")
+    lugares = []
+    for i in range(0, n_filas, por_lugar):
+        filas = [
+            xu.FilaObjeto(j, f"Objeto {j % 40}", "Marca", "Material", j % 9, estados[j % 3], "", date(2025, 1, 1))
+            for j in range(i, min(i + por_lugar, n_filas))
+        ]
+        lugares.append((SimpleNamespace(nombre_del_lugar=f"Lugar {i}"), filas))
+    return lugares
+
+
+def _copias_normal(lugares):
+    """Escritura como antes: Workbook en memoria, copy() de estilos por celda."""
+
+    def style_row(ws, row, fill=None, font=None, align=None):
+        for c in range(1, xu.N_COLS + 1):
+            cell = ws.cell(row=row, column=c)
+            cell.border = xu.BORDER
+            if fill:
+                cell.fill = copy(fill)
+            if font:
+                cell.font = copy(font)
+            if align:
+                cell.alignment = copy(align)
+
+    wb = Workbook()
+    ws = wb.active
+    r = 1
+    for lugar, filas in lugares:
+        ws.merge_cells(start_row=r, start_column=1, end_row=r, end_column=xu.N_COLS)
+        title_font = Font(bold=True, size=12)
+        ws.cell(r, 1, lugar.nombre_del_lugar)
+        style_row(ws, r, fill=xu.FILL_TITLE, font=title_font, align=xu.CENTER)
+        r += 1
+        for i, h in enumerate(xu.HEADERS, start=1):
+            cell = ws.cell(r, i, h)
+            cell.font = xu.FONT_HDR
+            cell.alignment = xu.CENTER
+            cell.fill = xu.FILL_TITLE
+            cell.border = xu.BORDER
+        r += 1
+        for f in filas:
+            valores = [f.objeto, f"{f.marca} - {f.material}", f.cantidad,
+                       xu.ESTADO_DISPLAY[f.estado], f.detalle or "-", f.fecha]
+            for c, v in enumerate(valores, start=1):
+                cell = ws.cell(r, c, v)
+                cell.font = xu.FONT_CELL
+                cell.border = xu.BORDER
+                cell.alignment = xu.LEFT if c in (1, 2, 5) else xu.CENTER
+            ws.cell(r, 4).fill = xu.FILL_POR_ESTADO[f.estado]
+            ws.cell(r, 6).number_format = xu.FORMATO_FECHA
+            cell = ws.cell(r, 7, f.id)
+            cell.font = xu.FONT_CELL
+            cell.border = xu.BORDER
+            cell.alignment = xu.CENTER
+            r += 1
+        r += 1
+    bio = BytesIO()
+    wb.save(bio)
+
+
+def _nombres_normal(lugares):
+    """Estilos con nombre sobre un Workbook en memoria: solo cambia el estilado."""
+    wb = Workbook()
+    xu.registrar_estilos(wb)
+    ws = wb.active
+    r = 1
+    for lugar, filas in lugares:
+        ws.merge_cells(start_row=r, start_column=1, end_row=r, end_column=xu.N_COLS)
+        for c in range(1, xu.N_COLS + 1):
+            ws.cell(r, c, lugar.nombre_del_lugar if c == 1 else None).style = xu.ESTILO_LUGAR
+        r += 1
+        for c, h in enumerate(xu.HEADERS + [xu.HEADER_ID], start=1):
+            ws.cell(r, c, h).style = xu.ESTILO_HDR
+        r += 1
+        for f in filas:
+            celdas = [
+                (f.objeto, xu.ESTILO_CELDA),
+                (f"{f.marca} - {f.material}", xu.ESTILO_CELDA),
+                (f.cantidad, xu.ESTILO_CELDA_CENTRO),
+                (xu.ESTADO_DISPLAY[f.estado], xu.ESTILO_POR_ESTADO[f.estado]),
+                (f.detalle or "-", xu.ESTILO_CELDA),
+                (f.fecha, xu.ESTILO_FECHA),
+                (f.id, xu.ESTILO_CELDA_CENTRO),
+            ]
+            for c, (v, estilo) in enumerate(celdas, start=1):
+                ws.cell(r, c, v).style = estilo
+            r += 1
+        r += 1
+    bio = BytesIO()
+    wb.save(bio)
+
+
+def _nombres_write_only(lugares):
+    """Escritura actual: estilos con nombre y Workbook write-only."""
+    wb = Workbook(write_only=True)
+    xu.registrar_estilos(wb)
+    ws = wb.create_sheet("bench")
+    r = 1
+    for lugar, filas in lugares:
+        r = xu._write_lugar_block(ws, r, lugar, filas)
+    bio = BytesIO()
+    wb.save(bio)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara tiempo y memoria pico del Excel separando los dos cambios: "
+        "copy() por celda vs estilos con nombre (ambos en un Workbook normal) "
+        "y Workbook normal vs write-only (ambos con estilos con nombre)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filas", type=int, default=10000)
+        parser.add_argument("--por-lugar", type=int, default=20)
+        parser.add_argument("--repeticiones", type=int, default=3)
+
+    def _medir(self, fn, lugares, repeticiones):
+        # El tiempo se mide sin tracemalloc (lo distorsiona); la memoria en una pasada aparte
+        tiempos = []
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            fn(lugares)
+            tiempos.append(time.perf_counter() - t0)
+
+        tracemalloc.start()
+        fn(lugares)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return min(tiempos), pico
+
+    def handle(self, *args, **opts):
+        n = opts["filas"]
+        lugares = _filas(n, opts["por_lugar"])
+        escala = 10000 / n
+
+        self.stdout.write(f"{n} filas, {len(lugares)} lugares (valores por cada 10k filas)")
+        medidas = {}
+        for nombre, fn in (
+            ("copy(), normal", _copias_normal),
+            ("con nombre, normal", _nombres_normal),
+            ("con nombre, write-only", _nombres_write_only),
+        ):
+            dt, pico = medidas[nombre] = self._medir(fn, lugares, opts["repeticiones"])
+            self.stdout.write(
+                f"{nombre:24s} tiempo: {dt * escala:7.3f} s   memoria pico: {pico * escala / 2**20:7.1f} MiB"
+            )
+
+        def _efecto(titulo, antes, despues):
+            (t0, m0), (t1, m1) = medidas[antes], medidas[despues]
+            self.stdout.write(f"{titulo:24s} tiempo x{t0 / t1:5.2f}   memoria x{m0 / m1:5.2f}")
+
+        _efecto("efecto de los estilos", "copy(), normal", "con nombre, normal")
+        _efecto("efecto de write-only", "con nombre, normal", "con nombre, write-only")
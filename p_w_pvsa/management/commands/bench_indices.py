@@ -0,0 +1,214 @@
+import re
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from p_w_pvsa.busqueda import consulta_prefijo
+from p_w_pvsa.etiquetas import rehacer_labels
+from p_w_pvsa.excel_utils import ORDEN_HOJAS
+from p_w_pvsa.filtros import filtrar_lista, filtrar_objetos_lugar
+from p_w_pvsa.models import (
+    CambioObjetoLugar, CategoriaObjeto, HistoricoObjeto, Lugar, Objeto,
+    ObjetoLugar, Piso, Sector, TipoLugar, TipoObjeto, Ubicacion,
+)
+from p_w_pvsa.paginacion import consulta_keyset, pagina_keyset
+from p_w_pvsa.views import ORDEN_HISTORICOS, ORDEN_MALOS, ORDEN_OBJETOS_LUGAR
+
+BATCH_SIZE = 2000
+
+# Tablas chicas (catálogos de decenas de filas): recorrerlas enteras no es problema
+TABLAS_CHICAS = {
+    Sector._meta.db_table, Ubicacion._meta.db_table, Piso._meta.db_table,
+    TipoLugar._meta.db_table, CategoriaObjeto._meta.db_table,
+}
+
+
+def _generar(n_lugares, por_lugar):
+    """Inventario sintético con bulk_create (sin señales); devuelve ids de muestra."""
+    sectores = Sector.objects.bulk_create([Sector(sector=f"Bench S{i}") for i in range(5)])
+    ubicaciones = Ubicacion.objects.bulk_create(
+        [Ubicacion(ubicacion=f"Bench U{i}", sector=sectores[i % 5]) for i in range(max(1, n_lugares // 100))]
+    )
+    pisos = Piso.objects.bulk_create(
+        [Piso(piso=p + 1, ubicacion=u) for u in ubicaciones for p in range(5)]
+    )
+    tipos_lugar = TipoLugar.objects.bulk_create([TipoLugar(tipo_de_lugar=f"Bench TL{i}") for i in range(8)])
+    lugares = Lugar.objects.bulk_create(
+        [
+            Lugar(nombre_del_lugar=f"Lugar {i}", piso=pisos[i % len(pisos)], lugar_tipo_lugar=tipos_lugar[i % 8])
+            for i in range(n_lugares)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    categorias = CategoriaObjeto.objects.bulk_create(
+        [CategoriaObjeto(nombre_de_categoria=f"Bench C{i}") for i in range(10)]
+    )
+    objetos = Objeto.objects.bulk_create(
+        [Objeto(nombre_del_objeto=f"Bench O{i}", objeto_categoria=categorias[i % 10]) for i in range(200)]
+    )
+    tipos = TipoObjeto.objects.bulk_create(
+        [TipoObjeto(objeto=objetos[i % 200], marca=f"M{i % 30}", material=f"Mat{i % 7}") for i in range(1000)]
+    )
+
+    estados = ("B", "B", "B", "P", "M")
+    ols = ObjetoLugar.objects.bulk_create(
+        [
+            ObjetoLugar(lugar=lugares[i // por_lugar], tipo_de_objeto=tipos[(i * 7) % 1000],
+                        cantidad=1 + i % 9, estado=estados[i % 5])
+            for i in range(n_lugares * por_lugar)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    hoy = date.today()
+    HistoricoObjeto.objects.bulk_create(
+        [
+            HistoricoObjeto(objeto_del_lugar=ol, cantidad_anterior=ol.cantidad, estado_anterior=estados[i % 5],
+                            fecha_anterior=hoy - timedelta(days=i % 730))
+            for i, ol in enumerate(ols)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    CambioObjetoLugar.objects.bulk_create(
+        [
+            CambioObjetoLugar(id_objeto_lugar=ol.pk, accion="C", id_lugar=ol.lugar_id,
+                              id_tipo_objeto=ol.tipo_de_objeto_id, cantidad=ol.cantidad, estado=ol.estado)
+            for ol in ols
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    # bulk_create no arma los labels que usa la búsqueda
+    rehacer_labels()
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+    medio = ols[len(ols) // 2]
+    return {
+        "sector": medio.sector_id,
+        "ubicacion": medio.ubicacion_id,
+        "lugar": medio.lugar_id,
+        "tipo": medio.tipo_de_objeto_id,
+        "objeto": tipos[(len(ols) // 2 * 7) % 1000].objeto_id,
+        "objeto_lugar": medio.pk,
+        "cursor": CambioObjetoLugar.objects.order_by("-id").values_list("id", flat=True)[100],
+    }
+
+
+def _consultas(m):
+    """(nombre, queryset) de las consultas calientes, armadas como en las vistas."""
+    objetos = ObjetoLugar.objects.select_related("lugar__piso__ubicacion__sector", "tipo_de_objeto__objeto")
+    historicos = HistoricoObjeto.objects.select_related(
+        "objeto_del_lugar__lugar__piso__ubicacion__sector", "objeto_del_lugar__tipo_de_objeto__objeto"
+    )
+    _, cursor_hist = pagina_keyset(historicos, ORDEN_HISTORICOS, None, 50)
+
+    def lista(filtros):
+        return consulta_keyset(filtrar_lista(objetos, {"lugar": "", "objeto": "", "tipo": "", "estado": "", **filtros}),
+                               ORDEN_OBJETOS_LUGAR, None, 50)
+
+    return [
+        ("objetos sin filtros", lista({})),
+        ("objetos por lugar", lista({"lugar": m["lugar"]})),
+        ("objetos por tipo", lista({"tipo": m["tipo"]})),
+        ("objetos por objeto", lista({"objeto": m["objeto"]})),
+        ("objetos por tipo y estado", lista({"tipo": m["tipo"], "estado": "M"})),
+        ("malos por objeto", consulta_keyset(
+            ObjetoLugar.objects.filter(estado="M", tipo_de_objeto__objeto_id=m["objeto"], lugar__isnull=False),
+            ORDEN_MALOS, None, 50,
+        )),
+        ("malos por objeto en un sector", consulta_keyset(
+            filtrar_objetos_lugar(
+                ObjetoLugar.objects.filter(estado="M", tipo_de_objeto__objeto_id=m["objeto"], lugar__isnull=False),
+                {"sector": m["sector"]},
+            ),
+            ORDEN_MALOS, None, 50,
+        )),
+        ("objetos de una ubicación (excel)", ObjetoLugar.objects.filter(ubicacion__in=[m["ubicacion"]]).order_by(
+            *(f"ubicacion__{campo}" for campo in ORDEN_HOJAS), "id")),
+        ("detalle de lugar", ObjetoLugar.objects.filter(lugar_id=m["lugar"]).order_by("-fecha")),
+        ("detalle de tipo de objeto", ObjetoLugar.objects.filter(tipo_de_objeto_id=m["tipo"]).order_by("-fecha")),
+        ("históricos, primera página", consulta_keyset(historicos, ORDEN_HISTORICOS, None, 50)),
+        ("históricos, página siguiente", consulta_keyset(historicos, ORDEN_HISTORICOS, cursor_hist, 50)),
+        ("históricos por estado", consulta_keyset(
+            historicos.filter(estado_anterior="M"), ORDEN_HISTORICOS, None, 50
+        )),
+        ("históricos de un objeto", HistoricoObjeto.objects.filter(
+            objeto_del_lugar_id=m["objeto_lugar"]).order_by("-fecha_anterior")),
+        ("cambios desde cursor", CambioObjetoLugar.objects.filter(id__gt=m["cursor"]).order_by("id")[:5000]),
+        ("typeahead de lugares", consulta_prefijo("lugares", "lugar 12")),
+        ("typeahead de objetos", consulta_prefijo("objetos", "bench o1")),
+        ("typeahead de tipos de objeto", consulta_prefijo("tipos-objeto", "bench o1")),
+        ("cursor para fecha", CambioObjetoLugar.objects.filter(
+            registrado__lt=timezone.now() - timedelta(days=1)).order_by("-id").values_list("id", flat=True)[:1]),
+    ]
+
+
+def _plan(qs):
+    sql, params = qs.query.sql_with_params()
+    prefijo = "EXPLAIN QUERY PLAN " if connection.vendor == "sqlite" else "EXPLAIN "
+    with connection.cursor() as cursor:
+        cursor.execute(prefijo + sql, params)
+        return [fila[-1] for fila in cursor.fetchall()]
+
+
+def _escaneos_completos(plan):
+    """
+    Tablas grandes que el plan recorre enteras: SCAN sin índice, o SCAN por
+    un índice que no da el orden (después hay que ordenar todo igual).
+    """
+    ordena_todo = any(linea.strip() == "USE TEMP B-TREE FOR ORDER BY" for linea in plan)
+    tablas = []
+    for linea in plan:
+        if connection.vendor == "sqlite":
+            m = re.match(r"\s*SCAN (\S+)(.*)", linea)
+            if m and ("USING" not in m.group(2) or ordena_todo):
+                tablas.append(m.group(1))
+        else:
+            m = re.search(r"Seq Scan on (\S+)", linea)
+            if m:
+                tablas.append(m.group(1))
+    return [t for t in tablas if t not in TABLAS_CHICAS]
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un inventario grande dentro de una transacción (se descarta al "
+        "final), corre EXPLAIN sobre las consultas calientes de las vistas y "
+        "falla si alguna recorre una tabla grande entera."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lugares", type=int, default=5000)
+        parser.add_argument("--por-lugar", type=int, default=10)
+        parser.add_argument("--plan", action="store_true", help="Muestra el plan completo de cada consulta")
+
+    def handle(self, *args, **opts):
+        fallas = []
+        with transaction.atomic():
+            inicio = time.perf_counter()
+            muestra = _generar(opts["lugares"], opts["por_lugar"])
+            self.stdout.write(
+                f"Datos: {opts['lugares'] * opts['por_lugar']} objetos generados en "
+                f"{time.perf_counter() - inicio:.1f}s ({connection.vendor})"
+            )
+
+            for nombre, qs in _consultas(muestra):
+                plan = _plan(qs)
+                inicio = time.perf_counter()
+                list(qs)
+                ms = (time.perf_counter() - inicio) * 1000
+                escaneos = _escaneos_completos(plan)
+                estado = f"ESCANEO COMPLETO: {', '.join(escaneos)}" if escaneos else "ok"
+                self.stdout.write(f"{nombre:<32} {ms:8.1f} ms  {estado}")
+                if opts["plan"] or escaneos:
+                    for linea in plan:
+                        self.stdout.write(f"    {linea}")
+                if escaneos:
+                    fallas.append(nombre)
+
+            transaction.set_rollback(True)
+
+        if fallas:
+            raise CommandError(f"Consultas sin índice: {', '.join(fallas)}")
@@ -0,0 +1,64 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from p_w_pvsa.cambios import cambios_desde
+from p_w_pvsa.export_plano import FORMATOS_PLANO, PLANO_CHUNK_SIZE, stream_inventario_plano
+from p_w_pvsa.filtros import FILTROS_LISTA, leer_filtros_lista
+
+
+class Command(BaseCommand):
+    help = "Exporta el inventario plano (una fila por ObjetoLugar) en CSV o JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--formato", choices=sorted(FORMATOS_PLANO), default="csv")
+        parser.add_argument("--salida", help="Archivo de destino (por defecto stdout)")
+        parser.add_argument("--chunk-size", type=int, default=PLANO_CHUNK_SIZE)
+        parser.add_argument(
+            "--cursor", type=int,
+            help="Solo lo cambiado después de este cursor (JSONL con op upsert/borrar); el nuevo cursor sale por stderr",
+        )
+        for nombre in FILTROS_LISTA:
+            parser.add_argument(f"--{nombre}", help=f"Mismo filtro '{nombre}' del listado de objetos del lugar")
+
+    def handle(self, *args, **opts):
+        if opts["chunk_size"] < 1:
+            raise CommandError("--chunk-size debe ser mayor que 0")
+
+        if opts["cursor"] is not None:
+            return self._incremental(opts)
+
+        filtros = leer_filtros_lista({n: opts[n] for n in FILTROS_LISTA})
+        bloques = stream_inventario_plano(opts["formato"], filtros, chunk_size=opts["chunk_size"])
+
+        if not opts["salida"]:
+            for bloque in bloques:
+                self.stdout.write(bloque, ending="")
+            return
+
+        # newline="" para que csv controle los saltos de línea
+        with open(opts["salida"], "w", encoding="utf-8", newline="") as fh:
+            for bloque in bloques:
+                fh.write(bloque)
+        self.stderr.write(f"Inventario exportado a {opts['salida']}")
+
+    def _incremental(self, opts):
+        cursor = opts["cursor"]
+        fh = open(opts["salida"], "w", encoding="utf-8") if opts["salida"] else None
+        try:
+            while True:
+                pagina = cambios_desde(cursor)
+                lineas = [json.dumps({"op": "upsert", **fila}, ensure_ascii=False) for fila in pagina["cambiados"]]
+                lineas += [json.dumps({"op": "borrar", "id": ol_id}) for ol_id in pagina["borrados"]]
+                for linea in lineas:
+                    if fh:
+                        fh.write(linea + "\n")
+                    else:
+                        self.stdout.write(linea)
+                cursor = pagina["cursor"]
+                if not pagina["hay_mas"]:
+                    break
+        finally:
+            if fh:
+                fh.close()
+        self.stderr.write(f"cursor={cursor}")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from p_w_pvsa.data_version import bump_data_version
+from p_w_pvsa.models import ResumenInventario
+from p_w_pvsa.resumen_totales import recalcular_resumen
+
+
+class Command(BaseCommand):
+    help = "Rehace desde cero la tabla de totales del resumen general (ResumenInventario)."
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            recalcular_resumen()
+            # Lo que estaba en caché se calculó con la tabla anterior
+            bump_data_version()
+        self.stdout.write(f"Resumen reconstruido: {ResumenInventario.objects.count()} grupos")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from p_w_pvsa.etiquetas import rehacer_labels
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula la columna label de ubicaciones, pisos, lugares, objetos y "
+        "tipos de objeto (p. ej. tras un bulk_create o un QuerySet.update)."
+    )
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            corregidos = rehacer_labels()
+        for modelo, n in corregidos.items():
+            self.stdout.write(f"{modelo}: {n} labels corregidos")
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from p_w_pvsa.data_version import bump_data_version
+from p_w_pvsa.resumen_totales import recalcular_resumen
+from p_w_pvsa.ruta_lugar import reparar_ruta
+
+
+class Command(BaseCommand):
+    help = (
+        "Revisa la ruta (piso, ubicación, sector) copiada en ObjetoLugar y "
+        "HistoricoObjeto contra la jerarquía real y corrige las filas desfasadas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--solo-revisar", action="store_true",
+            help="Solo cuenta las filas desfasadas, sin corregirlas",
+        )
+
+    def handle(self, *args, **opts):
+        with transaction.atomic():
+            desfasadas = reparar_ruta(solo_revisar=opts["solo_revisar"])
+            if not opts["solo_revisar"] and desfasadas["objetos"]:
+                # Los totales se agrupan por la ruta copiada
+                recalcular_resumen()
+            if not opts["solo_revisar"] and any(desfasadas.values()):
+                bump_data_version()
+
+        verbo = "desfasados" if opts["solo_revisar"] else "corregidos"
+        self.stdout.write(
+            f"ObjetoLugar {verbo}: {desfasadas['objetos']}; "
+            f"HistoricoObjeto {verbo}: {desfasadas['historicos']}"
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from p_w_pvsa.historia import tomar_foto
+
+
+class Command(BaseCommand):
+    help = (
+        "Guarda una foto completa del inventario. Con fotos periódicas (p. ej. "
+        "semanales desde cron) el resumen puede reconstruir cualquier fecha posterior."
+    )
+
+    def handle(self, *args, **opts):
+        foto = tomar_foto()
+        self.stdout.write(f"Foto #{foto.pk} tomada: {foto.filas} objetos, cursor {foto.cursor}")
@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('p_w_pvsa', '0003_versiondatos_exportacionexcel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioObjetoLugar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_objeto_lugar', models.PositiveBigIntegerField()),
+                ('accion', models.CharField(choices=[('C', 'Creado'), ('M', 'Modificado'), ('B', 'Borrado')], max_length=1)),
+                ('registrado', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
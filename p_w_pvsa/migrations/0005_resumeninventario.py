@@ -0,0 +1,68 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def llenar_resumen(apps, schema_editor):
+    # Misma agrupación que resumen_totales.recalcular_resumen, con los modelos históricos
+    ObjetoLugar = apps.get_model("p_w_pvsa", "ObjetoLugar")
+    ResumenInventario = apps.get_model("p_w_pvsa", "ResumenInventario")
+    filas = (
+        ObjetoLugar.objects.order_by()
+        .values(
+            "lugar__piso__ubicacion__sector_id", "lugar__piso__ubicacion_id", "lugar__piso_id",
+            "lugar__lugar_tipo_lugar_id", "tipo_de_objeto__objeto__objeto_categoria_id",
+            "tipo_de_objeto__objeto_id", "tipo_de_objeto_id", "estado",
+        )
+        .annotate(suma=Sum("cantidad"), n=Count("id"))
+    )
+    ResumenInventario.objects.bulk_create(
+        [
+            ResumenInventario(
+                sector_id=f["lugar__piso__ubicacion__sector_id"],
+                ubicacion_id=f["lugar__piso__ubicacion_id"],
+                piso_id=f["lugar__piso_id"],
+                tipo_lugar_id=f["lugar__lugar_tipo_lugar_id"],
+                categoria_id=f["tipo_de_objeto__objeto__objeto_categoria_id"],
+                objeto_id=f["tipo_de_objeto__objeto_id"],
+                tipo_objeto_id=f["tipo_de_objeto_id"],
+                estado=f["estado"],
+                cantidad=f["suma"] or 0,
+                filas=f["n"],
+            )
+            for f in filas
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('p_w_pvsa', '0004_cambioobjetolugar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado', models.CharField(choices=[('B', 'Bueno'), ('P', 'Pendiente'), ('M', 'Malo')], max_length=1)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('filas', models.IntegerField(default=0)),
+                ('categoria', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='p_w_pvsa.categoriaobjeto')),
+                ('objeto', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='p_w_pvsa.objeto')),
+                ('piso', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='p_w_pvsa.piso')),
+                ('sector', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='p_w_pvsa.sector')),
+                ('tipo_lugar', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='p_w_pvsa.tipolugar')),
+                ('tipo_objeto', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='p_w_pvsa.tipoobjeto')),
+                ('ubicacion', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='p_w_pvsa.ubicacion')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['piso', 'tipo_lugar', 'tipo_objeto', 'estado'], name='resumen_inv_clave_idx')],
+            },
+        ),
+        migrations.RunPython(llenar_resumen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('p_w_pvsa', '0005_resumeninventario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FotoInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tomada', models.DateTimeField(db_index=True)),
+                ('cursor', models.PositiveBigIntegerField()),
+                ('filas', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cambioobjetolugar',
+            name='cantidad',
+            field=models.SmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cambioobjetolugar',
+            name='estado',
+            field=models.CharField(blank=True, choices=[('B', 'Bueno'), ('P', 'Pendiente'), ('M', 'Malo')], max_length=1),
+        ),
+        migrations.AddField(
+            model_name='cambioobjetolugar',
+            name='id_lugar',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='cambioobjetolugar',
+            name='id_tipo_objeto',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='FotoObjetoLugar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_objeto_lugar', models.PositiveBigIntegerField()),
+                ('id_lugar', models.PositiveBigIntegerField(null=True)),
+                ('id_tipo_objeto', models.PositiveBigIntegerField(null=True)),
+                ('cantidad', models.SmallIntegerField()),
+                ('estado', models.CharField(choices=[('B', 'Bueno'), ('P', 'Pendiente'), ('M', 'Malo')], max_length=1)),
+                ('foto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='objetos', to='p_w_pvsa.fotoinventario')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['foto', 'id_objeto_lugar'], name='foto_objeto_lugar_idx')],
+            },
+        ),
+    ]
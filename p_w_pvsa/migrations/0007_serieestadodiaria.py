@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('p_w_pvsa', '0006_fotos_inventario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SerieEstadoDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('buenas', models.IntegerField(default=0)),
+                ('pendientes', models.IntegerField(default=0)),
+                ('malas', models.IntegerField(default=0)),
+                ('categoria', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='p_w_pvsa.categoriaobjeto')),
+                ('sector', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='p_w_pvsa.sector')),
+                ('ubicacion', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='p_w_pvsa.ubicacion')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha', 'sector', 'ubicacion', 'categoria'], name='serie_estado_fecha_idx')],
+            },
+        ),
+    ]
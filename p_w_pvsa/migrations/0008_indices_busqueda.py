@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('p_w_pvsa', '0007_serieestadodiaria'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lugar',
+            index=models.Index(django.db.models.functions.text.Upper('nombre_del_lugar'), name='lugar_nombre_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='objeto',
+            index=models.Index(django.db.models.functions.text.Upper('nombre_del_objeto'), name='objeto_nombre_upper_idx'),
+        ),
+    ]
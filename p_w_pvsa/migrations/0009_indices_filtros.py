@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('p_w_pvsa', '0008_indices_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historicoobjeto',
+            index=models.Index(fields=['-fecha_anterior', 'id'], name='hist_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicoobjeto',
+            index=models.Index(fields=['objeto_del_lugar', '-fecha_anterior'], name='hist_objeto_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historicoobjeto',
+            index=models.Index(fields=['estado_anterior', '-fecha_anterior'], name='hist_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='objetolugar',
+            index=models.Index(fields=['lugar', '-fecha'], name='ol_lugar_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='objetolugar',
+            index=models.Index(fields=['tipo_de_objeto', '-fecha'], name='ol_tipo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='objetolugar',
+            index=models.Index(fields=['tipo_de_objeto', 'estado'], name='ol_tipo_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='objetolugar',
+            index=models.Index(fields=['estado', 'lugar'], name='ol_estado_lugar_idx'),
+        ),
+    ]
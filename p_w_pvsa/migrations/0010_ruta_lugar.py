@@ -0,0 +1,66 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def llenar_ruta(apps, schema_editor):
+    # Lo mismo que ruta_lugar.reparar_ruta, en dos UPDATE con subconsultas
+    Lugar = apps.get_model("p_w_pvsa", "Lugar")
+    ObjetoLugar = apps.get_model("p_w_pvsa", "ObjetoLugar")
+    HistoricoObjeto = apps.get_model("p_w_pvsa", "HistoricoObjeto")
+
+    lugar = Lugar.objects.filter(pk=OuterRef("lugar_id"))
+    ObjetoLugar.objects.update(
+        piso_id=Subquery(lugar.values("piso_id")[:1]),
+        ubicacion_id=Subquery(lugar.values("piso__ubicacion_id")[:1]),
+        sector_id=Subquery(lugar.values("piso__ubicacion__sector_id")[:1]),
+    )
+    objeto = ObjetoLugar.objects.filter(pk=OuterRef("objeto_del_lugar_id"))
+    HistoricoObjeto.objects.update(
+        piso_id=Subquery(objeto.values("piso_id")[:1]),
+        ubicacion_id=Subquery(objeto.values("ubicacion_id")[:1]),
+        sector_id=Subquery(objeto.values("sector_id")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('p_w_pvsa', '0009_indices_filtros'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicoobjeto',
+            name='piso',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='+', to='p_w_pvsa.piso'),
+        ),
+        migrations.AddField(
+            model_name='historicoobjeto',
+            name='sector',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='+', to='p_w_pvsa.sector'),
+        ),
+        migrations.AddField(
+            model_name='historicoobjeto',
+            name='ubicacion',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='+', to='p_w_pvsa.ubicacion'),
+        ),
+        migrations.AddField(
+            model_name='objetolugar',
+            name='piso',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='+', to='p_w_pvsa.piso'),
+        ),
+        migrations.AddField(
+            model_name='objetolugar',
+            name='sector',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='+', to='p_w_pvsa.sector'),
+        ),
+        migrations.AddField(
+            model_name='objetolugar',
+            name='ubicacion',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='+', to='p_w_pvsa.ubicacion'),
+        ),
+        migrations.RunPython(llenar_ruta, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+def llenar_labels(apps, schema_editor):
+    # Mismo texto que armar_label() de cada modelo (los modelos históricos no lo tienen)
+    def texto_tipo(objeto, marca, material):
+        return f"{objeto} - {(marca or '').strip()} {(material or '').strip()}".strip()
+
+    labels = (
+        ("Ubicacion", ("ubicacion", "sector__sector"), lambda u, s: f"{u} | Sector: {s}"),
+        ("Piso", ("piso", "ubicacion__ubicacion"), lambda p, u: f"Piso {p} | {u}"),
+        ("Lugar", ("nombre_del_lugar", "piso__piso", "piso__ubicacion__ubicacion"),
+         lambda n, p, u: f"{n} | Piso {p} | {u}"),
+        ("Objeto", ("nombre_del_objeto", "objeto_categoria__nombre_de_categoria"), lambda o, c: f"{o} ({c})"),
+        ("TipoObjeto", ("objeto__nombre_del_objeto", "marca", "material"), texto_tipo),
+    )
+    for nombre, campos, armar in labels:
+        modelo = apps.get_model("p_w_pvsa", nombre)
+        filas = [modelo(pk=pk, label=armar(*valores)) for pk, *valores in modelo.objects.values_list("pk", *campos)]
+        modelo.objects.bulk_update(filas, ["label"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('p_w_pvsa', '0010_ruta_lugar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lugar',
+            name='label',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=320),
+        ),
+        migrations.AddField(
+            model_name='objeto',
+            name='label',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=320),
+        ),
+        migrations.AddField(
+            model_name='piso',
+            name='label',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=320),
+        ),
+        migrations.AddField(
+            model_name='tipoobjeto',
+            name='label',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=320),
+        ),
+        migrations.AddField(
+            model_name='ubicacion',
+            name='label',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=320),
+        ),
+        migrations.RunPython(llenar_labels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+def llenar_label_busqueda(apps, schema_editor):
+    for nombre in ("Ubicacion", "Piso", "Lugar", "Objeto", "TipoObjeto"):
+        modelo = apps.get_model("p_w_pvsa", nombre)
+        filas = [
+            modelo(pk=pk, label_busqueda=label.lower())
+            for pk, label in modelo.objects.values_list("pk", "label")
+        ]
+        modelo.objects.bulk_update(filas, ["label_busqueda"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('p_w_pvsa', '0011_labels'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='lugar',
+            name='lugar_nombre_upper_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='objeto',
+            name='objeto_nombre_upper_idx',
+        ),
+        migrations.AddField(
+            model_name='lugar',
+            name='label_busqueda',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=320),
+        ),
+        migrations.AddField(
+            model_name='objeto',
+            name='label_busqueda',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=320),
+        ),
+        migrations.AddField(
+            model_name='piso',
+            name='label_busqueda',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=320),
+        ),
+        migrations.AddField(
+            model_name='tipoobjeto',
+            name='label_busqueda',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=320),
+        ),
+        migrations.AddField(
+            model_name='ubicacion',
+            name='label_busqueda',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=320),
+        ),
+        migrations.RunPython(llenar_label_busqueda, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+CLAVE = ("sector_id", "ubicacion_id", "piso_id", "tipo_lugar_id", "categoria_id", "objeto_id", "tipo_objeto_id", "estado")
+
+
+def juntar_repetidas(apps, schema_editor):
+    # Las carreras que la restricción evita pudieron dejar claves repetidas:
+    # se suman en la primera fila y se borran las demás
+    ResumenInventario = apps.get_model("p_w_pvsa", "ResumenInventario")
+    primeras, sobrantes = {}, []
+    for fila in ResumenInventario.objects.order_by("id"):
+        clave = tuple(getattr(fila, campo) for campo in CLAVE)
+        primera = primeras.setdefault(clave, fila)
+        if primera is not fila:
+            primera.cantidad += fila.cantidad
+            primera.filas += fila.filas
+            sobrantes.append(fila.pk)
+    if sobrantes:
+        ResumenInventario.objects.bulk_update(primeras.values(), ["cantidad", "filas"], batch_size=1000)
+        ResumenInventario.objects.filter(pk__in=sobrantes).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('p_w_pvsa', '0012_label_busqueda'),
+    ]
+
+    operations = [
+        migrations.RunPython(juntar_repetidas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='resumeninventario',
+            constraint=models.UniqueConstraint(fields=('sector', 'ubicacion', 'piso', 'tipo_lugar', 'categoria', 'objeto', 'tipo_objeto', 'estado'), name='resumen_inv_clave_unica', nulls_distinct=False),
+        ),
+    ]
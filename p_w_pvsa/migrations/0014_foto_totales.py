@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def llenar_totales(apps, schema_editor):
+    # Las fotos ya tomadas se agrupan una vez aquí
+    FotoObjetoLugar = apps.get_model("p_w_pvsa", "FotoObjetoLugar")
+    FotoTotal = apps.get_model("p_w_pvsa", "FotoTotal")
+    agrupado = (
+        FotoObjetoLugar.objects.values_list("foto_id", "id_lugar", "id_tipo_objeto", "estado")
+        .annotate(suma=Sum("cantidad"), n=Count("id"))
+        .order_by()
+    )
+    FotoTotal.objects.bulk_create(
+        [
+            FotoTotal(foto_id=foto_id, id_lugar=lugar_id, id_tipo_objeto=tipo_id, estado=estado,
+                      cantidad=suma or 0, filas=n)
+            for foto_id, lugar_id, tipo_id, estado, suma, n in agrupado.iterator()
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('p_w_pvsa', '0013_resumen_clave_unica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FotoTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_lugar', models.PositiveBigIntegerField(null=True)),
+                ('id_tipo_objeto', models.PositiveBigIntegerField(null=True)),
+                ('estado', models.CharField(choices=[('B', 'Bueno'), ('P', 'Pendiente'), ('M', 'Malo')], max_length=1)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('filas', models.IntegerField(default=0)),
+                ('foto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='totales', to='p_w_pvsa.fotoinventario')),
+            ],
+        ),
+        migrations.RunPython(llenar_totales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('p_w_pvsa', '0014_foto_totales'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='objetolugar',
+            index=models.Index(fields=['ubicacion', 'piso', 'lugar', 'id'], name='ol_ruta_idx'),
+        ),
+    ]
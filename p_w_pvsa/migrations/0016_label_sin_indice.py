@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('p_w_pvsa', '0015_indice_ruta_objetos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lugar',
+            name='label',
+            field=models.CharField(default='', editable=False, max_length=320),
+        ),
+        migrations.AlterField(
+            model_name='objeto',
+            name='label',
+            field=models.CharField(default='', editable=False, max_length=320),
+        ),
+        migrations.AlterField(
+            model_name='piso',
+            name='label',
+            field=models.CharField(default='', editable=False, max_length=320),
+        ),
+        migrations.AlterField(
+            model_name='tipoobjeto',
+            name='label',
+            field=models.CharField(default='', editable=False, max_length=320),
+        ),
+        migrations.AlterField(
+            model_name='ubicacion',
+            name='label',
+            field=models.CharField(default='', editable=False, max_length=320),
+        ),
+    ]
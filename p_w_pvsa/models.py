@@ -1,6 +1,47 @@
 from django.db import models, transaction
 from django.utils import timezone
 
+from .carga_en_lote import CargaEnLoteMixin, CargaEnLoteQuerySet
+
+# Alcanza para el más largo: objeto + marca + material (100 c/u) y separadores
+LABEL_MAX_LENGTH = 320
+
+
+class ConLabel(models.Model):
+    """
+    Texto para mostrar guardado en la propia fila, para que los combos y
+    {{ obj }} no suban por las FK en cada fila. Cada modelo define
+    armar_label(), que lo arma a partir de sus campos y los de sus padres
+    empezando por el nombre, y se guarda con la fila; si cambia el nombre de
+    un padre, etiquetas.py rehace el de los hijos.
+
+    label_busqueda es el mismo texto en minúsculas, con índice simple: el
+    typeahead busca por prefijo con un rango sobre esa columna (ver busqueda.py).
+    """
+    label = models.CharField(max_length=LABEL_MAX_LENGTH, editable=False, default="")
+    label_busqueda = models.CharField(max_length=LABEL_MAX_LENGTH, editable=False, db_index=True, default="")
+
+    class Meta:
+        abstract = True
+
+    def poner_label(self):
+        """Rearma label y label_busqueda; devuelve True si cambiaron."""
+        label = self.armar_label()
+        if (label, label.lower()) == (self.label, self.label_busqueda):
+            return False
+        self.label, self.label_busqueda = label, label.lower()
+        return True
+
+    def save(self, *args, **kwargs):
+        self.poner_label()
+        if kwargs.get("update_fields") is not None:
+            kwargs["update_fields"] = {*kwargs["update_fields"], "label", "label_busqueda"}
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        # Sin label solo quedan filas de bulk_create (ver rehacer_labels)
+        return self.label or self.armar_label()
+
 
 class Sector(models.Model):
     sector = models.CharField(max_length=100, unique=True)
@@ -10,7 +51,7 @@ class Sector(models.Model):
         return self.sector
 
 
-class Ubicacion(models.Model):
+class Ubicacion(ConLabel):
     ubicacion = models.CharField(max_length=100, unique=True)
     sector = models.ForeignKey(
         Sector,
@@ -18,12 +59,14 @@ class Ubicacion(models.Model):
         on_delete=models.RESTRICT,
     )
 
-    def __str__(self):
+    objects = CargaEnLoteQuerySet.as_manager()
+
+    def armar_label(self):
         # Ubicación + sector al que pertenece
         return f"{self.ubicacion} | Sector: {self.sector.sector}"
 
 
-class Piso(models.Model):
+class Piso(ConLabel):
     piso = models.SmallIntegerField()
     ubicacion = models.ForeignKey(
         Ubicacion,
@@ -31,7 +74,9 @@ class Piso(models.Model):
         on_delete=models.RESTRICT,
     )
 
-    def __str__(self):
+    objects = CargaEnLoteQuerySet.as_manager()
+
+    def armar_label(self):
         # Piso + ubicación
         return f"Piso {self.piso} | {self.ubicacion.ubicacion}"
 
@@ -44,7 +89,7 @@ class TipoLugar(models.Model):
         return self.tipo_de_lugar
 
 
-class Lugar(models.Model):
+class Lugar(ConLabel):
     nombre_del_lugar = models.CharField(max_length=100)
     piso = models.ForeignKey(
         Piso,
@@ -57,7 +102,9 @@ class Lugar(models.Model):
         on_delete=models.RESTRICT,
     )
 
-    def __str__(self):
+    objects = CargaEnLoteQuerySet.as_manager()
+
+    def armar_label(self):
         # Nombre del lugar + piso + ubicación
         return (
             f"{self.nombre_del_lugar} | "
@@ -76,7 +123,7 @@ class CategoriaObjeto(models.Model):
         return self.nombre_de_categoria
 
 
-class Objeto(models.Model):
+class Objeto(ConLabel):
     nombre_del_objeto = models.CharField(
         max_length=100, verbose_name="objeto", unique=True
     )
@@ -86,12 +133,14 @@ class Objeto(models.Model):
         on_delete=models.RESTRICT,
     )
 
-    def __str__(self):
+    objects = CargaEnLoteQuerySet.as_manager()
+
+    def armar_label(self):
         # Objeto + categoría entre paréntesis
         return f"{self.nombre_del_objeto} ({self.objeto_categoria.nombre_de_categoria})"
 
 
-class TipoObjeto(models.Model):
+class TipoObjeto(ConLabel):
     objeto = models.ForeignKey(
         Objeto,
         verbose_name="objeto",
@@ -100,11 +149,11 @@ class TipoObjeto(models.Model):
     marca = models.CharField(max_length=100, verbose_name="marca", blank=True, null=True)
     material = models.CharField(max_length=100, verbose_name="material", blank=True, null=True)
 
-        
+    objects = CargaEnLoteQuerySet.as_manager()
 
-    def __str__(self):
-        marca_txt=self.marca.strip() or ""
-        material_txt= self.material.strip() or ""
+    def armar_label(self):
+        marca_txt = (self.marca or "").strip()
+        material_txt = (self.material or "").strip()
 
         return f"{self.objeto.nombre_del_objeto} - {marca_txt} {material_txt}".strip()
 
@@ -133,6 +182,66 @@ class TipoLugarObjetoTipico(models.Model):
 
 
 
+# Ruta del lugar (piso, ubicación, sector) copiada en ObjetoLugar y
+# HistoricoObjeto para filtrar sin subir por lugar -> piso -> ubicación.
+# Se propaga y se repara en ruta_lugar.py.
+CAMPOS_RUTA = ("piso_id", "ubicacion_id", "sector_id")
+NOMBRES_RUTA = ("piso", "ubicacion", "sector")
+RUTA_VACIA = (None, None, None)
+RUTA_BATCH_SIZE = 1000
+
+
+def rutas_de_lugares(ids):
+    """{lugar_id: (piso_id, ubicacion_id, sector_id)} de los lugares de `ids`."""
+    ids = list(ids)
+    rutas = {}
+    for i in range(0, len(ids), RUTA_BATCH_SIZE):
+        for lugar_id, *ruta in Lugar.objects.filter(pk__in=ids[i:i + RUTA_BATCH_SIZE]).values_list(
+            "id", "piso_id", "piso__ubicacion_id", "piso__ubicacion__sector_id"
+        ):
+            rutas[lugar_id] = tuple(ruta)
+    return rutas
+
+
+def rutas_de_objetos(ids):
+    """{objeto_lugar_id: (piso_id, ubicacion_id, sector_id)} ya guardada en ObjetoLugar."""
+    ids = list(ids)
+    rutas = {}
+    for i in range(0, len(ids), RUTA_BATCH_SIZE):
+        for pk, *ruta in ObjetoLugar.objects.filter(pk__in=ids[i:i + RUTA_BATCH_SIZE]).values_list("id", *CAMPOS_RUTA):
+            rutas[pk] = tuple(ruta)
+    return rutas
+
+
+def ruta(obj):
+    return tuple(getattr(obj, campo) for campo in CAMPOS_RUTA)
+
+
+def _completar_rutas(objs, campo_origen, buscar_rutas):
+    # Solo las filas que llegan sin ruta (bulk_create no pasa por save())
+    pendientes = [o for o in objs if getattr(o, campo_origen) is not None and ruta(o) == RUTA_VACIA]
+    if not pendientes:
+        return
+    rutas = buscar_rutas({getattr(o, campo_origen) for o in pendientes})
+    for o in pendientes:
+        for campo, valor in zip(CAMPOS_RUTA, rutas.get(getattr(o, campo_origen), RUTA_VACIA)):
+            setattr(o, campo, valor)
+
+
+class ObjetoLugarQuerySet(CargaEnLoteMixin, models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        _completar_rutas(objs, "lugar_id", rutas_de_lugares)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class HistoricoObjetoQuerySet(CargaEnLoteMixin, models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        _completar_rutas(objs, "objeto_del_lugar_id", rutas_de_objetos)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class ObjetoLugar(models.Model):
     ESTADO = (
         ("B", "Bueno"),
@@ -163,45 +272,87 @@ class ObjetoLugar(models.Model):
         null=True
     )
 
+    # Copia de la ruta de `lugar` (la mantienen save() y ruta_lugar.py)
+    piso = models.ForeignKey(
+        Piso, on_delete=models.RESTRICT, null=True, blank=True, editable=False, related_name="+"
+    )
+    ubicacion = models.ForeignKey(
+        Ubicacion, on_delete=models.RESTRICT, null=True, blank=True, editable=False, related_name="+"
+    )
+    sector = models.ForeignKey(
+        Sector, on_delete=models.RESTRICT, null=True, blank=True, editable=False, related_name="+"
+    )
+
+    objects = ObjetoLugarQuerySet.as_manager()
+
+    class Meta:
+        # Filtros y órdenes de las vistas (ver bench_indices)
+        indexes = [
+            models.Index(fields=["lugar", "-fecha"], name="ol_lugar_fecha_idx"),
+            models.Index(fields=["tipo_de_objeto", "-fecha"], name="ol_tipo_fecha_idx"),
+            models.Index(fields=["tipo_de_objeto", "estado"], name="ol_tipo_estado_idx"),
+            models.Index(fields=["estado", "lugar"], name="ol_estado_lugar_idx"),
+            models.Index(fields=["ubicacion", "piso", "lugar", "id"], name="ol_ruta_idx"),
+        ]
+
     def __str__(self):
-        # Resumen corto: qué objeto es, dónde está y su estado/cantidad
-        lugar_txt = (
-            f"{self.lugar.nombre_del_lugar} | "
-            f"Piso {self.lugar.piso.piso} | {self.lugar.piso.ubicacion.ubicacion}"
-            if self.lugar
-            else "Sin lugar asignado"
-        )
+        # Resumen corto: qué objeto es, dónde está y su estado/cantidad.
+        # Con select_related("lugar", "tipo_de_objeto") no hace consultas
+        lugar_txt = str(self.lugar) if self.lugar else "Sin lugar asignado"
         return (
-            f"{self.tipo_de_objeto.objeto.nombre_del_objeto} "
-            f"- {self.tipo_de_objeto.marca} {self.tipo_de_objeto.material or ''} "
-            f"en {lugar_txt} "
+            f"{self.tipo_de_objeto} en {lugar_txt} "
             f"(cant. {self.cantidad}, estado {self.get_estado_display()})"
         )
 
+    def _poner_ruta(self, anterior):
+        # La ruta se relee solo si el lugar es otro (o nunca se llenó)
+        if anterior is not None and anterior.lugar_id == self.lugar_id and ruta(anterior) != RUTA_VACIA:
+            nueva = ruta(anterior)
+        elif self.lugar_id is None:
+            nueva = RUTA_VACIA
+        else:
+            nueva = rutas_de_lugares([self.lugar_id]).get(self.lugar_id, RUTA_VACIA)
+        for campo, valor in zip(CAMPOS_RUTA, nueva):
+            setattr(self, campo, valor)
+
     def save(self, *args, **kwargs):
         """
         Guarda histórico AUTOMÁTICO solo cuando cambia cantidad/estado/detalle.
         No duplica porque todo se hace aquí, y la vista NO crea Histórico.
+        También copia la ruta del lugar (piso, ubicación, sector).
         """
-        if self.pk:
-            anterior = ObjetoLugar.objects.get(pk=self.pk)
+        anterior = ObjetoLugar.objects.get(pk=self.pk) if self.pk else None
 
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "lugar" in update_fields:
+            self._poner_ruta(anterior)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *NOMBRES_RUTA}
+
+        if anterior is not None:
             hubo_cambio = (
                 anterior.cantidad != self.cantidad
                 or anterior.estado != self.estado
                 or (anterior.detalle or "") != (self.detalle or "")
             )
+            se_movio = ruta(anterior) != ruta(self)
 
-            if hubo_cambio:
+            if hubo_cambio or se_movio:
+                columnas_ruta = dict(zip(CAMPOS_RUTA, ruta(self)))
                 with transaction.atomic():
                     super().save(*args, **kwargs)
-                    HistoricoObjeto.objects.create(
-                        objeto_del_lugar=self,
-                        cantidad_anterior=anterior.cantidad,
-                        estado_anterior=anterior.estado,
-                        detalle_anterior=anterior.detalle or "",
-                        fecha_anterior=anterior.fecha,
-                    )
+                    if se_movio:
+                        # Los históricos se filtran por donde está el objeto hoy
+                        HistoricoObjeto.objects.filter(objeto_del_lugar=self).update(**columnas_ruta)
+                    if hubo_cambio:
+                        HistoricoObjeto.objects.create(
+                            objeto_del_lugar=self,
+                            cantidad_anterior=anterior.cantidad,
+                            estado_anterior=anterior.estado,
+                            detalle_anterior=anterior.detalle or "",
+                            fecha_anterior=anterior.fecha,
+                            **columnas_ruta,
+                        )
                 return
 
         # creación inicial o sin cambios relevantes
@@ -223,20 +374,202 @@ class HistoricoObjeto(models.Model):
     detalle_anterior = models.CharField(max_length=200, blank=True)
     fecha_anterior = models.DateField()
 
+    # Ruta actual del objeto (no la que tenía en fecha_anterior), copiada
+    # para filtrar los históricos sin pasar por ObjetoLugar y Lugar
+    piso = models.ForeignKey(
+        Piso, on_delete=models.RESTRICT, null=True, blank=True, editable=False, related_name="+"
+    )
+    ubicacion = models.ForeignKey(
+        Ubicacion, on_delete=models.RESTRICT, null=True, blank=True, editable=False, related_name="+"
+    )
+    sector = models.ForeignKey(
+        Sector, on_delete=models.RESTRICT, null=True, blank=True, editable=False, related_name="+"
+    )
+
+    objects = HistoricoObjetoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-fecha_anterior", "id"], name="hist_fecha_idx"),
+            models.Index(fields=["objeto_del_lugar", "-fecha_anterior"], name="hist_objeto_fecha_idx"),
+            models.Index(fields=["estado_anterior", "-fecha_anterior"], name="hist_estado_fecha_idx"),
+        ]
+
     def __str__(self):
         # Qué objeto es, dónde estaba y cuál era la situación anterior
         obj = self.objeto_del_lugar
-        lugar_txt = (
-            f"{obj.lugar.nombre_del_lugar} | "
-            f"Piso {obj.lugar.piso.piso} | {obj.lugar.piso.ubicacion.ubicacion}"
-            if obj.lugar
-            else "Sin lugar asignado"
-        )
+        lugar_txt = str(obj.lugar) if obj.lugar else "Sin lugar asignado"
         return (
-            f"Histórico de {obj.tipo_de_objeto.objeto.nombre_del_objeto} "
-            f"- {obj.tipo_de_objeto.marca} {obj.tipo_de_objeto.material or ''} "
+            f"Histórico de {obj.tipo_de_objeto} "
             f"en {lugar_txt} "
             f"(cant. ant. {self.cantidad_anterior}, "
             f"estado ant. {self.get_estado_anterior_display()}, "
             f"fecha {self.fecha_anterior.strftime('%d/%m/%Y')})"
-        )
\ No newline at end of file
+        )
+
+class VersionDatos(models.Model):
+    """
+    Contador global que sube con cada escritura del inventario. Sirve para
+    saber si un resultado calculado antes (un Excel, un resumen) sigue vigente.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Versión {self.version}"
+
+
+class ExportacionExcel(models.Model):
+    ESTADO = (
+        ("P", "Pendiente"),
+        ("E", "En proceso"),
+        ("L", "Listo"),
+        ("X", "Error"),
+    )
+
+    estado = models.CharField(max_length=1, choices=ESTADO, default="P")
+    version_datos = models.PositiveBigIntegerField()
+    hojas_total = models.PositiveIntegerField(default=0)
+    hojas_listas = models.PositiveIntegerField(default=0)
+    hoja_actual = models.CharField(max_length=100, blank=True)
+    archivo = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+    terminado = models.DateTimeField(null=True, blank=True)
+    usuario = models.ForeignKey(
+        "auth.User",
+        verbose_name="usuario",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+
+    def __str__(self):
+        return f"Exportación #{self.pk} ({self.get_estado_display()}, v{self.version_datos})"
+
+
+class CambioObjetoLugar(models.Model):
+    """
+    Registro de altas, cambios y bajas de ObjetoLugar para el export
+    incremental. El id es el cursor: quien sincroniza guarda el último que vio.
+    No es FK para que sobreviva al borrado del objeto.
+    """
+    ACCION = (
+        ("C", "Creado"),
+        ("M", "Modificado"),
+        ("B", "Borrado"),
+    )
+
+    id_objeto_lugar = models.PositiveBigIntegerField()
+    accion = models.CharField(max_length=1, choices=ACCION)
+    registrado = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Valores del objeto después del cambio (vacíos en registros anteriores a tenerlos)
+    id_lugar = models.PositiveBigIntegerField(null=True, blank=True)
+    id_tipo_objeto = models.PositiveBigIntegerField(null=True, blank=True)
+    cantidad = models.SmallIntegerField(null=True, blank=True)
+    estado = models.CharField(max_length=1, choices=ObjetoLugar.ESTADO, blank=True)
+
+    def __str__(self):
+        return f"#{self.pk} {self.get_accion_display()} ObjetoLugar {self.id_objeto_lugar}"
+
+
+class ResumenInventario(models.Model):
+    """
+    Totales de cantidad por (piso, tipo de lugar, tipo de objeto, estado),
+    con sector/ubicación/categoría/objeto copiados para filtrar sin joins.
+    Se mantiene en resumen_totales.py; reconstruir_resumen lo rehace entero.
+    Las claves son nullables igual que lugar y tipo_de_objeto en ObjetoLugar.
+    """
+    sector = models.ForeignKey(Sector, on_delete=models.CASCADE, null=True, related_name="+")
+    ubicacion = models.ForeignKey(Ubicacion, on_delete=models.CASCADE, null=True, related_name="+")
+    piso = models.ForeignKey(Piso, on_delete=models.CASCADE, null=True, related_name="+")
+    tipo_lugar = models.ForeignKey(TipoLugar, on_delete=models.CASCADE, null=True, related_name="+")
+    categoria = models.ForeignKey(CategoriaObjeto, on_delete=models.CASCADE, null=True, related_name="+")
+    objeto = models.ForeignKey(Objeto, on_delete=models.CASCADE, null=True, related_name="+")
+    tipo_objeto = models.ForeignKey(TipoObjeto, on_delete=models.CASCADE, null=True, related_name="+")
+    estado = models.CharField(max_length=1, choices=ObjetoLugar.ESTADO)
+    cantidad = models.IntegerField(default=0)
+    filas = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["piso", "tipo_lugar", "tipo_objeto", "estado"], name="resumen_inv_clave_idx"),
+        ]
+        constraints = [
+            # Una fila por clave, contando NULL como un valor más: sin esto dos
+            # escrituras concurrentes de la misma clave nueva crean dos filas
+            models.UniqueConstraint(
+                fields=[
+                    "sector", "ubicacion", "piso", "tipo_lugar",
+                    "categoria", "objeto", "tipo_objeto", "estado",
+                ],
+                nulls_distinct=False,
+                name="resumen_inv_clave_unica",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Piso {self.piso_id} / tipo {self.tipo_objeto_id} / {self.estado}: {self.cantidad}"
+
+
+class FotoInventario(models.Model):
+    """
+    Foto completa de ObjetoLugar en un momento. `cursor` es el último
+    CambioObjetoLugar incluido: desde ahí se aplican los cambios para
+    reconstruir cualquier fecha posterior (ver historia.py).
+    """
+    tomada = models.DateTimeField(db_index=True)
+    cursor = models.PositiveBigIntegerField()
+    filas = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Foto {self.tomada:%d/%m/%Y %H:%M} ({self.filas} filas)"
+
+
+class FotoObjetoLugar(models.Model):
+    foto = models.ForeignKey(FotoInventario, on_delete=models.CASCADE, related_name="objetos")
+    id_objeto_lugar = models.PositiveBigIntegerField()
+    id_lugar = models.PositiveBigIntegerField(null=True)
+    id_tipo_objeto = models.PositiveBigIntegerField(null=True)
+    cantidad = models.SmallIntegerField()
+    estado = models.CharField(max_length=1, choices=ObjetoLugar.ESTADO)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["foto", "id_objeto_lugar"], name="foto_objeto_lugar_idx"),
+        ]
+
+
+class FotoTotal(models.Model):
+    """
+    Totales de una foto por (lugar, tipo de objeto, estado), guardados al
+    tomarla: una fecha pasada parte de aquí y no reagrupa la foto entera.
+    """
+    foto = models.ForeignKey(FotoInventario, on_delete=models.CASCADE, related_name="totales")
+    id_lugar = models.PositiveBigIntegerField(null=True)
+    id_tipo_objeto = models.PositiveBigIntegerField(null=True)
+    estado = models.CharField(max_length=1, choices=ObjetoLugar.ESTADO)
+    cantidad = models.IntegerField(default=0)
+    filas = models.IntegerField(default=0)
+
+
+class SerieEstadoDiaria(models.Model):
+    """
+    Cantidades por estado al cierre de cada día, por sector/ubicación/categoría.
+    La llena el comando registrar_serie_diaria; la lee el endpoint de tendencia.
+    """
+    fecha = models.DateField()
+    sector = models.ForeignKey(Sector, on_delete=models.CASCADE, null=True, related_name="+")
+    ubicacion = models.ForeignKey(Ubicacion, on_delete=models.CASCADE, null=True, related_name="+")
+    categoria = models.ForeignKey(CategoriaObjeto, on_delete=models.CASCADE, null=True, related_name="+")
+    buenas = models.IntegerField(default=0)
+    pendientes = models.IntegerField(default=0)
+    malas = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["fecha", "sector", "ubicacion", "categoria"], name="serie_estado_fecha_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha}: B {self.buenas} / P {self.pendientes} / M {self.malas}"
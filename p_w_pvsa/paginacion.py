@@ -0,0 +1,142 @@
+"""
+Paginación por cursor (keyset): en vez de OFFSET, la página siguiente se
+pide "después de" los valores de orden de la última fila vista, así cada
+página cuesta lo mismo aunque se esté en la número mil.
+
+El último campo de `orden` debe ser único (normalmente "id" o "-id") para
+que no se salten ni repitan filas. Los demás pueden ser NULL (p. ej. un
+objeto sin lugar): NULL cuenta como el valor más chico, así que va primero
+en orden ascendente y último en descendente, igual en todas las bases.
+"""
+from datetime import date, datetime
+
+from django.core import signing
+from django.db.models import F, Max, Min, Q
+
+SALT_CURSOR = "p_w_pvsa.paginacion"
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def _valor(obj, campo):
+    for parte in campo.split("__"):
+        if obj is None:
+            return None
+        obj = getattr(obj, parte)
+    return obj
+
+
+def _serializable(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+
+def _puede_ser_nulo(modelo, nombre):
+    """True si el campo, o alguna FK del camino, admite NULL."""
+    for parte in nombre.split("__"):
+        campo = modelo._meta.get_field(parte)
+        if campo.null:
+            return True
+        modelo = campo.related_model
+    return False
+
+
+def _ordenar(modelo, campo):
+    nombre = campo.lstrip("-")
+    if not _puede_ser_nulo(modelo, nombre):
+        # Sin NULLS FIRST/LAST el planificador puede usar un índice para el orden
+        return campo
+    if campo.startswith("-"):
+        return F(nombre).desc(nulls_last=True)
+    return F(nombre).asc(nulls_first=True)
+
+
+def _pasado(campo, valor):
+    """Filas que van estrictamente después de `valor` en el campo."""
+    nombre = campo.lstrip("-")
+    if campo.startswith("-"):
+        if valor is None:
+            return Q(pk__in=[])  # NULL es lo último
+        return Q(**{f"{nombre}__lt": valor}) | Q(**{f"{nombre}__isnull": True})
+    if valor is None:
+        return Q(**{f"{nombre}__isnull": False})
+    return Q(**{f"{nombre}__gt": valor})
+
+
+def _despues_de(modelo, orden, valores):
+    """
+    (a > A) OR (a = A AND b > B) OR ... respetando "-" y NULL en cada campo,
+    más a >= A aparte: es redundante pero deja usar el índice de `a` como
+    rango (el OR solo no lo permite).
+    """
+    condicion = Q(pk__in=[])
+    iguales = Q()
+    for campo, valor in zip(orden, valores):
+        nombre = campo.lstrip("-")
+        condicion |= iguales & _pasado(campo, valor)
+        iguales &= Q(**{f"{nombre}__isnull": True}) if valor is None else Q(**{nombre: valor})
+
+    primero, valor = orden[0], valores[0]
+    if valor is not None:
+        nombre = primero.lstrip("-")
+        if primero.startswith("-"):
+            menor_o_igual = Q(**{f"{nombre}__lte": valor})
+            if _puede_ser_nulo(modelo, nombre):
+                menor_o_igual |= Q(**{f"{nombre}__isnull": True})
+            condicion &= menor_o_igual
+        else:
+            condicion &= Q(**{f"{nombre}__gte": valor})
+    return condicion
+
+
+def _acotar_primera(qs, campo):
+    """
+    En la primera página, si el orden empieza por una columna propia y sin
+    NULL, agrega a <= MAX(a) (o >= MIN(a)): no cambia el resultado, pero con
+    la condición de rango el planificador recorre el índice de `a` en vez de
+    ordenar la tabla completa. MAX/MIN sale del mismo índice.
+    """
+    nombre = campo.lstrip("-")
+    if "__" in nombre or _puede_ser_nulo(qs.model, nombre):
+        return qs
+    if campo.startswith("-"):
+        tope = qs.aggregate(tope=Max(nombre))["tope"]
+        return qs if tope is None else qs.filter(**{f"{nombre}__lte": tope})
+    tope = qs.aggregate(tope=Min(nombre))["tope"]
+    return qs if tope is None else qs.filter(**{f"{nombre}__gte": tope})
+
+
+def consulta_keyset(qs, orden, cursor=None, por_pagina=50):
+    """
+    El queryset de una página (por_pagina + 1 filas, la extra dice si hay
+    siguiente) sin ejecutarlo. Lanza CursorInvalido si el cursor no sirve.
+    """
+    if cursor:
+        try:
+            valores = signing.loads(cursor, salt=SALT_CURSOR)
+        except signing.BadSignature:
+            raise CursorInvalido(cursor)
+        if not isinstance(valores, list) or len(valores) != len(orden):
+            raise CursorInvalido(cursor)
+        qs = qs.filter(_despues_de(qs.model, orden, valores))
+    else:
+        qs = _acotar_primera(qs, orden[0])
+    return qs.order_by(*(_ordenar(qs.model, campo) for campo in orden))[:por_pagina + 1]
+
+
+def pagina_keyset(qs, orden, cursor=None, por_pagina=50):
+    """
+    Devuelve (filas, cursor_siguiente). cursor_siguiente es None en la
+    última página. El cursor va firmado: no se puede inventar ni alterar.
+    """
+    filas = list(consulta_keyset(qs, orden, cursor, por_pagina))
+    if len(filas) <= por_pagina:
+        return filas, None
+
+    filas = filas[:por_pagina]
+    ultima = filas[-1]
+    valores = [_serializable(_valor(ultima, campo.lstrip("-"))) for campo in orden]
+    return filas, signing.dumps(valores, salt=SALT_CURSOR)
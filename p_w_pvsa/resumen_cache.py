@@ -0,0 +1,76 @@
+"""
+Caché del resumen general. La clave combina los diez filtros normalizados
+con la versión del inventario: cualquier escritura sube la versión y las
+entradas anteriores simplemente dejan de consultarse hasta que expiran.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .data_version import get_data_version
+from .filtros import NOMBRES_FILTROS
+
+RESUMEN_CACHE_ALIAS = getattr(settings, "RESUMEN_CACHE_ALIAS", "default")
+RESUMEN_CACHE_TIMEOUT = getattr(settings, "RESUMEN_CACHE_TIMEOUT", 60 * 60)
+
+CLAVE_ACIERTOS = "pvsa:resumen:aciertos"
+CLAVE_FALLOS = "pvsa:resumen:fallos"
+
+
+def _cache():
+    return caches[RESUMEN_CACHE_ALIAS]
+
+
+def clave_resumen(filtros, version):
+    # marca y material son texto libre: se resume con un hash para no pasar
+    # el largo máximo de clave de memcached
+    tupla = "|".join(f"{nombre}={filtros.get(nombre) or ''}" for nombre in NOMBRES_FILTROS)
+    if filtros.get("as_of"):
+        tupla += f"|as_of={filtros['as_of']}"
+    return f"pvsa:resumen:v{version}:{hashlib.sha1(tupla.encode()).hexdigest()}"
+
+
+def _contar(clave):
+    cache = _cache()
+    try:
+        cache.incr(clave)
+    except ValueError:
+        # No existía (o expiró): add() para no pisar a otro proceso que la creó recién
+        if not cache.add(clave, 1, timeout=None):
+            cache.incr(clave)
+
+
+def obtener_resumen(filtros, calcular):
+    """
+    Devuelve el resumen de `filtros` desde la caché o lo calcula con
+    `calcular(filtros)`. La versión se lee antes de calcular: si el
+    inventario cambia mientras tanto, el resultado queda bajo la versión
+    vieja y nadie lo vuelve a pedir.
+    """
+    clave = clave_resumen(filtros, get_data_version())
+    datos = _cache().get(clave)
+    if datos is not None:
+        _contar(CLAVE_ACIERTOS)
+        return datos
+
+    _contar(CLAVE_FALLOS)
+    datos = calcular(filtros)
+    _cache().set(clave, datos, RESUMEN_CACHE_TIMEOUT)
+    return datos
+
+
+def estadisticas_resumen():
+    cache = _cache()
+    aciertos = cache.get(CLAVE_ACIERTOS, 0)
+    fallos = cache.get(CLAVE_FALLOS, 0)
+    total = aciertos + fallos
+    return {
+        "aciertos": aciertos,
+        "fallos": fallos,
+        "tasa_aciertos": round(aciertos * 100 / total, 1) if total else 0,
+        "version_datos": get_data_version(),
+        "backend": cache.__class__.__name__,
+        "timeout": RESUMEN_CACHE_TIMEOUT,
+    }
+
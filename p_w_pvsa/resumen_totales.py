@@ -0,0 +1,242 @@
+"""
+Mantenimiento de ResumenInventario, la tabla de totales que lee el
+resumen general. Cada escritura de ObjetoLugar aplica solo su diferencia
+(restar lo que aportaba antes, sumar lo que aporta ahora); los cambios de
+jerarquía (un Lugar que cambia de piso, etc.) recalculan el tramo afectado.
+"""
+from django.db import connections, transaction
+from django.db.models import Count, F, Sum
+
+from .models import ObjetoLugar, ResumenInventario
+
+# (campo en ResumenInventario, camino desde ObjetoLugar)
+CLAVE_RESUMEN = (
+    ("sector_id", "sector_id"),
+    ("ubicacion_id", "ubicacion_id"),
+    ("piso_id", "piso_id"),
+    ("tipo_lugar_id", "lugar__lugar_tipo_lugar_id"),
+    ("categoria_id", "tipo_de_objeto__objeto__objeto_categoria_id"),
+    ("objeto_id", "tipo_de_objeto__objeto_id"),
+    ("tipo_objeto_id", "tipo_de_objeto_id"),
+    ("estado", "estado"),
+)
+CAMPOS_CLAVE = tuple(campo for campo, _ in CLAVE_RESUMEN)
+ORIGEN_CLAVE = dict(CLAVE_RESUMEN)
+
+RESUMEN_BATCH_SIZE = 1000
+
+
+def agrupar(qs_objetos):
+    """{clave: (cantidad, filas)} de un queryset de ObjetoLugar, en una consulta."""
+    filas = (
+        qs_objetos.order_by()
+        .values_list(*(origen for _, origen in CLAVE_RESUMEN))
+        .annotate(suma=Sum("cantidad"), n=Count("id"))
+    )
+    return {tuple(f[:-2]): (f[-2] or 0, f[-1]) for f in filas}
+
+
+def contribucion(ids):
+    """Lo que aportan hoy al resumen los ObjetoLugar de `ids`."""
+    grupos = {}
+    ids = list(ids)
+    for i in range(0, len(ids), RESUMEN_BATCH_SIZE):
+        for clave, (cantidad, filas) in agrupar(ObjetoLugar.objects.filter(pk__in=ids[i:i + RESUMEN_BATCH_SIZE])).items():
+            c, n = grupos.get(clave, (0, 0))
+            grupos[clave] = (c + cantidad, n + filas)
+    return grupos
+
+
+def aplicar_diferencia(antes, despues):
+    """
+    Lleva el resumen de `antes` a `despues` (ambos como los devuelve
+    agrupar). Solo se escriben las claves que cambian.
+    """
+    for clave in set(antes) | set(despues):
+        c0, n0 = antes.get(clave, (0, 0))
+        c1, n1 = despues.get(clave, (0, 0))
+        if (c0, n0) == (c1, n1):
+            continue
+        _sumar(clave, c1 - c0, n1 - n0)
+
+
+def _sumar(clave, cantidad, filas):
+    filtro = dict(zip(CAMPOS_CLAVE, clave))
+    with transaction.atomic():
+        # La fila queda bloqueada hasta el final de la transacción. Si otra
+        # escritura crea la misma clave a la vez, la restricción única hace
+        # fallar este create y get_or_create vuelve a leer la fila ganadora.
+        fila, creada = ResumenInventario.objects.select_for_update().get_or_create(
+            defaults={"cantidad": cantidad, "filas": filas}, **filtro
+        )
+        if creada:
+            return
+        ResumenInventario.objects.filter(pk=fila.pk).update(
+            cantidad=F("cantidad") + cantidad, filas=F("filas") + filas
+        )
+        if filas < 0:
+            ResumenInventario.objects.filter(pk=fila.pk, filas__lte=0).delete()
+
+
+def recalcular_resumen(campo=None, valores=None):
+    """
+    Rehace el resumen completo, o solo las filas con `campo` en `valores`
+    (p. ej. campo="piso_id", valores=[3, 8]).
+    """
+    resumen = ResumenInventario.objects.all()
+    objetos = ObjetoLugar.objects.all()
+    if campo is not None:
+        valores = [v for v in valores if v is not None]
+        resumen = resumen.filter(**{f"{campo}__in": valores})
+        objetos = objetos.filter(**{f"{ORIGEN_CLAVE[campo]}__in": valores})
+
+    # Borrar y recrear en una transacción: nadie ve el tramo sin totales ni
+    # queda corto si falla a medias. Las filas se bloquean como en _sumar,
+    # así un _sumar concurrente espera y después suma sobre las nuevas.
+    with transaction.atomic():
+        list(resumen.select_for_update().values_list("pk", flat=True))
+        resumen.delete()
+        ResumenInventario.objects.bulk_create(
+            [
+                ResumenInventario(cantidad=cantidad, filas=filas, **dict(zip(CAMPOS_CLAVE, clave)))
+                for clave, (cantidad, filas) in agrupar(objetos).items()
+            ],
+            batch_size=RESUMEN_BATCH_SIZE,
+        )
+
+
+# Cambios de jerarquía que mueven filas de una clave a otra:
+# modelo -> (campos del padre, campo del resumen a recalcular, valores a recalcular)
+DEPENDENCIAS_RESUMEN = {
+    "Lugar": (("piso_id", "lugar_tipo_lugar_id"), "piso_id", lambda obj, antes: {obj.piso_id, antes[0]}),
+    "Piso": (("ubicacion_id",), "piso_id", lambda obj, antes: {obj.pk}),
+    "Ubicacion": (("sector_id",), "ubicacion_id", lambda obj, antes: {obj.pk}),
+    "Objeto": (("objeto_categoria_id",), "objeto_id", lambda obj, antes: {obj.pk}),
+    "TipoObjeto": (("objeto_id",), "tipo_objeto_id", lambda obj, antes: {obj.pk}),
+}
+
+
+# Claves de cada nivel tal como las usa la plantilla del resumen
+CLAVES_SECTOR = ("lugar__piso__ubicacion__sector__id", "lugar__piso__ubicacion__sector__sector")
+CLAVES_UBICACION = (
+    "lugar__piso__ubicacion__id", "lugar__piso__ubicacion__ubicacion",
+    "lugar__piso__ubicacion__sector__sector",
+)
+CLAVES_OBJETO = ("tipo_de_objeto__objeto__id", "tipo_de_objeto__objeto__nombre_del_objeto")
+
+CAMPO_ESTADO = {"B": "buenas", "P": "pendientes", "M": "malas"}
+
+
+def _columnas(qs_resumen):
+    # Nombres propios para poder usarlo como subconsulta en SQL crudo
+    return qs_resumen.order_by().values(
+        r_sector_id=F("sector_id"), r_sector=F("sector__sector"),
+        r_ubicacion_id=F("ubicacion_id"), r_ubicacion=F("ubicacion__ubicacion"),
+        r_objeto_id=F("objeto_id"), r_objeto=F("objeto__nombre_del_objeto"),
+        r_estado=F("estado"), r_cantidad=F("cantidad"),
+    )
+
+
+def _fila(claves, valores):
+    fila = dict(zip(claves, valores))
+    fila.update(total=0, buenas=None, pendientes=None, malas=None)
+    return fila
+
+
+def _sumar_fila(fila, estado, cantidad):
+    fila["total"] += cantidad
+    campo = CAMPO_ESTADO.get(estado)
+    if campo:
+        fila[campo] = (fila[campo] or 0) + cantidad
+
+
+def _nulos_primero(valor):
+    # Mismo orden que ORDER BY en SQLite: NULL antes que todo
+    return (valor is not None, valor)
+
+
+def plegar_niveles(filas):
+    """
+    Acumula en una pasada los tres niveles a partir de tuplas
+    (sector_id, sector, ubicacion_id, ubicacion, objeto_id, objeto, estado, cantidad).
+    """
+    sectores, ubicaciones, objetos = {}, {}, {}
+    for sector_id, sector, ubicacion_id, ubicacion, objeto_id, objeto, estado, cantidad in filas:
+        fila = sectores.get(sector_id)
+        if fila is None:
+            fila = sectores[sector_id] = _fila(CLAVES_SECTOR, (sector_id, sector))
+        _sumar_fila(fila, estado, cantidad)
+
+        fila = ubicaciones.get(ubicacion_id)
+        if fila is None:
+            fila = ubicaciones[ubicacion_id] = _fila(CLAVES_UBICACION, (ubicacion_id, ubicacion, sector))
+        _sumar_fila(fila, estado, cantidad)
+
+        fila = objetos.get(objeto_id)
+        if fila is None:
+            fila = objetos[objeto_id] = _fila(CLAVES_OBJETO, (objeto_id, objeto))
+        _sumar_fila(fila, estado, cantidad)
+
+    return (
+        sorted(sectores.values(), key=lambda f: _nulos_primero(f[CLAVES_SECTOR[1]])),
+        sorted(
+            ubicaciones.values(),
+            key=lambda f: (_nulos_primero(f[CLAVES_UBICACION[2]]), _nulos_primero(f[CLAVES_UBICACION[1]])),
+        ),
+        sorted(objetos.values(), key=lambda f: _nulos_primero(f[CLAVES_OBJETO[1]])),
+    )
+
+
+def _niveles_python(qs_resumen):
+    """Una pasada sobre las filas del resumen, acumulando los tres niveles a la vez."""
+    filas = _columnas(qs_resumen).values_list(
+        "r_sector_id", "r_sector", "r_ubicacion_id", "r_ubicacion",
+        "r_objeto_id", "r_objeto", "r_estado", "r_cantidad",
+    )
+    return plegar_niveles(filas.iterator())
+
+
+SQL_GROUPING_SETS = """
+SELECT r_sector_id, r_sector, r_ubicacion_id, r_ubicacion, r_objeto_id, r_objeto,
+       GROUPING(r_ubicacion_id) AS g_ubicacion, GROUPING(r_objeto_id) AS g_objeto,
+       SUM(r_cantidad),
+       SUM(r_cantidad) FILTER (WHERE r_estado = 'B'),
+       SUM(r_cantidad) FILTER (WHERE r_estado = 'P'),
+       SUM(r_cantidad) FILTER (WHERE r_estado = 'M')
+FROM ({subconsulta}) AS t
+GROUP BY GROUPING SETS (
+    (r_sector_id, r_sector),
+    (r_sector_id, r_sector, r_ubicacion_id, r_ubicacion),
+    (r_objeto_id, r_objeto)
+)
+ORDER BY r_sector, r_ubicacion, r_objeto
+"""
+
+
+def _niveles_grouping_sets(qs_resumen):
+    """Los tres niveles en una sola consulta con GROUPING SETS (PostgreSQL)."""
+    subconsulta, params = _columnas(qs_resumen).query.sql_with_params()
+    sectores, ubicaciones, objetos = [], [], []
+    with connections[qs_resumen.db].cursor() as cursor:
+        cursor.execute(SQL_GROUPING_SETS.format(subconsulta=subconsulta), params)
+        for (sector_id, sector, ubicacion_id, ubicacion, objeto_id, objeto,
+             g_ubicacion, g_objeto, total, buenas, pendientes, malas) in cursor.fetchall():
+            totales = {"total": total, "buenas": buenas, "pendientes": pendientes, "malas": malas}
+            if not g_objeto:
+                objetos.append({**dict(zip(CLAVES_OBJETO, (objeto_id, objeto))), **totales})
+            elif not g_ubicacion:
+                ubicaciones.append({**dict(zip(CLAVES_UBICACION, (ubicacion_id, ubicacion, sector))), **totales})
+            else:
+                sectores.append({**dict(zip(CLAVES_SECTOR, (sector_id, sector))), **totales})
+    return sectores, ubicaciones, objetos
+
+
+def resumen_por_niveles(qs_resumen):
+    """
+    (por sector, por ubicación, por objeto) de un queryset de
+    ResumenInventario, con las mismas claves y el mismo orden que tenían las
+    tres consultas separadas del resumen general.
+    """
+    if connections[qs_resumen.db].vendor == "postgresql":
+        return _niveles_grouping_sets(qs_resumen)
+    return _niveles_python(qs_resumen)
@@ -0,0 +1,87 @@
+"""
+Ruta del lugar (piso, ubicación, sector) copiada en ObjetoLugar y
+HistoricoObjeto, para que filtrar por sector sea un lookup sobre una
+columna indexada y no cuatro joins.
+
+ObjetoLugar.save y los bulk_create de sus managers la llenan al escribir
+cada fila. Aquí se propaga cuando un Lugar, Piso o Ubicacion se cuelga de
+otro padre (señales), y reparar_ruta corrige el desfase que dejen las
+escrituras que no pasan por señales (QuerySet.update, SQL directo).
+"""
+from collections import defaultdict
+
+from .models import CAMPOS_RUTA, HistoricoObjeto, ObjetoLugar, Piso, Ubicacion
+
+REPARAR_BATCH_SIZE = 1000
+
+# Modelo -> campo con el que se cuelga de su padre
+PADRE_RUTA = {
+    "Lugar": "piso_id",
+    "Piso": "ubicacion_id",
+    "Ubicacion": "sector_id",
+}
+
+# La ruta real, leída desde cada modelo
+RUTA_REAL_OBJETO = ("lugar__piso_id", "lugar__piso__ubicacion_id", "lugar__piso__ubicacion__sector_id")
+RUTA_REAL_HISTORICO = tuple(f"objeto_del_lugar__{campo}" for campo in CAMPOS_RUTA)
+
+
+def _tramo(instance):
+    """(filtro sobre ObjetoLugar, columnas nuevas) de todo lo que cuelga de `instance`."""
+    nombre = type(instance).__name__
+    if nombre == "Lugar":
+        ubicacion_id, sector_id = Piso.objects.filter(pk=instance.piso_id).values_list(
+            "ubicacion_id", "ubicacion__sector_id"
+        ).get()
+        return {"lugar_id": instance.pk}, {
+            "piso_id": instance.piso_id, "ubicacion_id": ubicacion_id, "sector_id": sector_id,
+        }
+    if nombre == "Piso":
+        sector_id = Ubicacion.objects.filter(pk=instance.ubicacion_id).values_list("sector_id", flat=True).get()
+        return {"piso_id": instance.pk}, {"ubicacion_id": instance.ubicacion_id, "sector_id": sector_id}
+    return {"ubicacion_id": instance.pk}, {"sector_id": instance.sector_id}
+
+
+def propagar_ruta(instance):
+    """
+    Reescribe la ruta de los ObjetoLugar (y sus históricos) que cuelgan de
+    un Lugar, Piso o Ubicacion que cambió de padre. Devuelve cuántos
+    ObjetoLugar se movieron.
+    """
+    filtro, columnas = _tramo(instance)
+    movidos = ObjetoLugar.objects.filter(**filtro).update(**columnas)
+    if "lugar_id" in filtro:
+        filtro = {"objeto_del_lugar__lugar_id": filtro["lugar_id"]}
+    HistoricoObjeto.objects.filter(**filtro).update(**columnas)
+    return movidos
+
+
+def _reparar(qs, ruta_real, solo_revisar):
+    # Las filas desfasadas se agrupan por su ruta correcta: un update por grupo
+    por_ruta = defaultdict(list)
+    filas = qs.order_by().values_list("id", *CAMPOS_RUTA, *ruta_real)
+    for pk, *valores in filas.iterator(chunk_size=REPARAR_BATCH_SIZE):
+        guardada, real = tuple(valores[:len(CAMPOS_RUTA)]), tuple(valores[len(CAMPOS_RUTA):])
+        if guardada != real:
+            por_ruta[real].append(pk)
+
+    if not solo_revisar:
+        for real, ids in por_ruta.items():
+            for i in range(0, len(ids), REPARAR_BATCH_SIZE):
+                qs.model.objects.filter(pk__in=ids[i:i + REPARAR_BATCH_SIZE]).update(
+                    **dict(zip(CAMPOS_RUTA, real))
+                )
+    return sum(len(ids) for ids in por_ruta.values())
+
+
+def reparar_ruta(solo_revisar=False):
+    """
+    Compara la ruta copiada con la jerarquía real y corrige las filas que
+    no coinciden (con solo_revisar, solo las cuenta). Los históricos se
+    comparan contra su ObjetoLugar ya corregido.
+    Devuelve {"objetos": n, "historicos": n} con las filas desfasadas.
+    """
+    return {
+        "objetos": _reparar(ObjetoLugar.objects.all(), RUTA_REAL_OBJETO, solo_revisar),
+        "historicos": _reparar(HistoricoObjeto.objects.all(), RUTA_REAL_HISTORICO, solo_revisar),
+    }
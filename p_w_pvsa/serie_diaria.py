@@ -0,0 +1,95 @@
+"""
+Serie diaria de cantidades por estado (SerieEstadoDiaria). Cada día se
+guarda una vez, agrupado por sector/ubicación/categoría; un gráfico de N
+días lee un rango de fechas del índice en vez de rehacer la historia.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .historia import jerarquia_de, limite_del_dia, totales_al
+from .models import ResumenInventario, SerieEstadoDiaria
+
+CAMPO_POR_ESTADO = {"B": "buenas", "P": "pendientes", "M": "malas"}
+
+# Filtros que acepta la tendencia (los campos que tiene la serie)
+FILTROS_SERIE = ("sector", "ubicacion", "categoria")
+
+
+def _totales_hoy():
+    """{(sector, ubicacion, categoria, estado): cantidad} desde ResumenInventario."""
+    filas = (
+        ResumenInventario.objects.order_by()
+        .values_list("sector_id", "ubicacion_id", "categoria_id", "estado")
+        .annotate(suma=Sum("cantidad"))
+    )
+    return {tuple(f[:4]): f[4] or 0 for f in filas}
+
+
+def _totales_pasados(fecha):
+    """Lo mismo para un día pasado, reconstruido con historia.totales_al."""
+    grupos = totales_al(limite_del_dia(fecha))
+    lugares, tipos = jerarquia_de(
+        grupos, ("piso__ubicacion__sector_id", "piso__ubicacion_id"), ("objeto__objeto_categoria_id",)
+    )
+
+    totales = {}
+    for (lugar_id, tipo_id, estado), cantidad in grupos.items():
+        sector_id, ubicacion_id = lugares.get(lugar_id, (None, None))
+        (categoria_id,) = tipos.get(tipo_id, (None,))
+        clave = (sector_id, ubicacion_id, categoria_id, estado)
+        totales[clave] = totales.get(clave, 0) + cantidad
+    return totales
+
+
+def registrar_dia(fecha):
+    """
+    Rehace las filas de `fecha`: se puede correr varias veces el mismo día
+    (o volver a correr un día pasado) sin duplicar. Hoy se toma del resumen
+    vigente; un día pasado se reconstruye (lanza historia.SinFoto si no hay
+    foto anterior).
+    """
+    totales = _totales_hoy() if fecha >= timezone.localdate() else _totales_pasados(fecha)
+
+    filas = {}
+    for (sector_id, ubicacion_id, categoria_id, estado), cantidad in totales.items():
+        fila = filas.setdefault(
+            (sector_id, ubicacion_id, categoria_id),
+            SerieEstadoDiaria(fecha=fecha, sector_id=sector_id, ubicacion_id=ubicacion_id, categoria_id=categoria_id),
+        )
+        campo = CAMPO_POR_ESTADO.get(estado)
+        if campo:
+            setattr(fila, campo, getattr(fila, campo) + cantidad)
+
+    with transaction.atomic():
+        SerieEstadoDiaria.objects.filter(fecha=fecha).delete()
+        SerieEstadoDiaria.objects.bulk_create(filas.values())
+    return len(filas)
+
+
+def tendencia(dias, filtros):
+    """
+    Series de buenas/pendientes/malas de los últimos `dias` días (hoy
+    incluido), en una consulta por rango de fecha. Los días sin registro
+    no aparecen.
+    """
+    desde = timezone.localdate() - timedelta(days=dias - 1)
+    qs = SerieEstadoDiaria.objects.filter(fecha__gte=desde)
+    for nombre in FILTROS_SERIE:
+        if filtros.get(nombre):
+            qs = qs.filter(**{f"{nombre}_id": filtros[nombre]})
+
+    filas = (
+        qs.values("fecha")
+        .annotate(buenas=Sum("buenas"), pendientes=Sum("pendientes"), malas=Sum("malas"))
+        .order_by("fecha")
+    )
+    serie = {"fechas": [], "buenas": [], "pendientes": [], "malas": []}
+    for f in filas:
+        serie["fechas"].append(f["fecha"].isoformat())
+        serie["buenas"].append(f["buenas"])
+        serie["pendientes"].append(f["pendientes"])
+        serie["malas"].append(f["malas"])
+    return serie
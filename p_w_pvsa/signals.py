@@ -0,0 +1,169 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+
+from .cambios import RUTA_DESDE_OBJETO_LUGAR, registrar_cambios, registrar_cambio_padre
+from .data_version import VERSION_CATALOGO_PK, bump_data_version
+from .etiquetas import HIJOS_LABEL, refrescar_hijos
+from .resumen_totales import DEPENDENCIAS_RESUMEN, agrupar, aplicar_diferencia, recalcular_resumen
+from .ruta_lugar import PADRE_RUTA, propagar_ruta
+from .models import (
+    Sector, Ubicacion, Piso, Lugar, TipoLugar,
+    CategoriaObjeto, Objeto, TipoObjeto,
+    ObjetoLugar, HistoricoObjeto, TipoLugarObjetoTipico,
+)
+
+# Modelos cuyo cambio invalida los resultados calculados del inventario
+MODELOS_INVENTARIO = (
+    Sector, Ubicacion, Piso, Lugar, TipoLugar,
+    CategoriaObjeto, Objeto, TipoObjeto,
+    ObjetoLugar, HistoricoObjeto, TipoLugarObjetoTipico,
+)
+
+# Modelos que alimentan los combos de catalogo.py
+MODELOS_CATALOGO = (
+    Sector, Ubicacion, Piso, Lugar, TipoLugar,
+    CategoriaObjeto, Objeto, TipoObjeto,
+)
+
+
+def _inventario_cambiado(sender, **kwargs):
+    bump_data_version()
+
+
+def _catalogo_cambiado(sender, **kwargs):
+    bump_data_version(VERSION_CATALOGO_PK)
+
+
+def _objeto_lugar_guardado(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        registrar_cambios([instance], "C" if created else "M")
+
+
+def _objeto_lugar_borrado(sender, instance, **kwargs):
+    registrar_cambios([instance], "B")
+
+
+def _padre_guardado(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        registrar_cambio_padre(instance)
+
+
+def _resumen_antes(sender, instance, raw=False, **kwargs):
+    # Lo que el objeto aportaba al resumen antes de guardarse o borrarse
+    instance._resumen_antes = {}
+    if instance.pk and not raw:
+        instance._resumen_antes = agrupar(ObjetoLugar.objects.filter(pk=instance.pk))
+
+
+def _resumen_guardado(sender, instance, raw=False, **kwargs):
+    if not raw:
+        despues = agrupar(ObjetoLugar.objects.filter(pk=instance.pk))
+        aplicar_diferencia(getattr(instance, "_resumen_antes", {}), despues)
+
+
+def _resumen_borrado(sender, instance, **kwargs):
+    aplicar_diferencia(getattr(instance, "_resumen_antes", {}), {})
+
+
+def _padres_antes(sender, instance, raw=False, **kwargs):
+    campos = DEPENDENCIAS_RESUMEN[sender.__name__][0]
+    instance._padres_antes = None
+    if instance.pk and not raw:
+        instance._padres_antes = sender.objects.filter(pk=instance.pk).values_list(*campos).first()
+
+
+def _padres_guardado(sender, instance, created, raw=False, **kwargs):
+    campos, campo_resumen, valores = DEPENDENCIAS_RESUMEN[sender.__name__]
+    antes = getattr(instance, "_padres_antes", None)
+    if created or raw or antes is None:
+        return
+    if antes != tuple(getattr(instance, c) for c in campos):
+        recalcular_resumen(campo_resumen, valores(instance, antes))
+
+
+def _ruta_antes(sender, instance, raw=False, **kwargs):
+    instance._ruta_padre_antes = None
+    if instance.pk and not raw:
+        instance._ruta_padre_antes = (
+            sender.objects.filter(pk=instance.pk).values_list(PADRE_RUTA[sender.__name__], flat=True).first()
+        )
+
+
+def _ruta_guardada(sender, instance, created, raw=False, **kwargs):
+    antes = getattr(instance, "_ruta_padre_antes", None)
+    if created or raw or antes is None:
+        return
+    if antes != getattr(instance, PADRE_RUTA[sender.__name__]):
+        propagar_ruta(instance)
+
+
+def _labels_antes(sender, instance, raw=False, **kwargs):
+    campos = HIJOS_LABEL[sender.__name__][0]
+    instance._labels_antes = None
+    if instance.pk and not raw:
+        instance._labels_antes = sender.objects.filter(pk=instance.pk).values_list(*campos).first()
+
+
+def _labels_guardado(sender, instance, created, raw=False, **kwargs):
+    campos = HIJOS_LABEL[sender.__name__][0]
+    antes = getattr(instance, "_labels_antes", None)
+    if created or raw or antes is None:
+        return
+    if antes != tuple(getattr(instance, c) for c in campos):
+        refrescar_hijos(instance)
+
+
+def connect_signals():
+    for model in MODELOS_INVENTARIO:
+        post_save.connect(
+            _inventario_cambiado, sender=model,
+            dispatch_uid=f"data_version_save_{model.__name__}",
+        )
+        post_delete.connect(
+            _inventario_cambiado, sender=model,
+            dispatch_uid=f"data_version_delete_{model.__name__}",
+        )
+
+    for model in MODELOS_CATALOGO:
+        post_save.connect(
+            _catalogo_cambiado, sender=model,
+            dispatch_uid=f"catalogo_save_{model.__name__}",
+        )
+        post_delete.connect(
+            _catalogo_cambiado, sender=model,
+            dispatch_uid=f"catalogo_delete_{model.__name__}",
+        )
+
+    # Antes que el resumen y los cambios, que ya leen la ruta copiada
+    for model in MODELOS_INVENTARIO:
+        if model.__name__ in PADRE_RUTA:
+            pre_save.connect(_ruta_antes, sender=model, dispatch_uid=f"ruta_pre_save_{model.__name__}")
+            post_save.connect(_ruta_guardada, sender=model, dispatch_uid=f"ruta_save_{model.__name__}")
+
+    post_save.connect(
+        _objeto_lugar_guardado, sender=ObjetoLugar,
+        dispatch_uid="cambios_save_ObjetoLugar",
+    )
+    post_delete.connect(
+        _objeto_lugar_borrado, sender=ObjetoLugar,
+        dispatch_uid="cambios_delete_ObjetoLugar",
+    )
+    for model in MODELOS_INVENTARIO:
+        if model.__name__ in RUTA_DESDE_OBJETO_LUGAR:
+            post_save.connect(
+                _padre_guardado, sender=model,
+                dispatch_uid=f"cambios_save_{model.__name__}",
+            )
+
+    for model in MODELOS_CATALOGO:
+        if model.__name__ in HIJOS_LABEL:
+            pre_save.connect(_labels_antes, sender=model, dispatch_uid=f"labels_pre_save_{model.__name__}")
+            post_save.connect(_labels_guardado, sender=model, dispatch_uid=f"labels_save_{model.__name__}")
+
+    pre_save.connect(_resumen_antes, sender=ObjetoLugar, dispatch_uid="resumen_pre_save_ObjetoLugar")
+    post_save.connect(_resumen_guardado, sender=ObjetoLugar, dispatch_uid="resumen_save_ObjetoLugar")
+    pre_delete.connect(_resumen_antes, sender=ObjetoLugar, dispatch_uid="resumen_pre_delete_ObjetoLugar")
+    post_delete.connect(_resumen_borrado, sender=ObjetoLugar, dispatch_uid="resumen_delete_ObjetoLugar")
+    for model in MODELOS_INVENTARIO:
+        if model.__name__ in DEPENDENCIAS_RESUMEN:
+            pre_save.connect(_padres_antes, sender=model, dispatch_uid=f"resumen_pre_save_{model.__name__}")
+            post_save.connect(_padres_guardado, sender=model, dispatch_uid=f"resumen_save_{model.__name__}")
@@ -1,3 +1,943 @@
-from django.test import TestCase
+import csv
+import gc
+import importlib.util
+import io
+import json
+import pickle
+import tempfile
+import threading
+import weakref
+import zipfile
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Q, Sum
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlsplit
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from openpyxl import load_workbook
+
+from .excel_utils import build_excel_sectores, load_datos_sectores, ubicaciones_para_excel
+from .excel_import import importar_excel, actualizar_desde_excel
+from .views import _add_percentages
+from .cambios import cambios_desde, cursor_actual
+from .data_version import get_data_version
+from .resumen_totales import agrupar, recalcular_resumen, resumen_por_niveles
+from . import excel_zip
+from .excel_zip import stream_zip_sectores
+from .resumen_cache import estadisticas_resumen
+from .historia import limite_del_dia, resumen_por_niveles_al, tomar_foto
+from .export_plano import NOMBRES_PLANO, stream_inventario_plano
+from .filtros import filtrar_objetos_lugar, filtrar_resumen
+from .export_jobs import solicitar_exportacion, ejecutar_exportacion
+from .catalogo import catalogos, limpiar_catalogos
+from .busqueda import buscar, consulta_prefijo
+from .ruta_lugar import reparar_ruta
+from .etiquetas import MODELOS_CON_LABEL, rehacer_labels
+from .forms import CrearLugar, CrearObjetoLugar
+from .models import (
+    Sector, Ubicacion, Piso, Lugar, TipoLugar,
+    CategoriaObjeto, Objeto, TipoObjeto, ObjetoLugar, HistoricoObjeto, ResumenInventario,
+    CambioObjetoLugar, ConLabel, FotoInventario, FotoObjetoLugar, FotoTotal, SerieEstadoDiaria,
+)
+
+
+def crear_inventario(n_ubicaciones, n_pisos, n_lugares, n_objetos, prefijo="U"):
+    """Arma un árbol Sector -> ... -> ObjetoLugar de tamaño configurable."""
+    sector, _ = Sector.objects.get_or_create(sector="Sector test")
+    tipo_lugar, _ = TipoLugar.objects.get_or_create(tipo_de_lugar="Baño")
+    categoria, _ = CategoriaObjeto.objects.get_or_create(nombre_de_categoria="Sanitario")
+    objeto, _ = Objeto.objects.get_or_create(
+        nombre_del_objeto="Lavamanos", objeto_categoria=categoria
+    )
+    tipo, _ = TipoObjeto.objects.get_or_create(objeto=objeto, marca="Fanaloza", material="Loza")
+
+    for u in range(n_ubicaciones):
+        ubicacion = Ubicacion.objects.create(ubicacion=f"{prefijo}{u}", sector=sector)
+        for p in range(n_pisos):
+            piso = Piso.objects.create(piso=p + 1, ubicacion=ubicacion)
+            for l in range(n_lugares):
+                lugar = Lugar.objects.create(
+                    nombre_del_lugar=f"Lugar {l}", piso=piso, lugar_tipo_lugar=tipo_lugar
+                )
+                ObjetoLugar.objects.bulk_create(
+                    [
+                        ObjetoLugar(lugar=lugar, tipo_de_objeto=tipo, cantidad=1, estado="B")
+                        for _ in range(n_objetos)
+                    ]
+                )
+    # bulk_create no pasa por las señales
+    recalcular_resumen()
+
+
+class ExcelSectoresQueriesTest(TestCase):
+    def _ubicaciones(self):
+        return Ubicacion.objects.select_related("sector").order_by("sector__sector", "ubicacion")
+
+    def test_numero_de_consultas_constante(self):
+        # 1 ubicaciones + 1 pisos + 1 lugares + 1 objetos
+        crear_inventario(1, 1, 1, 1, prefijo="A")
+        with self.assertNumQueries(4):
+            build_excel_sectores(self._ubicaciones())
+
+        crear_inventario(3, 3, 4, 5, prefijo="B")
+        with self.assertNumQueries(4):
+            build_excel_sectores(self._ubicaciones())
+
+    def test_filtros_podan_el_arbol(self):
+        crear_inventario(3, 2, 2, 2)
+        ol = ObjetoLugar.objects.order_by("id").first()
+        ol.estado = "M"
+        ol.save()
+
+        with self.assertNumQueries(4):
+            datos = load_datos_sectores(ubicaciones_para_excel(), {"estado": "M"})
+            filas = [f for _ in datos.hojas() for filas in datos.objetos_por_lugar.values() for f in filas]
+        self.assertEqual([u.id for u in datos.ubicaciones], [ol.lugar.piso.ubicacion_id])
+        self.assertEqual([f.id for f in filas], [ol.id])
+
+        wb = load_workbook(io.BytesIO(build_excel_sectores(ubicaciones_para_excel(), {"estado": "M"})))
+        self.assertEqual(len(wb.sheetnames), 1)
+
+    def test_objetos_solo_de_la_hoja_en_curso(self):
+        crear_inventario(2, 2, 2, 2)
+        # Al revés de ORDEN_HOJAS: las hojas que se adelantan quedan guardadas
+        for ubicaciones in (ubicaciones_para_excel(), ubicaciones_para_excel().reverse()):
+            datos = load_datos_sectores(ubicaciones)
+            for ub in datos.hojas():
+                ids = sorted(f.id for filas in datos.objetos_por_lugar.values() for f in filas)
+                self.assertEqual(ids, list(ObjetoLugar.objects.filter(ubicacion=ub).order_by("id").values_list("id", flat=True)))
+
+
+class ExportacionExcelTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        crear_inventario(2, 1, 2, 2)
+
+    def test_reutiliza_archivo_si_no_cambia_la_version(self):
+        with override_settings(EXCEL_EXPORT_DIR=self.tmpdir.name):
+            exportacion = solicitar_exportacion()
+            self.assertEqual(exportacion.estado, "P")
+            ejecutar_exportacion(exportacion.pk)
+            exportacion.refresh_from_db()
+            self.assertEqual(exportacion.estado, "L")
+            self.assertEqual((exportacion.hojas_listas, exportacion.hojas_total), (2, 2))
+
+            self.assertEqual(solicitar_exportacion().pk, exportacion.pk)
+
+            ol = ObjetoLugar.objects.first()
+            ol.cantidad = 7
+            ol.save()
+            self.assertNotEqual(solicitar_exportacion().pk, exportacion.pk)
+
+    def test_borra_las_versiones_anteriores_al_publicar(self):
+        carpeta = Path(self.tmpdir.name)
+        version = get_data_version()
+        for n in (version - 2, version - 1, version + 1):
+            (carpeta / f"SECTORES_v{n}.xlsx").write_bytes(b"")
+        (carpeta / "otro.xlsx").write_bytes(b"")
+
+        with override_settings(EXCEL_EXPORT_DIR=self.tmpdir.name):
+            ejecutar_exportacion(solicitar_exportacion().pk)
+        # Queda la publicada y la de una versión más nueva (otro trabajo en curso)
+        self.assertEqual(
+            sorted(p.name for p in carpeta.iterdir()),
+            sorted(["otro.xlsx", f"SECTORES_v{version}.xlsx", f"SECTORES_v{version + 1}.xlsx"]),
+        )
+
+
+class ZipSectoresTest(TestCase):
+    def test_un_libro_por_sector(self):
+        crear_inventario(2, 1, 1, 2)
+        otro = Sector.objects.create(sector="Norte")
+        Ubicacion.objects.create(ubicacion="Bodega", sector=otro)
+
+        ids = list(Sector.objects.order_by("sector").values_list("id", flat=True))
+        with override_settings(EXCEL_ZIP_WORKERS=1):
+            data = b"".join(stream_zip_sectores(ids))
+
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            self.assertEqual(len(zf.namelist()), 2)
+            self.assertIsNone(zf.testzip())
+
+    def test_tope_de_zip_en_curso(self):
+        User.objects.create_user("u", password="p")
+        self.client.login(username="u", password="p")
+        with mock.patch.object(excel_zip, "_turnos", threading.BoundedSemaphore(1)):
+            abierto = stream_zip_sectores([])
+            resp = self.client.get("/excel/sectores/zip/")
+            self.assertEqual(resp.status_code, 503)
+            self.assertIn("Retry-After", resp)
+
+            # Cerrar la respuesta sin leerla también devuelve el turno
+            abierto.close()
+            resp = self.client.get("/excel/sectores/zip/")
+            self.assertEqual(resp.status_code, 200)
+            resp.close()
+
+    def test_el_pool_se_reusa(self):
+        with mock.patch.object(excel_zip, "_pool", None), mock.patch.object(excel_zip, "ProcessPoolExecutor") as pool:
+            self.assertIs(excel_zip._pool_compartido(), excel_zip._pool_compartido())
+        pool.assert_called_once()
+
+
+class ImportarExcelTest(TestCase):
+    def setUp(self):
+        crear_inventario(2, 2, 2, 3)
+        self.xlsx = build_excel_sectores(ubicaciones_para_excel())
+
+    def test_dry_run_no_guarda(self):
+        antes = ObjetoLugar.objects.count()
+        reporte = importar_excel(io.BytesIO(self.xlsx), dry_run=True)
+        self.assertTrue(reporte.ok, reporte.errores)
+        self.assertEqual(reporte.objetos_creados, antes)
+        self.assertEqual(ObjetoLugar.objects.count(), antes)
+
+    def test_importa_en_lotes_sobre_estructura_existente(self):
+        antes = ObjetoLugar.objects.count()
+        reporte = importar_excel(io.BytesIO(self.xlsx), batch_size=5)
+        self.assertTrue(reporte.ok, reporte.errores)
+        self.assertEqual(sum(reporte.creados.values()), 0)
+        self.assertEqual(ObjetoLugar.objects.count(), 2 * antes)
+
+    def test_archivo_que_no_es_xlsx_es_error_del_formulario(self):
+        User.objects.create_user("u", password="p")
+        self.client.login(username="u", password="p")
+        antes = ObjetoLugar.objects.count()
+        for url in ("/excel/sectores/importar/", "/excel/sectores/actualizar/"):
+            for contenido in (b"esto no es un excel", self.xlsx[:200]):
+                archivo = SimpleUploadedFile("SECTORES.xlsx", contenido)
+                resp = self.client.post(url, {"archivo": archivo})
+                self.assertEqual(resp.status_code, 200)
+                self.assertFormError(resp.context["form"], "archivo", "El archivo no es un Excel .xlsx válido")
+        self.assertEqual(ObjetoLugar.objects.count(), antes)
+
+
+class ActualizarDesdeExcelTest(TestCase):
+    def test_solo_guarda_las_filas_editadas(self):
+        crear_inventario(2, 1, 2, 3)
+        wb = load_workbook(io.BytesIO(build_excel_sectores(ubicaciones_para_excel())))
+        ws = wb.worksheets[0]
+        fila = next(r for r in ws.iter_rows() if isinstance(r[6].value, int))
+        fila[2].value = 9
+        fila[3].value = "Malo"
+        buf = io.BytesIO()
+        wb.save(buf)
+
+        reporte = actualizar_desde_excel(io.BytesIO(buf.getvalue()), batch_size=4)
+        self.assertTrue(reporte.ok, reporte.errores)
+        self.assertEqual(reporte.actualizados, 1)
+        self.assertEqual(reporte.sin_cambios, ObjetoLugar.objects.count() - 1)
+        self.assertEqual(reporte.filas_leidas, ObjetoLugar.objects.count())
+
+        ol = ObjetoLugar.objects.get(pk=fila[6].value)
+        self.assertEqual((ol.cantidad, ol.estado), (9, "M"))
+        historico = HistoricoObjeto.objects.get()
+        self.assertEqual((historico.objeto_del_lugar_id, historico.cantidad_anterior), (ol.pk, 1))
+
+    def test_id_repetido_en_otro_lote(self):
+        crear_inventario(2, 1, 2, 3)
+        wb = load_workbook(io.BytesIO(build_excel_sectores(ubicaciones_para_excel())))
+        filas = [r for ws in wb.worksheets for r in ws.iter_rows() if isinstance(r[6].value, int)]
+        filas[-1][6].value = filas[0][6].value
+        filas[-1][2].value = 9
+        buf = io.BytesIO()
+        wb.save(buf)
+
+        # Los dos quedan a más de un lote de distancia
+        reporte = actualizar_desde_excel(io.BytesIO(buf.getvalue()), batch_size=2)
+        self.assertEqual([e["mensaje"] for e in reporte.errores], [f"ID {filas[0][6].value} repetido en el libro"])
+        self.assertFalse(HistoricoObjeto.objects.exists())
+
+
+class InventarioPlanoTest(TestCase):
+    def setUp(self):
+        crear_inventario(2, 1, 2, 3)
+        self.malo = ObjetoLugar.objects.order_by("id").last()
+        self.malo.estado = "M"
+        self.malo.save()
+
+    def test_csv_por_bloques_con_filtros(self):
+        texto = "".join(stream_inventario_plano("csv", chunk_size=5))
+        filas = list(csv.reader(io.StringIO(texto)))
+        self.assertEqual(filas[0], NOMBRES_PLANO)
+        self.assertEqual(len(filas) - 1, ObjetoLugar.objects.count())
+
+        texto = "".join(stream_inventario_plano("csv", {"estado": "M"}))
+        self.assertEqual([f[0] for f in csv.reader(io.StringIO(texto))][1:], [str(self.malo.id)])
+
+    def test_comando_jsonl(self):
+        salida = io.StringIO()
+        call_command("exportar_inventario", formato="jsonl", lugar=str(self.malo.lugar_id), stdout=salida)
+        registros = [json.loads(linea) for linea in salida.getvalue().splitlines()]
+        self.assertEqual(len(registros), 3)
+        self.assertEqual(registros[-1]["estado"], "M")
+        self.assertEqual(registros[-1]["fecha"], self.malo.fecha.isoformat())
+
+
+class CambiosDesdeTest(TestCase):
+    def test_altas_cambios_y_bajas_desde_el_cursor(self):
+        crear_inventario(1, 1, 2, 2)
+        cursor = cursor_actual()
+        self.assertEqual(cambios_desde(cursor)["cambiados"], [])
+
+        primero, segundo, tercero = ObjetoLugar.objects.order_by("id")[:3]
+        primero.cantidad = 5
+        primero.save()
+        borrado_id = segundo.pk
+        segundo.delete()
+        lugar = tercero.lugar
+        lugar.nombre_del_lugar = "Renombrado"
+        lugar.save()
+
+        pagina = cambios_desde(cursor)
+        self.assertEqual(pagina["borrados"], [borrado_id])
+        cambiados = {f["id"]: f for f in pagina["cambiados"]}
+        self.assertEqual(cambiados[primero.pk]["cantidad"], 5)
+        self.assertEqual(cambiados[tercero.pk]["lugar"], "Renombrado")
+        self.assertEqual(cambios_desde(pagina["cursor"])["cambiados"], [])
+
+        por_pagina = cambios_desde(cursor, limite=1)
+        self.assertTrue(por_pagina["hay_mas"])
+        self.assertEqual(len(por_pagina["cambiados"]) + len(por_pagina["borrados"]), 1)
+
+
+class ResumenInventarioTest(TestCase):
+    def _resumen(self):
+        return {
+            tuple(getattr(r, c) for c in ("piso_id", "tipo_lugar_id", "tipo_objeto_id", "estado")): (r.cantidad, r.filas)
+            for r in ResumenInventario.objects.all()
+        }
+
+    def _esperado(self):
+        return {(c[2], c[3], c[6], c[7]): v for c, v in agrupar(ObjetoLugar.objects.all()).items()}
+
+    def test_se_mantiene_al_guardar_borrar_y_mover(self):
+        crear_inventario(2, 2, 2, 2)
+        ol = ObjetoLugar.objects.order_by("id").first()
+        ol.estado = "M"
+        ol.cantidad = 4
+        ol.save()
+        ObjetoLugar.objects.order_by("id").last().delete()
+        ObjetoLugar.objects.create(lugar=ol.lugar, tipo_de_objeto=ol.tipo_de_objeto, cantidad=2, estado="P")
+        self.assertEqual(self._resumen(), self._esperado())
+
+        lugar = ol.lugar
+        lugar.piso = Piso.objects.exclude(pk=lugar.piso_id).last()
+        lugar.save()
+        self.assertEqual(self._resumen(), self._esperado())
+
+        xlsx = build_excel_sectores(ubicaciones_para_excel())
+        importar_excel(io.BytesIO(xlsx), batch_size=3)
+        self.assertEqual(self._resumen(), self._esperado())
+
+    def test_recalcular_es_todo_o_nada(self):
+        crear_inventario(1, 1, 2, 2)
+        antes = self._resumen()
+        with mock.patch.object(ResumenInventario.objects, "bulk_create", side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            recalcular_resumen()
+        self.assertEqual(self._resumen(), antes)
+
+    def test_clave_con_nulos_es_una_sola_fila(self):
+        # ObjetoLugar sin lugar ni tipo: todas las claves de ruta son NULL
+        for cantidad in (3, 4):
+            ObjetoLugar.objects.create(cantidad=cantidad, estado="B")
+        self.assertEqual(ResumenInventario.objects.get().cantidad, 7)
+        ObjetoLugar.objects.all().delete()
+        self.assertFalse(ResumenInventario.objects.exists())
+
+    @skipUnless(connection.features.supports_nulls_distinct_unique_constraints, "NULLS NOT DISTINCT")
+    def test_restriccion_unica_con_nulos(self):
+        ResumenInventario.objects.create(estado="B", cantidad=1, filas=1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ResumenInventario.objects.create(estado="B", cantidad=1, filas=1)
+
+    def test_resumen_general_lee_los_totales(self):
+        from django.contrib.auth.models import User
+
+        crear_inventario(2, 1, 2, 3)
+        User.objects.create_user("u", password="p")
+        self.client.login(username="u", password="p")
+        resp = self.client.get("/resumen/", {"estado": "B"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(sum(r["total"] for r in resp.context["resumen_sector"]), 12)
+
+
+class ResumenPorNivelesTest(TestCase):
+    def _tres_consultas(self, filtros):
+        """Las consultas que hacía resumen_general sobre ObjetoLugar."""
+        base = filtrar_objetos_lugar(ObjetoLugar.objects.all(), filtros)
+        sumas = dict(
+            total=Sum("cantidad"),
+            buenas=Sum("cantidad", filter=Q(estado="B")),
+            pendientes=Sum("cantidad", filter=Q(estado="P")),
+            malas=Sum("cantidad", filter=Q(estado="M")),
+        )
+        sector = base.values(
+            "lugar__piso__ubicacion__sector__id", "lugar__piso__ubicacion__sector__sector",
+        ).annotate(**sumas).order_by("lugar__piso__ubicacion__sector__sector")
+        ubic = base.values(
+            "lugar__piso__ubicacion__id", "lugar__piso__ubicacion__ubicacion",
+            "lugar__piso__ubicacion__sector__sector",
+        ).annotate(**sumas).order_by("lugar__piso__ubicacion__sector__sector", "lugar__piso__ubicacion__ubicacion")
+        obj = base.values(
+            "tipo_de_objeto__objeto__id", "tipo_de_objeto__objeto__nombre_del_objeto",
+        ).annotate(**sumas).order_by("tipo_de_objeto__objeto__nombre_del_objeto")
+        return [_add_percentages(list(qs)) for qs in (sector, ubic, obj)]
+
+    def test_igual_a_las_tres_consultas(self):
+        crear_inventario(2, 2, 2, 3)
+        crear_inventario(1, 1, 1, 2, prefijo="Z")
+        otro_sector = Sector.objects.create(sector="Aaa")
+        Ubicacion.objects.filter(ubicacion="Z0").update(sector=otro_sector)
+        reparar_ruta()  # update() no pasa por las señales
+        for i, ol in enumerate(ObjetoLugar.objects.order_by("id")[:6]):
+            ol.estado = "PM"[i % 2]
+            ol.cantidad = i
+            ol.save()
+        ObjetoLugar.objects.create(lugar=None, tipo_de_objeto=ol.tipo_de_objeto, cantidad=3, estado="B")
+        recalcular_resumen()
+
+        for filtros in ({}, {"estado": "M"}, {"sector": str(otro_sector.pk)}, {"marca": "Fanaloza"}):
+            with self.assertNumQueries(1):
+                niveles = resumen_por_niveles(filtrar_resumen(ResumenInventario.objects.all(), filtros))
+            self.assertEqual([_add_percentages(n) for n in niveles], self._tres_consultas(filtros))
+
+
+class ResumenCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        crear_inventario(1, 1, 2, 2)
+
+    def test_acierto_hasta_que_cambia_la_version(self):
+        self.client.get("/resumen/", {"estado": "B"})
+        with self.assertNumQueries(1):  # solo la versión del inventario
+            resp = self.client.get("/resumen/", {"estado": "B", "marca": ""})
+        self.assertEqual(resp.context["estado_actual"], "B")
+        self.assertEqual((estadisticas_resumen()["aciertos"], estadisticas_resumen()["fallos"]), (1, 1))
+
+        ol = ObjetoLugar.objects.first()
+        ol.cantidad = 9
+        ol.save()
+        resp = self.client.get("/resumen/", {"estado": "B"})
+        self.assertEqual(estadisticas_resumen()["fallos"], 2)
+        self.assertEqual(resp.context["resumen_sector"][0]["total"], 12)
+
+
+class ApiResumenTest(TestCase):
+    def test_etag_y_304(self):
+        crear_inventario(1, 1, 2, 2)
+        resp = self.client.get("/api/resumen/", {"estado": "B"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["resumen_sector"][0]["total"], 4)
+        self.assertNotIn("malos", resp.json()["resumen_objetos"][0])
+        etag = resp["ETag"]
+
+        with self.assertNumQueries(1):
+            resp = self.client.get("/api/resumen/", {"estado": "B"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+        otro = self.client.get("/api/resumen/", {"estado": "M"})
+        self.assertNotEqual(otro["ETag"], etag)
+
+        ObjetoLugar.objects.first().delete()
+        resp = self.client.get("/api/resumen/", {"estado": "B"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+
+
+class MalosPorObjetoTest(TestCase):
+    def test_paginas_por_cursor(self):
+        crear_inventario(2, 2, 2, 1)
+        ObjetoLugar.objects.update(estado="M")
+        recalcular_resumen()
+        objeto = Objeto.objects.get()
+
+        resp = self.client.get("/resumen/")
+        self.assertNotIn("malos", resp.context["resumen_objetos"][0])
+
+        vistos = []
+        url = f"/resumen/malos/{objeto.pk}/?sector={Sector.objects.get().pk}"
+        with mock.patch("p_w_pvsa.views.MALOS_POR_PAGINA", 3):
+            while url:
+                resp = self.client.get(url)
+                self.assertEqual(resp.status_code, 200)
+                vistos += [ol.pk for ol in resp.context["malos"]]
+                url = resp.context["url_siguiente"]
+
+        esperado = list(
+            ObjetoLugar.objects.order_by(
+                "lugar__piso__ubicacion__ubicacion", "lugar__piso__piso", "lugar__nombre_del_lugar", "id"
+            ).values_list("id", flat=True)
+        )
+        self.assertEqual(vistos, esperado)
+
+        resp = self.client.get(f"/resumen/malos/{objeto.pk}/?despues=inventado")
+        self.assertEqual(resp.status_code, 400)
+
+
+class EstadoAlDiaTest(TestCase):
+    def _actual(self, filtros=None):
+        return resumen_por_niveles(filtrar_resumen(ResumenInventario.objects.all(), filtros or {}))
+
+    def _al(self, cuando, filtros=None):
+        return resumen_por_niveles_al(limite_del_dia(timezone.localdate(cuando)), filtros or {})
+
+    def test_foto_mas_cambios(self):
+        ahora = timezone.now()
+        hace_3, hace_2 = ahora - timedelta(days=3), ahora - timedelta(days=2)
+
+        crear_inventario(2, 1, 2, 2)
+        tomar_foto()
+        FotoInventario.objects.update(tomada=hace_3)
+        dia_1 = self._actual()
+
+        primero, segundo = ObjetoLugar.objects.order_by("id")[:2]
+        primero.estado = "M"
+        primero.save()
+        segundo.delete()
+        ObjetoLugar.objects.create(lugar=primero.lugar, tipo_de_objeto=primero.tipo_de_objeto, cantidad=5, estado="P")
+        CambioObjetoLugar.objects.update(registrado=hace_2)
+        dia_2 = self._actual()
+        dia_2_malos = self._actual({"estado": "M"})
+
+        primero.cantidad = 9
+        primero.save()
+        ObjetoLugar.objects.order_by("id").last().delete()
+
+        self.assertEqual(self._al(hace_3), dia_1)
+        self.assertEqual(self._al(hace_2), dia_2)
+        self.assertEqual(self._al(hace_2, {"estado": "M"}), dia_2_malos)
+
+        resp = self.client.get("/resumen/", {"as_of": timezone.localdate(hace_2).isoformat()})
+        self.assertEqual(resp.context["as_of"], timezone.localdate(hace_2).isoformat())
+        self.assertEqual(resp.context["resumen_sector"][0]["total"], dia_2[0][0]["total"])
+
+        resp = self.client.get("/resumen/", {"as_of": "2001-01-01"})
+        self.assertTrue(resp.context["as_of_error"])
+
+    def test_parte_de_los_totales_guardados_de_la_foto(self):
+        crear_inventario(2, 1, 2, 2)
+        foto = tomar_foto()
+        FotoInventario.objects.update(tomada=timezone.now() - timedelta(days=1))
+        guardados = {
+            (t.id_lugar, t.id_tipo_objeto, t.estado): (t.cantidad, t.filas) for t in FotoTotal.objects.filter(foto=foto)
+        }
+        agrupados = {
+            f[:3]: f[3:]
+            for f in FotoObjetoLugar.objects.filter(foto=foto)
+            .values_list("id_lugar", "id_tipo_objeto", "estado").annotate(Sum("cantidad"), Count("id")).order_by()
+        }
+        self.assertEqual(guardados, agrupados)
+
+        ayer = self._al(timezone.now() - timedelta(days=1))
+        # Sin cambios después de la foto no se vuelve a leer FotoObjetoLugar
+        FotoObjetoLugar.objects.all().delete()
+        self.assertEqual(self._al(timezone.now() - timedelta(days=1)), ayer)
+
+
+class SerieDiariaTest(TestCase):
+    def test_comando_idempotente_con_relleno_y_tendencia(self):
+        hoy = timezone.localdate()
+        crear_inventario(2, 1, 1, 2)
+        tomar_foto()
+        FotoInventario.objects.update(tomada=timezone.now() - timedelta(days=3))
+
+        ol = ObjetoLugar.objects.first()
+        ol.estado = "M"
+        ol.save()
+
+        desde = (hoy - timedelta(days=2)).isoformat()
+        call_command("registrar_serie_diaria", f"--desde={desde}", stdout=io.StringIO(), stderr=io.StringIO())
+        call_command("registrar_serie_diaria", f"--desde={desde}", stdout=io.StringIO(), stderr=io.StringIO())
+        call_command("registrar_serie_diaria", stdout=io.StringIO())
+        self.assertEqual(SerieEstadoDiaria.objects.filter(fecha=hoy).count(), 2)
+        self.assertEqual(SerieEstadoDiaria.objects.count(), 6)
+
+        sector_id = Sector.objects.get().pk
+        with self.assertNumQueries(1):
+            resp = self.client.get("/api/resumen/tendencia/", {"dias": 7, "sector": str(sector_id)})
+        datos = resp.json()
+        self.assertEqual(len(datos["fechas"]), 3)
+        self.assertEqual(datos["malas"][-1], 1)
+        self.assertEqual(datos["buenas"][-1] + datos["malas"][-1], 4)
+
+    def test_relleno_antes_de_la_primera_foto_falla(self):
+        hoy = timezone.localdate()
+        crear_inventario(1, 1, 1, 1)
+        desde = (hoy - timedelta(days=5)).isoformat()
+        with self.assertRaisesMessage(CommandError, "No hay fotos del inventario"):
+            call_command("registrar_serie_diaria", f"--desde={desde}", stdout=io.StringIO())
+
+        tomar_foto()
+        FotoInventario.objects.update(tomada=timezone.now() - timedelta(days=2))
+        primero = timezone.localdate(FotoInventario.objects.get().tomada)
+        with self.assertRaisesMessage(CommandError, f"antes del {primero}"):
+            call_command("registrar_serie_diaria", f"--desde={desde}", stdout=io.StringIO())
+        self.assertFalse(SerieEstadoDiaria.objects.exists())
+
+        call_command("registrar_serie_diaria", f"--desde={primero}", stdout=io.StringIO())
+        self.assertEqual(SerieEstadoDiaria.objects.values("fecha").distinct().count(), (hoy - primero).days + 1)
+
+
+class CatalogoTest(TestCase):
+    def setUp(self):
+        limpiar_catalogos()
+        crear_inventario(2, 1, 2, 1)
+        User.objects.create_user("u", password="p")
+        self.client.login(username="u", password="p")
+
+    def test_se_reutiliza_hasta_que_cambia_un_catalogo(self):
+        primero = catalogos()
+        self.assertEqual(len(primero["lugares"]), 4)
+        self.assertEqual(primero["marcas"], ("Fanaloza",))
+
+        # Cambiar ObjetoLugar no invalida los catálogos
+        ol = ObjetoLugar.objects.first()
+        ol.estado = "M"
+        ol.save()
+        with self.assertNumQueries(1):
+            self.assertIs(catalogos(), primero)
+
+        lugar = Lugar.objects.first()
+        lugar.nombre_del_lugar = "Sala nueva"
+        lugar.save()
+        etiquetas = [o.label for o in catalogos()["lugares"] if o.id == lugar.id]
+        self.assertTrue(etiquetas[0].startswith("Sala nueva | Piso 1 | U"))
+
+    def test_vistas_de_listas_usan_el_catalogo(self):
+        catalogos()
+        for url in ("/objetos-lugar/", "/historicos/", "/lugares/", "/tipos-objeto/"):
+            resp = self.client.get(url)
+            self.assertEqual(resp.status_code, 200)
+        self.assertContains(resp, "Lavamanos (Sanitario)")
+
+
+class BusquedaTest(TestCase):
+    def setUp(self):
+        crear_inventario(1, 1, 3, 1)
+        Lugar.objects.filter(nombre_del_lugar="Lugar 2").update(nombre_del_lugar="Bodega del lugar")
+        rehacer_labels()
+        User.objects.create_user("u", password="p")
+        self.client.login(username="u", password="p")
+
+    def test_prefijo_primero_luego_contiene_con_tope(self):
+        nombres = [r["label"].split(" | ")[0] for r in buscar("lugares", "lug")]
+        self.assertEqual(nombres, ["Lugar 0", "Lugar 1", "Bodega del lugar"])
+        self.assertEqual(len(buscar("lugares", "lug", limite=2)), 2)
+        self.assertEqual(buscar("tipos-objeto", "fanal")[0]["label"], "Lavamanos - Fanaloza Loza")
+
+    def test_prefijo_sin_mayusculas_por_label_busqueda(self):
+        self.assertEqual(buscar("lugares", "LUGAR 1", limite=1)[0]["label"].split(" | ")[0], "Lugar 1")
+        # Un update que no pasa por save(): el prefijo no lo ve hasta rehacer los labels
+        Lugar.objects.filter(nombre_del_lugar="Lugar 0").update(nombre_del_lugar="Almacén")
+        self.assertFalse(consulta_prefijo("lugares", "alm").exists())
+        rehacer_labels()
+        self.assertEqual(len(consulta_prefijo("lugares", "ALM")), 1)
+
+    def test_endpoint_y_listas_sin_catalogo_completo(self):
+        with self.assertNumQueries(4):  # sesión, usuario, prefijo y "contiene"
+            resp = self.client.get("/api/buscar/lugares/", {"q": "bod"})
+        self.assertEqual([r["id"] for r in resp.json()["resultados"]],
+                         list(Lugar.objects.filter(nombre_del_lugar__startswith="Bod").values_list("id", flat=True)))
+        self.assertEqual(self.client.get("/api/buscar/otra-cosa/").status_code, 404)
+
+        lugar = Lugar.objects.get(nombre_del_lugar="Lugar 1")
+        resp = self.client.get("/objetos-lugar/", {"lugar": lugar.pk})
+        self.assertContains(resp, 'value="Lugar 1 | Piso 1')
+        self.assertNotContains(resp, "<option value=\"%d\"" % lugar.pk)
+
+
+@skipUnless(importlib.util.find_spec("numpy"), "el motor analítico necesita NumPy")
+class AnaliticaTest(TestCase):
+    def setUp(self):
+        limpiar_catalogos()
+        crear_inventario(2, 2, 1, 2)
+
+    def _esperado(self, **filtro):
+        # La misma tabla cruzada con el ORM
+        return {
+            (f["tipo_de_objeto__objeto__objeto_categoria_id"], f["lugar__piso_id"], f["estado"]): f["suma"]
+            for f in ObjetoLugar.objects.filter(**filtro)
+            .values("tipo_de_objeto__objeto__objeto_categoria_id", "lugar__piso_id", "estado")
+            .annotate(suma=Sum("cantidad"))
+            .order_by()
+        }
+
+    def test_pivote_y_refresco_incremental(self):
+        from .analitica import MotorAnalitico
+
+        motor = MotorAnalitico().cargar()
+        sector = Sector.objects.get()
+        por = ("categoria", "piso", "estado")
+
+        def pivote():
+            return {
+                (f["categoria"], f["piso"], f["estado"]): f["cantidad"]
+                for f in motor.pivote(por, {"sector": sector.pk})
+            }
+
+        self.assertEqual(pivote(), self._esperado(lugar__piso__ubicacion__sector=sector))
+
+        # Cambios: uno pasa a malo, otro se borra, otro nuevo en un lugar nuevo
+        ol = ObjetoLugar.objects.order_by("id").first()
+        ol.estado = "M"
+        ol.cantidad = 5
+        ol.save()
+        ObjetoLugar.objects.order_by("id").last().delete()
+        piso = Piso.objects.order_by("id").first()
+        lugar = Lugar.objects.create(nombre_del_lugar="Nuevo", piso=piso, lugar_tipo_lugar=TipoLugar.objects.get())
+        ObjetoLugar.objects.create(lugar=lugar, tipo_de_objeto=TipoObjeto.objects.get(), cantidad=3, estado="P")
+
+        anterior = motor.instantanea
+        filas_anteriores = anterior.pivote(("lugar", "estado"))
+        self.assertEqual(motor.refrescar(), 3)
+        self.assertEqual(pivote(), self._esperado(lugar__piso__ubicacion__sector=sector))
+        # La instantánea que tenía tomada un pivote en curso no cambia
+        self.assertIsNot(motor.instantanea, anterior)
+        self.assertEqual(anterior.pivote(("lugar", "estado")), filas_anteriores)
+        self.assertNotEqual(motor.pivote(("lugar", "estado")), filas_anteriores)
+        self.assertEqual(motor.pivote(("lugar",), {"estado": "P"}), [{"lugar": lugar.pk, "cantidad": 3, "filas": 1}])
+        self.assertEqual(motor.pivote(("piso",), {"sector": 999999}), [])
+
+        # Cambio de jerarquía: el piso se va a otro sector sin recargar las filas
+        otro = Sector.objects.create(sector="Otro")
+        piso.ubicacion = Ubicacion.objects.create(ubicacion="Nueva", sector=otro)
+        piso.save()
+        motor.refrescar()
+        esperado = ObjetoLugar.objects.filter(lugar__piso=piso).aggregate(s=Sum("cantidad"))["s"]
+        self.assertEqual(motor.pivote((), {"sector": otro.pk})[0]["cantidad"], esperado)
+        self.assertEqual(pivote(), self._esperado(lugar__piso__ubicacion__sector=sector))
+
+    def test_api_pivote(self):
+        User.objects.create_user("u", password="p")
+        self.client.login(username="u", password="p")
+        resp = self.client.get("/api/pivote/", {"por": "ubicacion,estado"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(sum(f["cantidad"] for f in resp.json()["filas"]), 8)
+        self.assertEqual(self.client.get("/api/pivote/", {"por": "color"}).status_code, 400)
+        # 4^40 combinaciones no caben en un int64
+        resp = self.client.get("/api/pivote/", {"por": ",".join(["estado"] * 40)})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("Demasiadas combinaciones", resp.json()["error"])
+
+
+class ListasKeysetTest(TestCase):
+    def setUp(self):
+        crear_inventario(2, 2, 2, 1)
+        tipo = TipoObjeto.objects.get()
+        # Objetos sin lugar: NULL en los campos de orden
+        ObjetoLugar.objects.bulk_create(
+            [ObjetoLugar(lugar=None, tipo_de_objeto=tipo, cantidad=1, estado="B") for _ in range(3)]
+        )
+        User.objects.create_user("u", password="p")
+        self.client.login(username="u", password="p")
+
+    def _recorrer(self, url, clave, por_pagina):
+        vistos, params = [], {"por_pagina": por_pagina}
+        while True:
+            resp = self.client.get(url, params)
+            self.assertEqual(resp.status_code, 200)
+            vistos += [fila.pk for fila in resp.context[clave]]
+            if not resp.context["url_siguiente"]:
+                return vistos
+            params = parse_qs(urlsplit(resp.context["url_siguiente"]).query)
+
+    def test_objetos_lugar_recorre_todo_sin_repetir(self):
+        vistos = self._recorrer("/objetos-lugar/", "objetos", 3)
+        self.assertEqual(sorted(vistos), sorted(ObjetoLugar.objects.values_list("pk", flat=True)))
+        self.assertEqual(len(vistos), len(set(vistos)))
+        # NULL va primero en orden ascendente
+        self.assertIsNone(ObjetoLugar.objects.get(pk=vistos[0]).lugar_id)
+        self.assertEqual(self.client.get("/objetos-lugar/", {"despues": "basura"}).status_code, 400)
+
+    def test_historicos_descendente_por_fecha(self):
+        for ol in ObjetoLugar.objects.exclude(lugar=None):
+            ol.cantidad = 2
+            ol.save()
+        HistoricoObjeto.objects.filter(pk__in=HistoricoObjeto.objects.order_by("pk")[:4].values("pk")).update(
+            fecha_anterior=timezone.localdate() - timedelta(days=5)
+        )
+        vistos = self._recorrer("/historicos/", "historicos", 3)
+        self.assertEqual(len(vistos), HistoricoObjeto.objects.count())
+        fechas = [HistoricoObjeto.objects.get(pk=pk).fecha_anterior for pk in vistos]
+        self.assertEqual(fechas, sorted(fechas, reverse=True))
+
+
+class BenchIndicesTest(TestCase):
+    def test_consultas_calientes_usan_indices_y_no_dejan_datos(self):
+        salida = io.StringIO()
+        call_command("bench_indices", "--lugares=200", "--por-lugar=5", stdout=salida)
+        self.assertNotIn("ESCANEO COMPLETO", salida.getvalue())
+        self.assertFalse(ObjetoLugar.objects.exists())
+        self.assertFalse(Lugar.objects.exists())
+
+
+class RutaLugarTest(TestCase):
+    def setUp(self):
+        crear_inventario(2, 1, 1, 2)
+        self.ol = ObjetoLugar.objects.order_by("id").first()
+        self.ol.cantidad = 7
+        self.ol.save()  # deja un histórico
+        self.otro_sector = Sector.objects.create(sector="Otro")
+
+    def _rutas(self):
+        return set(ObjetoLugar.objects.values_list("piso_id", "ubicacion_id", "sector_id")) | set(
+            HistoricoObjeto.objects.values_list("piso_id", "ubicacion_id", "sector_id")
+        )
+
+    def test_se_llena_al_crear(self):
+        lugar = self.ol.lugar
+        esperada = (lugar.piso_id, lugar.piso.ubicacion_id, lugar.piso.ubicacion.sector_id)
+        nuevo = ObjetoLugar.objects.create(lugar=lugar, tipo_de_objeto=self.ol.tipo_de_objeto, cantidad=1, estado="B")
+        self.assertEqual((nuevo.piso_id, nuevo.ubicacion_id, nuevo.sector_id), esperada)
+        historico = HistoricoObjeto.objects.get()
+        self.assertEqual((historico.piso_id, historico.ubicacion_id, historico.sector_id), esperada)
+        self.assertEqual(reparar_ruta(solo_revisar=True), {"objetos": 0, "historicos": 0})
+
+    def test_se_propaga_al_mover_ubicacion_y_lugar(self):
+        ubicacion = self.ol.lugar.piso.ubicacion
+        ubicacion.sector = self.otro_sector
+        ubicacion.save()
+        filtros = {"sector": str(self.otro_sector.pk)}
+        self.assertEqual(
+            set(filtrar_objetos_lugar(ObjetoLugar.objects.all(), filtros)),
+            set(ObjetoLugar.objects.filter(lugar__piso__ubicacion=ubicacion)),
+        )
+        self.assertEqual(HistoricoObjeto.objects.get().sector_id, self.otro_sector.pk)
+        self.assertEqual(
+            ResumenInventario.objects.filter(sector=self.otro_sector).aggregate(s=Sum("cantidad"))["s"], 8
+        )
+
+        # El lugar vuelve a un piso de la otra ubicación
+        lugar = self.ol.lugar
+        lugar.piso = Piso.objects.exclude(ubicacion=ubicacion).get()
+        lugar.save()
+        self.assertFalse(ObjetoLugar.objects.filter(sector=self.otro_sector).exists())
+        self.assertFalse(ResumenInventario.objects.filter(sector=self.otro_sector).exists())
+        self.assertEqual(reparar_ruta(solo_revisar=True), {"objetos": 0, "historicos": 0})
+
+    def test_mover_el_objeto_de_lugar_mueve_sus_historicos(self):
+        destino = Lugar.objects.exclude(pk=self.ol.lugar_id).get()
+        self.ol.lugar = destino
+        self.ol.save()
+        self.assertEqual(HistoricoObjeto.objects.get().piso_id, destino.piso_id)
+        self.assertEqual(HistoricoObjeto.objects.count(), 1)  # moverlo no es un cambio de estado
+
+    def test_reparar_corrige_el_desfase(self):
+        esperadas = self._rutas()
+        ObjetoLugar.objects.update(sector=self.otro_sector)
+        HistoricoObjeto.objects.update(piso=None)
+        self.assertEqual(reparar_ruta(solo_revisar=True), {"objetos": 4, "historicos": 1})
+
+        salida = io.StringIO()
+        call_command("reparar_ruta_lugar", stdout=salida)
+        self.assertIn("ObjetoLugar corregidos: 4", salida.getvalue())
+        self.assertEqual(self._rutas(), esperadas)
+        self.assertFalse(ResumenInventario.objects.filter(sector=self.otro_sector).exists())
+
+
+class LabelsTest(TestCase):
+    def setUp(self):
+        crear_inventario(1, 2, 2, 1)
+        self.lugar = Lugar.objects.order_by("id").first()
+
+    def test_renombrar_un_padre_rehace_los_labels_de_abajo(self):
+        ubicacion = self.lugar.piso.ubicacion
+        ubicacion.ubicacion = "Torre"
+        ubicacion.save()
+        self.assertEqual(Lugar.objects.get(pk=self.lugar.pk).label, "Lugar 0 | Piso 1 | Torre")
+        self.assertEqual(set(Piso.objects.values_list("label", flat=True)), {"Piso 1 | Torre", "Piso 2 | Torre"})
+
+        sector = ubicacion.sector
+        sector.sector = "Norte"
+        sector.save()
+        self.assertEqual(Ubicacion.objects.get().label, "Torre | Sector: Norte")
+
+        piso = self.lugar.piso
+        piso.piso = 9
+        piso.save()
+        self.assertEqual(Lugar.objects.get(pk=self.lugar.pk).label, "Lugar 0 | Piso 9 | Torre")
+
+        categoria = CategoriaObjeto.objects.get()
+        categoria.nombre_de_categoria = "Baños"
+        categoria.save()
+        objeto = Objeto.objects.get()
+        self.assertEqual(objeto.label, "Lavamanos (Baños)")
+        objeto.nombre_del_objeto = "Lavatorio"
+        objeto.save()
+        self.assertEqual(TipoObjeto.objects.get().label, "Lavatorio - Fanaloza Loza")
+
+    def test_combos_sin_consultas_por_fila(self):
+        with self.assertNumQueries(1):
+            html = str(CrearLugar()["piso"])
+        self.assertIn("Piso 2 | U0", html)
+        with self.assertNumQueries(1):
+            str(CrearObjetoLugar()["tipo_de_objeto"])
+        ol = ObjetoLugar.objects.select_related("lugar", "tipo_de_objeto").first()
+        with self.assertNumQueries(0):
+            texto = str(ol)
+        self.assertIn("Lavamanos - Fanaloza Loza en Lugar", texto)
+
+    def test_rehacer_labels_tras_update(self):
+        Ubicacion.objects.update(ubicacion="Anexo")
+        self.assertEqual(rehacer_labels(), {"Ubicacion": 1, "Piso": 2, "Lugar": 4, "Objeto": 0, "TipoObjeto": 0})
+        self.assertTrue(Lugar.objects.filter(label="Lugar 1 | Piso 2 | Anexo").exists())
+
+    def test_cada_modelo_con_label_define_armar_label(self):
+        modelos = [m for m in apps.get_models() if issubclass(m, ConLabel)]
+        self.assertEqual(
+            {m.__name__ for m in modelos}, {m.__name__ for m, _ in MODELOS_CON_LABEL}
+        )
+        for modelo in modelos:
+            self.assertTrue(callable(getattr(modelo, "armar_label", None)), modelo.__name__)
+
+
+class CargaEnLoteTest(TestCase):
+    def setUp(self):
+        crear_inventario(3, 2, 2, 2)  # 24 objetos en 12 lugares
+
+    def test_cadena_cuesta_una_consulta_por_nivel(self):
+        objetos = list(ObjetoLugar.objects.order_by("id"))
+        with self.assertNumQueries(4):  # lugar, piso, ubicación, sector
+            sectores = {ol.lugar.piso.ubicacion.sector.sector for ol in objetos}
+        self.assertEqual(sectores, {"Sector test"})
+
+    def test_sigue_despues_del_select_related(self):
+        # Lo que hace la plantilla de detalle_tipo_objeto
+        usados = list(ObjetoLugar.objects.select_related("lugar").order_by("-fecha"))
+        with self.assertNumQueries(2):
+            ubicaciones = {u.lugar.piso.ubicacion.ubicacion for u in usados}
+        self.assertEqual(ubicaciones, {"U0", "U1", "U2"})
+
+    def test_sin_el_queryset_es_fila_a_fila(self):
+        objetos = list(ObjetoLugar._base_manager.order_by("id"))
+        with self.assertNumQueries(len(objetos)):
+            [ol.lugar for ol in objetos]
+
+    def test_modo_debug_registra_la_relacion(self):
+        objetos = list(ObjetoLugar.objects.all())
+        with override_settings(CARGA_EN_LOTE_DEBUG=True), self.assertLogs("p_w_pvsa.carga_en_lote", "INFO") as logs:
+            objetos[5].tipo_de_objeto
+        self.assertIn("ObjetoLugar.tipo_de_objeto para 24 filas", logs.output[0])
+
+    def test_una_fila_no_retiene_a_sus_hermanas(self):
+        objetos = list(ObjetoLugar.objects.order_by("id"))
+        primera, otra = objetos[0], weakref.ref(objetos[1])
+        del objetos
+        gc.collect()
+        self.assertIsNone(otra())
+        # Sin hermanas vivas carga como Django, y se puede serializar sola
+        with self.assertNumQueries(1):
+            primera.lugar
+        self.assertEqual(pickle.loads(pickle.dumps(primera)).pk, primera.pk)
@@ -4,6 +4,12 @@ from . import views
 urlpatterns = [
 
     path("excel/sectores/",views.descargar_excel_sectores, name="descargar_excel_sectores"),
+    path("excel/sectores/importar/",views.importar_excel_sectores, name="importar_excel_sectores"),
+    path("excel/sectores/actualizar/",views.actualizar_excel_sectores, name="actualizar_excel_sectores"),
+    path("excel/sectores/zip/",views.descargar_zip_sectores, name="descargar_zip_sectores"),
+    path("excel/sectores/exportar/",views.exportar_excel_sectores, name="exportar_excel_sectores"),
+    path("excel/sectores/exportar/<int:exportacion_id>/",views.estado_exportacion_excel, name="estado_exportacion_excel"),
+    path("excel/sectores/exportar/<int:exportacion_id>/descargar/",views.descargar_exportacion_excel, name="descargar_exportacion_excel"),
     # Auth
     path("", views.home, name="home"),
     path("signin/", views.signin, name="signin"),
@@ -40,6 +46,8 @@ urlpatterns = [
 
     # OBJETO DEL LUGAR
     path("objetos-lugar/", views.lista_objetos_lugar, name="lista_objetos_lugar"),
+    path("objetos-lugar/exportar/", views.exportar_objetos_lugar, name="exportar_objetos_lugar"),
+    path("objetos-lugar/cambios/", views.cambios_objetos_lugar, name="cambios_objetos_lugar"),
     path("objetos-lugar/<int:objeto_lugar_id>/", views.detalle_objeto_lugar, name="detalle_objeto_lugar"),
     path("objetos-lugar/<int:objeto_lugar_id>/editar/", views.editar_objeto_lugar, name="editar_objeto_lugar"),
     path("objetos-lugar/<int:objeto_lugar_id>/borrar/", views.borrar_objeto_lugar, name="borrar_objeto_lugar"),
@@ -87,6 +95,12 @@ urlpatterns = [
 
     # RESUMEN
     path("resumen/", views.resumen_general, name="resumen_general"),
+    path("resumen/cache/", views.estadisticas_cache_resumen, name="estadisticas_cache_resumen"),
+    path("resumen/malos/<int:objeto_id>/", views.resumen_malos_objeto, name="resumen_malos_objeto"),
+    path("api/resumen/", views.api_resumen, name="api_resumen"),
+    path("api/resumen/tendencia/", views.api_tendencia_resumen, name="api_tendencia_resumen"),
+    path("api/buscar/<slug:tipo>/", views.buscar_catalogo, name="buscar_catalogo"),
+    path("api/pivote/", views.api_pivote, name="api_pivote"),
 
     path("ajax/ubicaciones-por-sector/",views.ajax_ubicaciones_por_sector,name="ajax_ubicaciones_por_sector",),
     path("ajax/pisos-por-ubicacion/",views.ajax_pisos_por_ubicacion,name="ajax_pisos_por_ubicacion",),
@@ -4,11 +4,30 @@ from django.contrib.auth.models import User
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse
+from django.conf import settings
 from django.db import transaction
-from django.http import HttpResponse, JsonResponse
-from .excel_utils import build_excel_sectores
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import date
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, FileResponse, Http404
+from .excel_utils import stream_excel_sectores, ubicaciones_para_excel, XLSX_CONTENT_TYPE
+from .export_jobs import exportacion_vigente, solicitar_exportacion, estado_exportacion
+from .excel_zip import ZipOcupado, stream_zip_sectores
+from .excel_import import ArchivoInvalido, importar_excel, actualizar_desde_excel
+from .filtros import leer_filtros, hay_filtros, filtrar_objetos_lugar, filtrar_resumen, leer_filtros_lista, filtrar_lista
+from .resumen_totales import resumen_por_niveles
+from .paginacion import pagina_keyset, CursorInvalido
+from .historia import SinFoto, foto_para, limite_del_dia, resumen_por_niveles_al
+from .serie_diaria import tendencia
+from .catalogo import catalogos
+from .busqueda import LIMITE_BUSQUEDA, buscar, etiqueta
+from .resumen_cache import obtener_resumen, estadisticas_resumen, clave_resumen
+from .data_version import get_data_version
+from .export_plano import FORMATOS_PLANO, stream_inventario_plano
+from .cambios import cambios_desde, cursor_para_fecha
 from django.db.models import Sum, Q
-from django.views.decorators.http import require_GET
+from django.views.decorators.http import require_GET, require_POST, etag
+from django.utils.cache import patch_cache_control
 
 from .forms import (
     CrearSector, CrearUbicacion, CrearPiso, CrearLugar,
@@ -17,13 +36,13 @@ from .forms import (
     EditarSector, EditarUbicacion, EditarPiso, EditarLugar,
     EditarTipoLugar, EditarCategoria, EditarObjeto,
     EditarTipoObjeto, EditarObjetoLugar, EditarHistorico,
-    EstructuraCompletaForm, ObjetoLugarFilaFormSet, 
+    EstructuraCompletaForm, ObjetoLugarFilaFormSet, ImportarExcelForm, ActualizarExcelForm,
 )
 
 from .models import (
     Sector, Ubicacion, Piso, Lugar, TipoLugar,
     CategoriaObjeto, Objeto, TipoObjeto,
-    ObjetoLugar, HistoricoObjeto, TipoLugarObjetoTipico,
+    ObjetoLugar, HistoricoObjeto, TipoLugarObjetoTipico, ExportacionExcel, ResumenInventario,
 )
 
 # -------------------
@@ -32,13 +51,160 @@ from .models import (
 
 @login_required
 def descargar_excel_sectores(request):
-    ubicaciones = (Ubicacion.objects.select_related("sector").order_by("sector__sector","ubicacion"))
-    xlsx_bytes = build_excel_sectores(ubicaciones)
+    # Acepta los mismos filtros que el resumen general (?sector=&estado=...)
+    filtros = leer_filtros(request.GET)
 
-    response = HttpResponse(xlsx_bytes, content_type="application/vnd.openxmlformats-officedocument.""spreadsheetml.sheet")
+    # Si ya hay un archivo armado para la versión actual del inventario, se entrega tal cual
+    exportacion = None if hay_filtros(filtros) else exportacion_vigente()
+    if exportacion:
+        return FileResponse(open(exportacion.archivo, "rb"), as_attachment=True, filename="SECTORES.xlsx", content_type=XLSX_CONTENT_TYPE)
+
+    ubicaciones = ubicaciones_para_excel()
+    # El xlsx se arma en un archivo temporal acotado y se envía por bloques
+    response = StreamingHttpResponse(stream_excel_sectores(ubicaciones, filtros), content_type=XLSX_CONTENT_TYPE)
     response["Content-Disposition"]= 'attachment; filename= "SECTORES.xlsx"'
     return response
 
+
+@login_required
+def descargar_zip_sectores(request):
+    """Un SECTORES.xlsx por Sector, armados en paralelo y entregados en un ZIP."""
+    filtros = leer_filtros(request.GET)
+    sectores = Sector.objects.order_by("sector")
+    if filtros["sector"]:
+        sectores = sectores.filter(pk=filtros["sector"])
+    sector_ids = list(sectores.values_list("id", flat=True))
+    try:
+        chunks = stream_zip_sectores(sector_ids, filtros=filtros)
+    except ZipOcupado:
+        response = HttpResponse("Hay otras descargas ZIP en curso, intente en un momento", status=503)
+        response["Retry-After"] = "30"
+        return response
+    response = StreamingHttpResponse(chunks, content_type="application/zip")
+    response["Content-Disposition"] = 'attachment; filename="SECTORES.zip"'
+    return response
+
+
+@login_required
+def importar_excel_sectores(request):
+    """
+    Carga masiva desde un xlsx con el formato de SECTORES.xlsx.
+    Por defecto solo simula y muestra el reporte.
+    """
+    reporte = None
+    if request.method == "POST":
+        form = ImportarExcelForm(request.POST, request.FILES)
+        if form.is_valid():
+            cd = form.cleaned_data
+            try:
+                reporte = importar_excel(cd["archivo"], tipo_lugar=cd["tipo_lugar"], dry_run=cd["dry_run"])
+            except ArchivoInvalido as e:
+                form.add_error("archivo", str(e))
+    else:
+        form = ImportarExcelForm()
+
+    resumen = None
+    if reporte:
+        resumen = [
+            ("Filas de objetos leídas", reporte.filas_leidas),
+            ("Objetos del lugar a insertar" if reporte.dry_run else "Objetos del lugar insertados", reporte.objetos_creados),
+        ] + [(f"Nuevos: {nombre.replace('_', ' ')}", n) for nombre, n in reporte.creados.items()]
+
+    return render(
+        request,
+        "importar/importar_excel.html",
+        {
+            "titulo": "Importar inventario desde Excel",
+            "ayuda": "Mismo formato que el Excel de sectores. Para objetos que no existen agrega una columna \"Categoría\".",
+            "form": form,
+            "reporte": reporte,
+            "resumen": resumen,
+        },
+    )
+
+
+@login_required
+def actualizar_excel_sectores(request):
+    """
+    Aplica un SECTORES.xlsx editado: cambia cantidad/estado/detalle de las
+    filas con ID y guarda su histórico. Por defecto solo simula.
+    """
+    reporte = None
+    if request.method == "POST":
+        form = ActualizarExcelForm(request.POST, request.FILES)
+        if form.is_valid():
+            cd = form.cleaned_data
+            try:
+                reporte = actualizar_desde_excel(cd["archivo"], dry_run=cd["dry_run"])
+            except ArchivoInvalido as e:
+                form.add_error("archivo", str(e))
+    else:
+        form = ActualizarExcelForm()
+
+    resumen = avisos = None
+    if reporte:
+        resumen = [
+            ("Filas de objetos leídas", reporte.filas_leidas),
+            ("Filas sin ID (ignoradas)", reporte.sin_id),
+            ("Sin cambios", reporte.sin_cambios),
+            ("Objetos a actualizar" if reporte.dry_run else "Objetos actualizados", reporte.actualizados),
+        ]
+        avisos = [f"El ID {ol_id} ya no existe" for ol_id in reporte.no_encontrados]
+
+    return render(
+        request,
+        "importar/importar_excel.html",
+        {
+            "titulo": "Actualizar inventario desde Excel",
+            "ayuda": "Sube el Excel de sectores descargado y editado. Solo se aplican cantidad, estado y detalle; cada cambio queda en el histórico.",
+            "form": form,
+            "reporte": reporte,
+            "resumen": resumen,
+            "avisos": avisos,
+        },
+    )
+
+
+def _exportacion_json(exportacion, status=200):
+    data = estado_exportacion(exportacion)
+    data["url_estado"] = reverse("estado_exportacion_excel", kwargs={"exportacion_id": exportacion.id})
+    data["url_descarga"] = (
+        reverse("descargar_exportacion_excel", kwargs={"exportacion_id": exportacion.id})
+        if exportacion.estado == "L"
+        else None
+    )
+    return JsonResponse(data, status=status)
+
+
+@login_required
+@require_POST
+def exportar_excel_sectores(request):
+    """
+    Encola la generación de SECTORES.xlsx en segundo plano.
+    Si el inventario no cambió desde la última exportación, responde
+    de inmediato con el archivo ya armado.
+    """
+    exportacion = solicitar_exportacion(usuario=request.user)
+    return _exportacion_json(exportacion, status=200 if exportacion.estado == "L" else 202)
+
+
+@login_required
+@require_GET
+def estado_exportacion_excel(request, exportacion_id):
+    exportacion = get_object_or_404(ExportacionExcel, pk=exportacion_id)
+    return _exportacion_json(exportacion)
+
+
+@login_required
+@require_GET
+def descargar_exportacion_excel(request, exportacion_id):
+    exportacion = get_object_or_404(ExportacionExcel, pk=exportacion_id, estado="L")
+    try:
+        archivo = open(exportacion.archivo, "rb")
+    except OSError:
+        raise Http404("El archivo de la exportación ya no existe")
+    return FileResponse(archivo, as_attachment=True, filename="SECTORES.xlsx", content_type=XLSX_CONTENT_TYPE)
+
 @login_required
 @transaction.atomic
 def crear_estructura(request):
@@ -324,7 +490,7 @@ def lista_ubicaciones(request):
     ubicaciones = ubicaciones_qs.order_by("ubicacion")
 
     # para armar el combo
-    sectores = Sector.objects.all().order_by("sector")
+    sectores = catalogos()["sectores"]
 
     return render(
         request,
@@ -415,7 +581,7 @@ def lista_pisos(request):
     pisos = pisos_qs.order_by("ubicacion__ubicacion", "piso")
 
     # para llenar el combo de ubicaciones
-    ubicaciones = Ubicacion.objects.select_related("sector").all().order_by("ubicacion")
+    ubicaciones = catalogos()["ubicaciones"]
 
     return render(
         request,
@@ -530,12 +696,10 @@ def lista_lugares(request):
     )
 
     # combos
-    ubicaciones = Ubicacion.objects.select_related("sector").all().order_by("ubicacion")
+    catalogo = catalogos()
+    ubicaciones = catalogo["ubicaciones"]
     # OJO: aquí mandamos **todos** los pisos; el JS se encarga de filtrarlos en el combo
-    pisos = Piso.objects.select_related("ubicacion").all().order_by(
-        "ubicacion__ubicacion",
-        "piso",
-    )
+    pisos = catalogo["pisos"]
 
     return render(
         request,
@@ -622,12 +786,50 @@ def borrar_lugar(request, lugar_id):
 # OBJETO DEL LUGAR
 # -------------------
 
+LISTA_POR_PAGINA = getattr(settings, "LISTA_POR_PAGINA", 50)
+LISTA_POR_PAGINA_MAX = getattr(settings, "LISTA_POR_PAGINA_MAX", 500)
+
+# Orden de las listas paginadas: el último campo (id) desempata para el cursor
+# Columnas propias (la ruta copiada de lugar), con índice: la lista sin
+# filtros recorre ol_ruta_idx en vez de ordenar el join de cuatro tablas
+ORDEN_OBJETOS_LUGAR = ("ubicacion_id", "piso_id", "lugar_id", "id")
+ORDEN_HISTORICOS = (
+    "-fecha_anterior",
+    "objeto_del_lugar__lugar__piso__ubicacion__ubicacion",
+    "objeto_del_lugar__lugar__piso__piso",
+    "objeto_del_lugar__lugar__nombre_del_lugar",
+    "id",
+)
+
+
+def _por_pagina(request):
+    """?por_pagina=N del cliente, entre 1 y LISTA_POR_PAGINA_MAX."""
+    try:
+        por_pagina = int(request.GET.get("por_pagina") or LISTA_POR_PAGINA)
+    except ValueError:
+        por_pagina = LISTA_POR_PAGINA
+    return max(1, min(por_pagina, LISTA_POR_PAGINA_MAX))
+
+
+def _urls_keyset(request, siguiente):
+    """Links a la página siguiente y a la primera, con los mismos filtros."""
+    params = request.GET.copy()
+    params.pop("despues", None)
+    url_primera = f"{request.path}?{params.urlencode()}" if request.GET.get("despues") else None
+    url_siguiente = None
+    if siguiente:
+        params["despues"] = siguiente
+        url_siguiente = f"{request.path}?{params.urlencode()}"
+    return {"url_siguiente": url_siguiente, "url_primera": url_primera}
+
+
 @login_required
 def lista_objetos_lugar(request):
-    lugar_id = request.GET.get("lugar", "").strip()
-    objeto_id = request.GET.get("objeto", "").strip()
-    tipo_id = request.GET.get("tipo", "").strip()
-    estado_val = request.GET.get("estado", "").strip()
+    filtros = leer_filtros_lista(request.GET)
+    lugar_id = filtros["lugar"]
+    objeto_id = filtros["objeto"]
+    tipo_id = filtros["tipo"]
+    estado_val = filtros["estado"]
 
     qs = ObjetoLugar.objects.select_related(
         "lugar",
@@ -640,60 +842,17 @@ def lista_objetos_lugar(request):
     ).all()
 
     # Filtros
-    if lugar_id:
-        try:
-            qs = qs.filter(lugar_id=int(lugar_id))
-        except ValueError:
-            lugar_id = ""
-
-    if objeto_id:
-        try:
-            qs = qs.filter(tipo_de_objeto__objeto_id=int(objeto_id))
-        except ValueError:
-            objeto_id = ""
-
-    if tipo_id:
-        try:
-            qs = qs.filter(tipo_de_objeto_id=int(tipo_id))
-        except ValueError:
-            tipo_id = ""
+    qs = filtrar_lista(qs, filtros)
 
-    if estado_val:
-        qs = qs.filter(estado=estado_val)
-
-    objetos_lugar = qs.order_by(
-        "lugar__piso__ubicacion__ubicacion",
-        "lugar__piso__piso",
-        "lugar__nombre_del_lugar",
-        "tipo_de_objeto__objeto__nombre_del_objeto",
-    )
-
-    # Datos para los combos
-    lugares = (
-        Lugar.objects.select_related(
-            "piso",
-            "piso__ubicacion",
-            "piso__ubicacion__sector",
-        )
-        .all()
-        .order_by(
-            "piso__ubicacion__ubicacion",
-            "piso__piso",
-            "nombre_del_lugar",
+    try:
+        objetos_lugar, siguiente = pagina_keyset(
+            qs, ORDEN_OBJETOS_LUGAR, request.GET.get("despues"), _por_pagina(request)
         )
-    )
+    except CursorInvalido:
+        return HttpResponse("Cursor inválido", status=400)
 
-    objetos = (
-        Objeto.objects.select_related("objeto_categoria")
-        .all()
-        .order_by("objeto_categoria__nombre_de_categoria", "nombre_del_objeto")
-    )
-
-    tipos = (
-        TipoObjeto.objects.select_related("objeto", "objeto__objeto_categoria")
-        .all()
-        .order_by("objeto__nombre_del_objeto", "marca", "material")
-    )
+    # Los filtros de lugar/objeto/tipo buscan por texto (buscar_catalogo);
+    # aquí solo el texto de lo ya elegido
 
     # choices del modelo (por ejemplo [("B", "Bueno"), ...])
     estados = ObjetoLugar.ESTADO
@@ -703,9 +862,10 @@ def lista_objetos_lugar(request):
         "objeto_lugar/objetos_lugar.html",  # <-- cambia la ruta si tu HTML está en otro lado
         {
             "objetos": objetos_lugar,
-            "lugares": lugares,
-            "objetos_catalogo": objetos,
-            "tipos": tipos,
+            **_urls_keyset(request, siguiente),
+            "lugar_label": etiqueta("lugares", lugar_id),
+            "objeto_label": etiqueta("objetos", objeto_id),
+            "tipo_label": etiqueta("tipos-objeto", tipo_id),
             "estados": estados,
             "lugar_actual": lugar_id,
             "objeto_actual": objeto_id,
@@ -715,9 +875,55 @@ def lista_objetos_lugar(request):
     )
 
 
+@login_required
+def exportar_objetos_lugar(request):
+    """
+    Inventario plano (una fila por ObjetoLugar) en CSV o JSONL, con los
+    mismos filtros que el listado. Sale en streaming.
+    """
+    formato = request.GET.get("formato", "csv")
+    if formato not in FORMATOS_PLANO:
+        return HttpResponse("Formato no soportado", status=400)
+
+    content_type, extension = FORMATOS_PLANO[formato]
+    filtros = leer_filtros_lista(request.GET)
+    response = StreamingHttpResponse(stream_inventario_plano(formato, filtros), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="INVENTARIO.{extension}"'
+    return response
+
+
+@login_required
+@require_GET
+def cambios_objetos_lugar(request):
+    """
+    Export incremental: lo creado, modificado o borrado después de
+    ?cursor=N (o ?desde=fecha ISO). Devuelve el cursor para la próxima vez.
+    """
+    cursor = request.GET.get("cursor", "").strip()
+    desde = request.GET.get("desde", "").strip()
+
+    if cursor:
+        try:
+            cursor = int(cursor)
+        except ValueError:
+            return JsonResponse({"error": "cursor inválido"}, status=400)
+    elif desde:
+        fecha = parse_datetime(desde)
+        if fecha is None:
+            return JsonResponse({"error": "desde debe ser una fecha ISO"}, status=400)
+        if timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha)
+        cursor = cursor_para_fecha(fecha)
+    else:
+        return JsonResponse({"error": "falta cursor o desde"}, status=400)
+
+    return JsonResponse(cambios_desde(cursor))
+
+
 @login_required
 def detalle_objeto_lugar(request, objeto_lugar_id):
-    obj = get_object_or_404(ObjetoLugar, pk=objeto_lugar_id)
+    # Lugar y objeto se muestran con su label: sin subir más por las FK
+    obj = get_object_or_404(ObjetoLugar.objects.select_related("lugar", "tipo_de_objeto__objeto"), pk=objeto_lugar_id)
     historicos = (
         HistoricoObjeto.objects
         .filter(objeto_del_lugar=obj)
@@ -1153,13 +1359,11 @@ def lista_tipos_objeto(request):
     )
 
     # ===== combos =====
-    categorias = CategoriaObjeto.objects.all().order_by("nombre_de_categoria")
+    catalogo = catalogos()
+    categorias = catalogo["categorias"]
 
     # mandamos TODOS los objetos, el JS se encarga de mostrar sólo los de la categoría elegida
-    objetos = Objeto.objects.select_related("objeto_categoria").all().order_by(
-        "objeto_categoria__nombre_de_categoria",
-        "nombre_del_objeto",
-    )
+    objetos = catalogo["objetos"]
 
     return render(
         request,
@@ -1289,39 +1493,14 @@ def lista_historicos(request):
     if estado_val:
         qs = qs.filter(estado_anterior=estado_val)
 
-    historicos = qs.order_by(
-        "-fecha_anterior",
-        "objeto_del_lugar__lugar__piso__ubicacion__ubicacion",
-        "objeto_del_lugar__lugar__piso__piso",
-        "objeto_del_lugar__lugar__nombre_del_lugar",
-    )
-
-    # ---- datos para los combos ----
-    lugares = (
-        Lugar.objects.select_related(
-            "piso",
-            "piso__ubicacion",
-            "piso__ubicacion__sector",
-        )
-        .all()
-        .order_by(
-            "piso__ubicacion__ubicacion",
-            "piso__piso",
-            "nombre_del_lugar",
+    try:
+        historicos, siguiente = pagina_keyset(
+            qs, ORDEN_HISTORICOS, request.GET.get("despues"), _por_pagina(request)
         )
-    )
-
-    objetos = (
-        Objeto.objects.select_related("objeto_categoria")
-        .all()
-        .order_by("objeto_categoria__nombre_de_categoria", "nombre_del_objeto")
-    )
+    except CursorInvalido:
+        return HttpResponse("Cursor inválido", status=400)
 
-    tipos = (
-        TipoObjeto.objects.select_related("objeto", "objeto__objeto_categoria")
-        .all()
-        .order_by("objeto__nombre_del_objeto", "marca", "material")
-    )
+    # ---- lugar/objeto/tipo se buscan por texto: solo el texto de lo elegido ----
 
     # choices del campo estado_anterior
     estados = HistoricoObjeto._meta.get_field("estado_anterior").choices
@@ -1331,9 +1510,10 @@ def lista_historicos(request):
         "historico/historicos.html",   # pon aquí la ruta real de tu template
         {
             "historicos": historicos,
-            "lugares": lugares,
-            "objetos_catalogo": objetos,
-            "tipos": tipos,
+            **_urls_keyset(request, siguiente),
+            "lugar_label": etiqueta("lugares", lugar_id),
+            "objeto_label": etiqueta("objetos", objeto_id),
+            "tipo_label": etiqueta("tipos-objeto", tipo_id),
             "estados": estados,
             "lugar_actual": lugar_id,
             "objeto_actual": objeto_id,
@@ -1345,7 +1525,10 @@ def lista_historicos(request):
 
 @login_required
 def detalle_historico(request, historico_id):
-    historico = get_object_or_404(HistoricoObjeto, pk=historico_id)
+    historico = get_object_or_404(
+        HistoricoObjeto.objects.select_related("objeto_del_lugar__lugar", "objeto_del_lugar__tipo_de_objeto"),
+        pk=historico_id,
+    )
     return render(request, "historico/detalle_historico.html", {"historico": historico})
 
 
@@ -1431,6 +1614,9 @@ def borrar_historico(request, historico_id):
 # RESUMEN
 # -------------------
 
+MALOS_POR_PAGINA = getattr(settings, "RESUMEN_MALOS_POR_PAGINA", 50)
+
+
 def _add_percentages(rows):
     for r in rows:
         total = r.get("total") or 0
@@ -1447,143 +1633,29 @@ def _add_percentages(rows):
     return rows
 
 
-def resumen_general(request):
-    # ----------------------
-    # 1) Leer filtros del GET
-    # ----------------------
-    sector_id = request.GET.get("sector") or None
-    ubicacion_id = request.GET.get("ubicacion") or None
-    piso_id = request.GET.get("piso") or None
-    tipo_lugar_id = request.GET.get("tipo_lugar") or None
-    categoria_id = request.GET.get("categoria") or None
-    objeto_id = request.GET.get("objeto") or None
-    tipo_objeto_id = request.GET.get("tipo_objeto") or None
-    estado = request.GET.get("estado") or None
-    marca = request.GET.get("marca") or None
-    material = request.GET.get("material") or None
-
-    # ----------------------
-    # 2) Base de datos filtrada
-    # ----------------------
-    base_qs = ObjetoLugar.objects.select_related(
-        "lugar",
-        "lugar__piso",
-        "lugar__piso__ubicacion",
-        "lugar__piso__ubicacion__sector",
-        "lugar__lugar_tipo_lugar",
-        "tipo_de_objeto",
-        "tipo_de_objeto__objeto",
-        "tipo_de_objeto__objeto__objeto_categoria",
-    )
-
-    if sector_id:
-        base_qs = base_qs.filter(lugar__piso__ubicacion__sector_id=sector_id)
-    if ubicacion_id:
-        base_qs = base_qs.filter(lugar__piso__ubicacion_id=ubicacion_id)
-    if piso_id:
-        base_qs = base_qs.filter(lugar__piso_id=piso_id)
-    if tipo_lugar_id:
-        base_qs = base_qs.filter(lugar__lugar_tipo_lugar_id=tipo_lugar_id)
-    if categoria_id:
-        base_qs = base_qs.filter(
-            tipo_de_objeto__objeto__objeto_categoria_id=categoria_id
-        )
-    if objeto_id:
-        base_qs = base_qs.filter(tipo_de_objeto__objeto_id=objeto_id)
-    if tipo_objeto_id:
-        base_qs = base_qs.filter(tipo_de_objeto_id=tipo_objeto_id)
-    if estado:
-        base_qs = base_qs.filter(estado=estado)
-    if marca:
-        base_qs = base_qs.filter(tipo_de_objeto__marca=marca)
-    if material:
-        base_qs = base_qs.filter(tipo_de_objeto__material=material)
-
-    # ----------------------
-    # 3) Resumen por sector
-    # ----------------------
-    qs_sector = (
-        base_qs.values(
-            "lugar__piso__ubicacion__sector__id",
-            "lugar__piso__ubicacion__sector__sector",
-        )
-        .annotate(
-            total=Sum("cantidad"),
-            buenas=Sum("cantidad", filter=Q(estado="B")),
-            pendientes=Sum("cantidad", filter=Q(estado="P")),
-            malas=Sum("cantidad", filter=Q(estado="M")),
-        )
-        .order_by("lugar__piso__ubicacion__sector__sector")
-    )
-    resumen_sector = list(qs_sector)
+def _calcular_resumen(filtros):
+    """
+    Todo lo que resumen_general calcula para un juego de filtros. Con
+    filtros["as_of"] (fecha ISO) los totales son los de ese día.
+    """
+    if filtros.get("as_of"):
+        # Inventario reconstruido a esa fecha (foto + cambios posteriores)
+        limite = limite_del_dia(date.fromisoformat(filtros["as_of"]))
+        resumen_sector, resumen_ubic, resumen_obj = resumen_por_niveles_al(limite, filtros)
+    else:
+        # ----------------------
+        # 2) Base filtrada: los totales salen de ResumenInventario (ya agregado)
+        # ----------------------
+        totales_qs = filtrar_resumen(ResumenInventario.objects.all(), filtros)
+
+        # ----------------------
+        # 3) Resumen por sector, ubicación y objeto (objeto, no tipo), en una pasada
+        # ----------------------
+        resumen_sector, resumen_ubic, resumen_obj = resumen_por_niveles(totales_qs)
     _add_percentages(resumen_sector)
-
-    # ----------------------
-    # 4) Resumen por ubicación
-    # ----------------------
-    qs_ubic = (
-        base_qs.values(
-            "lugar__piso__ubicacion__id",
-            "lugar__piso__ubicacion__ubicacion",
-            "lugar__piso__ubicacion__sector__sector",
-        )
-        .annotate(
-            total=Sum("cantidad"),
-            buenas=Sum("cantidad", filter=Q(estado="B")),
-            pendientes=Sum("cantidad", filter=Q(estado="P")),
-            malas=Sum("cantidad", filter=Q(estado="M")),
-        )
-        .order_by(
-            "lugar__piso__ubicacion__sector__sector",
-            "lugar__piso__ubicacion__ubicacion",
-        )
-    )
-    resumen_ubic = list(qs_ubic)
     _add_percentages(resumen_ubic)
-
-    # ----------------------
-    # 5) Resumen por objeto (objeto, no tipo)
-    # ----------------------
-    qs_obj = (
-        base_qs.values(
-            "tipo_de_objeto__objeto__id",
-            "tipo_de_objeto__objeto__nombre_del_objeto",
-        )
-        .annotate(
-            total=Sum("cantidad"),
-            buenas=Sum("cantidad", filter=Q(estado="B")),
-            pendientes=Sum("cantidad", filter=Q(estado="P")),
-            malas=Sum("cantidad", filter=Q(estado="M")),
-        )
-        .order_by("tipo_de_objeto__objeto__nombre_del_objeto")
-    )
-    resumen_obj = list(qs_obj)
     _add_percentages(resumen_obj)
 
-    # Objetos en estado malo, para el detalle por objeto
-    malos_qs = (
-        base_qs.filter(estado="M")
-        .select_related(
-            "lugar__piso__ubicacion__sector",
-            "lugar__piso__ubicacion",
-            "lugar__piso",
-            "lugar",
-            "tipo_de_objeto__objeto",
-        )
-        .order_by(
-            "tipo_de_objeto__objeto__nombre_del_objeto",
-            "lugar__piso__ubicacion__sector__sector",
-            "lugar__piso__ubicacion__ubicacion",
-            "lugar__piso__piso",
-            "lugar__nombre_del_lugar",
-        )
-    )
-
-    malos_por_objeto = {}
-    for ol in malos_qs:
-        oid = ol.tipo_de_objeto.objeto_id
-        malos_por_objeto.setdefault(oid, []).append(ol)
-
     resumen_objetos = []
     for r in resumen_obj:
         oid = r["tipo_de_objeto__objeto__id"]
@@ -1598,58 +1670,71 @@ def resumen_general(request):
                 "pct_buenas": r["pct_buenas"],
                 "pct_pendientes": r["pct_pendientes"],
                 "pct_malas": r["pct_malas"],
-                "malos": malos_por_objeto.get(oid, []),
             }
         )
 
     # ----------------------
-    # 6) Datos para los combos de filtros
+    # 4) Datos para los combos de filtros
     # ----------------------
-    sectores = Sector.objects.order_by("sector")
-    ubicaciones = Ubicacion.objects.select_related("sector").order_by(
-        "sector__sector", "ubicacion"
-    )
-    pisos = Piso.objects.select_related("ubicacion").order_by(
-        "ubicacion__ubicacion", "piso"
-    )
-    tipos_lugar = TipoLugar.objects.order_by("tipo_de_lugar")
-    categorias = CategoriaObjeto.objects.order_by("nombre_de_categoria")
-    objetos_catalogo = Objeto.objects.select_related("objeto_categoria").order_by(
-        "nombre_del_objeto"
-    )
-    tipos_objeto = TipoObjeto.objects.select_related("objeto").order_by(
-        "objeto__nombre_del_objeto", "marca", "material"
-    )
-
-    # NUEVO: marcas y materiales únicos
-    marcas = (
-        TipoObjeto.objects.order_by("marca")
-        .values_list("marca", flat=True)
-        .distinct()
-    )
-    materiales = (
-        TipoObjeto.objects.order_by("material")
-        .values_list("material", flat=True)
-        .distinct()
-    )
+    catalogo = catalogos()
 
     estados = ObjetoLugar.ESTADO
 
-    contexto = {
+    return {
         "resumen_sector": resumen_sector,
         "resumen_ubic": resumen_ubic,
         "resumen_objetos": resumen_objetos,
-        # combos
-        "sectores": sectores,
-        "ubicaciones": ubicaciones,
-        "pisos": pisos,
-        "tipos_lugar": tipos_lugar,
-        "categorias": categorias,
-        "objetos_catalogo": objetos_catalogo,
-        "tipos_objeto": tipos_objeto,
+        # combos (tuplas del catálogo, se pueden guardar en caché)
+        "sectores": catalogo["sectores"],
+        "ubicaciones": catalogo["ubicaciones"],
+        "pisos": catalogo["pisos"],
+        "tipos_lugar": catalogo["tipos_lugar"],
+        "categorias": catalogo["categorias"],
+        "objetos_catalogo": catalogo["objetos"],
+        "tipos_objeto": catalogo["tipos_objeto"],
         "estados": estados,
-        "marcas": marcas,
-        "materiales": materiales,
+        "marcas": catalogo["marcas"],
+        "materiales": catalogo["materiales"],
+    }
+
+
+def resumen_general(request):
+    # ----------------------
+    # 1) Leer filtros del GET
+    # ----------------------
+    filtros = leer_filtros(request.GET)
+    sector_id = filtros["sector"]
+    ubicacion_id = filtros["ubicacion"]
+    piso_id = filtros["piso"]
+    tipo_lugar_id = filtros["tipo_lugar"]
+    categoria_id = filtros["categoria"]
+    objeto_id = filtros["objeto"]
+    tipo_objeto_id = filtros["tipo_objeto"]
+    estado = filtros["estado"]
+    marca = filtros["marca"]
+    material = filtros["material"]
+
+    # as_of=AAAA-MM-DD: el resumen como estaba al final de ese día
+    try:
+        as_of = parse_date((request.GET.get("as_of") or "").strip())
+    except ValueError:
+        as_of = None
+    as_of_error = None
+    if as_of and as_of >= timezone.localdate():
+        as_of = None
+    if as_of:
+        try:
+            foto_para(limite_del_dia(as_of))
+            filtros = {**filtros, "as_of": as_of.isoformat()}
+        except SinFoto:
+            as_of_error = "No hay fotos del inventario anteriores a esa fecha; se muestra el estado actual."
+            as_of = None
+
+    # ----------------------
+    # 2) Resumen ya calculado para estos filtros y esta versión, o se calcula
+    # ----------------------
+    contexto = {
+        **obtener_resumen(filtros, _calcular_resumen),
         # valores seleccionados
         "sector_actual": sector_id or "",
         "ubicacion_actual": ubicacion_id or "",
@@ -1661,11 +1746,140 @@ def resumen_general(request):
         "estado_actual": estado or "",
         "marca_actual": marca or "",
         "material_actual": material or "",
+        "as_of": as_of.isoformat() if as_of else "",
+        "as_of_error": as_of_error,
     }
 
     return render(request, "resumen/resumen_general.html", contexto)
 
 
+# Orden de la lista de malos: el último campo (id) desempata para el cursor
+ORDEN_MALOS = (
+    "lugar__piso__ubicacion__sector__sector",
+    "lugar__piso__ubicacion__ubicacion",
+    "lugar__piso__piso",
+    "lugar__nombre_del_lugar",
+    "id",
+)
+
+
+@require_GET
+def resumen_malos_objeto(request, objeto_id):
+    """
+    Fragmento HTML con los lugares donde un objeto está en estado Malo,
+    por páginas. Lo pide la tabla del resumen al desplegar cada objeto.
+    """
+    filtros = leer_filtros(request.GET)
+    qs = filtrar_objetos_lugar(
+        ObjetoLugar.objects.filter(
+            estado="M", tipo_de_objeto__objeto_id=objeto_id, lugar__isnull=False
+        ),
+        filtros,
+    ).select_related("lugar__piso__ubicacion__sector")
+
+    try:
+        malos, siguiente = pagina_keyset(
+            qs, ORDEN_MALOS, request.GET.get("despues"), MALOS_POR_PAGINA
+        )
+    except CursorInvalido:
+        return HttpResponse("Cursor inválido", status=400)
+
+    url_siguiente = None
+    if siguiente:
+        params = request.GET.copy()
+        params["despues"] = siguiente
+        url_siguiente = f"{request.path}?{params.urlencode()}"
+
+    return render(
+        request,
+        "resumen/_malos_objeto.html",
+        {"malos": malos, "url_siguiente": url_siguiente},
+    )
+
+
+def _etag_resumen(request):
+    # Solo depende de la versión y los filtros: un 304 no calcula nada
+    return clave_resumen(leer_filtros(request.GET), get_data_version())
+
+
+@require_GET
+@etag(_etag_resumen)
+def api_resumen(request):
+    """
+    Los tres resúmenes de resumen_general en JSON, con los mismos filtros.
+    Con If-None-Match y el mismo ETag responde 304 sin tocar los agregados.
+    """
+    filtros = leer_filtros(request.GET)
+    datos = obtener_resumen(filtros, _calcular_resumen)
+    response = JsonResponse(
+        {
+            "version_datos": get_data_version(),
+            "filtros": filtros,
+            "resumen_sector": datos["resumen_sector"],
+            "resumen_ubic": datos["resumen_ubic"],
+            "resumen_objetos": datos["resumen_objetos"],
+        }
+    )
+    # Que el navegador revalide siempre: la respuesta típica es un 304 vacío
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+TENDENCIA_MAX_DIAS = 3650
+
+
+@require_GET
+def api_tendencia_resumen(request):
+    """
+    Serie diaria de buenas/pendientes/malas para gráficos de ?dias=N
+    (por defecto 30), filtrable por sector, ubicacion y categoria.
+    """
+    try:
+        dias = int(request.GET.get("dias") or 30)
+    except ValueError:
+        return JsonResponse({"error": "dias debe ser un número"}, status=400)
+    dias = max(1, min(dias, TENDENCIA_MAX_DIAS))
+    return JsonResponse({"dias": dias, **tendencia(dias, leer_filtros(request.GET))})
+
+
+@login_required
+@require_GET
+def api_pivote(request):
+    """
+    Tabla cruzada del inventario: ?por=categoria,piso,estado más los
+    filtros del resumen (sector=, ubicacion=, estado=...). Cada fila trae
+    los ids de las dimensiones pedidas, cantidad y número de filas, y
+    "nombres" permite mostrarlos.
+    """
+    # NumPy solo se carga si alguien usa el pivote
+    from .analitica import DIMENSIONES, CruceDemasiadoGrande, DimensionInvalida, motor
+
+    por = [d.strip() for d in (request.GET.get("por") or "").split(",") if d.strip()]
+    filtros = {
+        nombre: valor for nombre, valor in leer_filtros(request.GET).items()
+        if valor and nombre in DIMENSIONES
+    }
+    # Filas y nombres de la misma instantánea aunque otro pedido refresque el motor
+    analitica = motor().instantanea
+    try:
+        filas = analitica.pivote(por, filtros)
+    except DimensionInvalida as e:
+        return JsonResponse(
+            {"error": f"Dimensión desconocida: {e}", "dimensiones": list(DIMENSIONES)}, status=400
+        )
+    except CruceDemasiadoGrande as e:
+        return JsonResponse({"error": f"Demasiadas combinaciones para cruzar: {e}"}, status=400)
+    nombres = {dim: analitica.nombres[dim] for dim in por}
+    return JsonResponse({"por": por, "filas": filas, "nombres": nombres})
+
+
+@login_required
+@require_GET
+def estadisticas_cache_resumen(request):
+    """Aciertos/fallos de la caché del resumen, para dimensionarla."""
+    return JsonResponse(estadisticas_resumen())
+
+
     # -------------------------
 # AJAX: combos dependientes
 # -------------------------
@@ -1833,6 +2047,24 @@ TIPICOS_POR_TIPO_LUGAR = {
 }
 
 
+@login_required
+@require_GET
+def buscar_catalogo(request, tipo):
+    """
+    Typeahead de los filtros: ?q=texto&limite=N sobre lugares, objetos o
+    tipos-objeto. Devuelve {"resultados": [{"id", "label"}, ...]}.
+    """
+    try:
+        limite = int(request.GET.get("limite") or LIMITE_BUSQUEDA)
+    except ValueError:
+        limite = LIMITE_BUSQUEDA
+    try:
+        resultados = buscar(tipo, request.GET.get("q"), limite)
+    except KeyError:
+        raise Http404("Catálogo desconocido")
+    return JsonResponse({"resultados": resultados})
+
+
 @require_GET
 def objetos_tipicos_por_tipo_lugar(request, tipo_lugar_pk):
 